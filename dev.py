@@ -1,4 +1,6 @@
+import asyncio
 from datetime import datetime
+from functools import partial
 import os
 import logging
 import numpy as np
@@ -6,7 +8,10 @@ import pandas as pd
 import pystore
 from decimal import Decimal
 from tests.fixtures import Fixes
+from src.crypto_accountant.batch import run_books
 from src.crypto_accountant.bookkeeper import BookKeeper
+from src.crypto_accountant.price_store import PriceStore
+from src.crypto_accountant.sources import sync_book, FirestoreSource
 
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
 
@@ -26,6 +31,11 @@ firestore_cred_file = Fixes.firestore_cred_file(Fixes.storage_dir())
 firestore_ref = Fixes.firestore_ref(firestore_cred_file)
 txs = Fixes.firestore_user_transactions(firestore_ref)
 
+# or page them while booking, see sources.sync_book
+# bk = BookKeeper()
+# loop = asyncio.get_event_loop()
+# cursor = loop.run_until_complete(sync_book(bk, FirestoreSource(firestore_ref, '903Rf3cVflW2bzWc8x1YL8E78gy1')))
+
 # Pystore historical data
 pystore.set_path("/Volumes/CAPA/.storage")
 store = pystore.store("messari")
@@ -55,6 +65,13 @@ def get_historical_df(symbols):
     return df
 
 
+def get_price_store(symbols, path="/Volumes/CAPA/.storage/prices"):
+    # build the memory mapped price store once, later runs just open it
+    if not os.path.exists(path):
+        PriceStore.write(path, get_historical_df(symbols))
+    return PriceStore(path)
+
+
 start = datetime.now()
 
 # initialize bookkeeper
@@ -64,8 +81,21 @@ eq_curve = bk.ledger.generate_equity_curve('assets')
 print(eq_curve)
 
 # multiply qty df with price df and then sum them all into total
-# historical = get_historical_df(bk.ledger.symbols)
-# val_curve = eq_curve.mul(historical)
-# val_curve['total'] = val_curve[bk.ledger.symbols].sum(axis=1)
+# eq_curve = bk.ledger.generate_equity_curve('assets', as_float=True)
+# prices = get_price_store(bk.ledger.symbols).align(eq_curve, fill=0.0)
+# val_curve = eq_curve.mul(prices)
+# val_curve['total'] = val_curve.sum(axis=1)
 # print(val_curve['total'])
 print(datetime.now() - start)
+
+# rebuild many users' books across processes, sharing the price store
+# def load_user_txs(uid):
+#     ref = Fixes.firestore_ref(Fixes.firestore_cred_file(Fixes.storage_dir()))
+#     return Fixes.firestore_user_transactions(ref, uid)
+#
+# uids = ['903Rf3cVflW2bzWc8x1YL8E78gy1']
+# get_price_store(bk.ledger.symbols)
+# timings = run_books({uid: partial(load_user_txs, uid) for uid in uids},
+#                     lambda uid, report: print(uid, report['values']['total'].iloc[-1]),
+#                     prices="/Volumes/CAPA/.storage/prices")
+# print(timings)
@@ -0,0 +1,84 @@
+"""
+A BalanceHistory answers "what were the balances at time t" for one
+grouping of accounts. Entries are sorted by account path, then timestamp,
+and debit and credit value and quantity totals are kept as running sums
+of scaled integers over that order. The totals of a path up to t are then
+the difference of two running sums: one binary search for all paths at
+once finds where each path's entries after t begin, and the sums there
+are gathered.
+
+  Typical usage example:
+    history = BalanceHistory(3)
+    history.build(store)
+    paths, totals, counts = history.as_of(timestamp)
+"""
+import numpy as np
+from .balance_tree import LEVELS
+from .entry_store import NAT, to_nanoseconds
+
+
+class BalanceHistory:
+
+    def __init__(self, depth) -> None:
+        self.depth = depth        # path levels, see LEVELS
+        self.size = 0             # entries in the store when built
+        self.paths = np.zeros((0, depth), dtype=np.int32)   # path codes
+        self.starts = np.zeros(0, dtype=np.int64)           # first sorted entry of each path
+        self.keys = np.zeros(0, dtype=np.int64)             # path number and timestamp rank, sorted
+        self.times = np.zeros(0, dtype=np.int64)            # distinct timestamps, sorted
+        self.sums = np.zeros((1, 4), dtype=object)          # running SIDE_COLUMNS totals, scaled
+        self.counts = np.zeros((1, 2), dtype=np.int64)      # running debit and credit entry counts
+
+    def build(self, store):
+        """
+        Index all entries of store. Entries without a timestamp are left out.
+
+        Args:
+            store (EntryStore): The ledger's entries.
+        """
+        self.size = len(store)
+        timestamps = store.timestamp_array()
+        keep = np.flatnonzero(timestamps != NAT)
+        codes = np.stack([store.code_array(level)[keep] for level in LEVELS[:self.depth]], axis=1)
+        self.paths, path = np.unique(codes.reshape(-1, self.depth), axis=0, return_inverse=True)
+        path = path.reshape(-1)
+        self.times, rank = np.unique(timestamps[keep], return_inverse=True)
+        order = np.lexsort((rank, path))
+        self.keys = path[order].astype(np.int64) * (len(self.times) + 1) + rank[order]
+        self.starts = np.searchsorted(self.keys, np.arange(len(self.paths)) * (len(self.times) + 1))
+
+        sides = store.code_array('side')[keep][order]
+        lookup = store.categories['side'].lookup
+        is_debit = sides == lookup.get('debit', -2)
+        is_credit = sides == lookup.get('credit', -2)
+        values = store.scaled_column('value')[keep][order].astype(object)
+        quantities = store.scaled_column('quantity')[keep][order].astype(object)
+        columns = np.zeros((len(keep) + 1, 4), dtype=object)
+        columns[1:, 0] = np.where(is_debit, values, 0)
+        columns[1:, 1] = np.where(is_credit, values, 0)
+        columns[1:, 2] = np.where(is_debit, quantities, 0)
+        columns[1:, 3] = np.where(is_credit, quantities, 0)
+        self.sums = np.cumsum(columns, axis=0)
+        counts = np.zeros((len(keep) + 1, 2), dtype=np.int64)
+        counts[1:, 0] = is_debit
+        counts[1:, 1] = is_credit
+        self.counts = np.cumsum(counts, axis=0)
+
+    def as_of(self, timestamp):
+        """
+        Totals of every path over the entries up to and including timestamp.
+
+        Args:
+            timestamp (datetime): As of time, naive timestamps are UTC.
+
+        Returns:
+            tuple: (path codes, SIDE_COLUMNS totals scaled by 10 ** precision,
+                debit and credit entry counts), one row per path with
+                entries by then.
+        """
+        rank = np.searchsorted(self.times, to_nanoseconds(timestamp), side='right')
+        ends = np.searchsorted(self.keys, np.arange(len(self.paths)) * (len(self.times) + 1) + rank)
+        found = ends > self.starts
+        starts, ends = self.starts[found], ends[found]
+        return self.paths[found], self.sums[ends] - self.sums[starts], self.counts[ends] - self.counts[starts]
+
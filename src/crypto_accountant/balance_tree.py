@@ -0,0 +1,150 @@
+"""
+A BalanceTree keeps debit and credit value and quantity totals for every
+account_type -> account -> sub_account -> symbol path of a ledger. Each
+node holds the totals of all entries below it, so a trial balance at any
+level is read off the nodes instead of scanning the entries. Like
+EquityCurve, the tree is brought up to date from the EntryStore
+incrementally: entries appended since the last update are summed per path
+in one vectorized pass, then each path's sums are added to the nodes on
+it.
+
+  Typical usage example:
+    tree = BalanceTree()
+    tree.update(store)
+    for path, node in tree.nodes(3):
+        ...
+"""
+import numpy as np
+
+LEVELS = ['account_type', 'account', 'sub_account', 'symbol']
+SIDE_COLUMNS = ['debit_value', 'credit_value', 'debit_quantity', 'credit_quantity']
+
+
+class BalanceNode:
+    __slots__ = ('totals', 'counts', 'children')
+
+    def __init__(self) -> None:
+        self.totals = [0, 0, 0, 0]   # SIDE_COLUMNS as stored, see EntryStore
+        self.counts = [0, 0, 0]      # entries, debit entries, credit entries
+        self.children = {}
+
+
+class BalanceTree:
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self):
+        self.size = 0   # entries read from the store
+        self.root = BalanceNode()
+
+    def update(self, store):
+        """
+        Add entries appended to store since the last update.
+
+        Args:
+            store (EntryStore): The ledger's entries.
+        """
+        if len(store) < self.size:
+            self.reset()
+        self._add(store, self.size, len(store), 1)
+        self.size = len(store)
+
+    def remove(self, store, size):
+        """
+        Take the entries from size on back out, before the store is
+        truncated to size.
+
+        Args:
+            store (EntryStore): The ledger's entries.
+            size (int): Entries to keep.
+        """
+        if size < self.size:
+            self._add(store, size, self.size, -1)
+            self.size = size
+
+    def node(self, *path):
+        """
+        Node of an account path.
+
+        Args:
+            path (str): account_type, then optionally account, sub_account
+                and symbol. Missing values are None.
+
+        Returns:
+            BalanceNode: The node or None if no entries are on the path.
+        """
+        node = self.root
+        for key in path:
+            node = node.children.get(key)
+            if node is None:
+                return None
+        return node
+
+    def nodes(self, depth):
+        """
+        Nodes at a depth of the tree, 1 for account types to 4 for symbols.
+
+        Yields:
+            tuple: (path, BalanceNode)
+        """
+        stack = [((), self.root)]
+        while stack:
+            path, node = stack.pop()
+            if len(path) == depth:
+                yield path, node
+                continue
+            for key, child in reversed(list(node.children.items())):
+                stack.append((path + (key,), child))
+
+    def _add(self, store, start, end, sign):
+        count = end - start
+        if count <= 0:
+            return
+        codes = np.stack([store.code_array(level)[start:end] for level in LEVELS], axis=1)
+        paths, inverse = np.unique(codes, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        sides = store.code_array('side')[start:end]
+        lookup = store.categories['side'].lookup
+        is_debit = sides == lookup.get('debit', -2)
+        is_credit = sides == lookup.get('credit', -2)
+        amounts = {}
+        for field in ['value', 'quantity']:
+            amounts[field] = np.empty(count, dtype=object)
+            amounts[field][:] = store.amount_slice(field, start)[:count]
+        columns = np.empty((count, 4), dtype=object)
+        columns[:, 0] = np.where(is_debit, amounts['value'], 0)
+        columns[:, 1] = np.where(is_credit, amounts['value'], 0)
+        columns[:, 2] = np.where(is_debit, amounts['quantity'], 0)
+        columns[:, 3] = np.where(is_credit, amounts['quantity'], 0)
+        totals = np.zeros((len(paths), 4), dtype=object)
+        np.add.at(totals, inverse, columns)
+        counts = np.stack([np.bincount(inverse, weights, minlength=len(paths))
+                           for weights in [None, is_debit, is_credit]], axis=1).astype(np.int64)
+
+        values = list([store.categories[level].values for level in LEVELS])
+        for path, path_totals, path_counts in zip(paths, totals, counts):
+            keys = list([values[level][code] if code >= 0 else None for level, code in enumerate(path)])
+            self._add_path(keys, list(path_totals), path_counts.tolist(), sign)
+
+    def _add_path(self, keys, totals, counts, sign):
+        # add sums of one path to the root and every node on the path
+        node = self.root
+        trail = [node]
+        for key in keys:
+            child = node.children.get(key)
+            if child is None:
+                child = node.children[key] = BalanceNode()
+            node = child
+            trail.append(node)
+        for node in trail:
+            for i, total in enumerate(totals):
+                node.totals[i] = node.totals[i] + total if sign > 0 else node.totals[i] - total
+            for i, count in enumerate(counts):
+                node.counts[i] += sign * count
+        # nodes left without entries are dropped
+        for parent, key, node in zip(trail[:-1], keys, trail[1:]):
+            if node.counts[0] == 0:
+                del parent.children[key]
+                break
@@ -0,0 +1,153 @@
+"""
+Rebuild many books at once, e.g. every customer's book overnight.
+
+Books are independent, so each one is booked start to finish in a worker
+process. Historical prices are shared through a PriceStore: every worker
+memory maps the same read only files once when it starts, instead of each
+book loading its own price table. Finished books are handed to a sink in
+the parent process as they complete, so results stream out while later
+books are still booking, and only a few books per worker are in flight at
+any time.
+
+Sources are tx lists or callables that return one, called in the worker.
+Callables must pickle, e.g. a module level function or a functools.partial
+of one with the book's user id.
+
+  Typical usage example:
+    def sink(book_id, report):
+        report['summary'].to_parquet('{}.parquet'.format(book_id))
+
+    sources = {uid: partial(load_user_txs, uid) for uid in uids}
+    timings = run_books(sources, sink, prices='prices')
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import os
+import time
+import pandas as pd
+from .bookkeeper import BookKeeper
+from .price_store import PriceStore
+from .transactions.utils import numeric_mode, set_numeric_mode
+
+TIMING_COLUMNS = ['txs', 'entries', 'load', 'book', 'report', 'total', 'error']
+IN_FLIGHT = 2   # books queued per worker
+
+worker = {'prices': None}   # state of this worker process, see open_prices
+
+
+def open_prices(path, mode):
+    # pool initializer: map the shared price store once per worker
+    set_numeric_mode(mode)
+    worker['prices'] = PriceStore(path) if path else None
+
+
+def book_report(bk):
+    """
+    Summaries and equity curve of a finished book.
+
+    Args:
+        bk (BookKeeper): The book.
+
+    Returns:
+        dict: summary (Ledger.summarize), equity_curve (daily asset
+            quantities as floats) and, when prices are shared, values
+            (the curve valued at each day's price with a total column).
+    """
+    curve = bk.ledger.generate_equity_curve('assets', as_float=True)
+    report = {
+        'summary': bk.ledger.summarize(),
+        'equity_curve': curve,
+    }
+    prices = worker['prices']
+    if prices is not None:
+        values = curve.mul(prices.align(curve, fill=0.0))
+        values['total'] = values.sum(axis=1)
+        report['values'] = values
+    return report
+
+
+def run_book(job):
+    """
+    Book and report one book, in a worker process. Errors are returned
+    instead of raised so one bad book doesn't stop the others.
+
+    Args:
+        job (tuple): (book id, tx source, book settings)
+
+    Returns:
+        tuple: (book id, report or None, timings)
+    """
+    book_id, source, settings = job
+    timings = {'txs': 0, 'entries': 0, 'load': 0.0, 'book': 0.0, 'report': 0.0, 'error': None}
+    start = last = time.perf_counter()
+    report = None
+    try:
+        txs = source() if callable(source) else source
+        now = time.perf_counter()
+        timings['load'], last = now - last, now
+
+        bk = BookKeeper(settings['relief_strategy'], settings['tax_rates'])
+        bk.add_txs(txs, auto_detect=True)
+        now = time.perf_counter()
+        timings['book'], last = now - last, now
+
+        report = book_report(bk)
+        timings['txs'] = bk.booked
+        timings['entries'] = len(bk.ledger.store)
+        timings['report'] = time.perf_counter() - last
+    except Exception as e:
+        timings['error'] = '{}: {}'.format(type(e).__name__, e)
+    timings['total'] = time.perf_counter() - start
+    return book_id, report, timings
+
+
+def run_books(sources, sink, prices=None, processes=None, relief_strategy='max_tax', tax_rates=None):
+    """
+    Rebuild books across a process pool and stream each finished book's
+    report to sink. Books finish in any order.
+
+    Args:
+        sources (dict): Book id -> txs, tx dicts or a callable returning them.
+        sink (callable): Called as sink(book_id, report) in this process
+            for every book that booked without error; see book_report.
+        prices (str): Path of a PriceStore to value equity curves with.
+        processes (int): Worker processes, defaults to the number of CPUs.
+        relief_strategy (str): Relief strategy of every book.
+        tax_rates (dict): Long and short term tax rates, defaults to
+            BookKeeper's.
+
+    Returns:
+        DataFrame: Timings in seconds per book id with columns txs, entries,
+            load, book, report, total and error (None if the book booked).
+    """
+    processes = processes or os.cpu_count() or 1
+    settings = {'relief_strategy': relief_strategy, 'tax_rates': tax_rates}
+    jobs = ((book_id, source, settings) for book_id, source in sources.items())
+    timings = {}
+
+    def finish(result):
+        book_id, report, book_timings = result
+        timings[book_id] = book_timings
+        if report is not None:
+            sink(book_id, report)
+
+    if processes > 1 and len(sources) > 1:
+        with ProcessPoolExecutor(min(processes, len(sources)), initializer=open_prices,
+                                 initargs=(prices, numeric_mode['mode'])) as pool:
+            pending = set()
+            for job in jobs:
+                pending.add(pool.submit(run_book, job))
+                if len(pending) >= processes * IN_FLIGHT:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(future.result())
+            for future in as_completed(pending):
+                finish(future.result())
+    else:
+        previous = worker['prices']
+        open_prices(prices, numeric_mode['mode'])
+        try:
+            for job in jobs:
+                finish(run_book(job))
+        finally:
+            worker['prices'] = previous
+    return pd.DataFrame.from_dict(timings, orient='index', columns=TIMING_COLUMNS)
@@ -1,44 +1,614 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from decimal import Decimal
+import heapq
+import os
+import pickle
+import pandas as pd
 from .transactions.base import BaseTx
+from .frames import TxFrame, entry_columns, append_entries, ENTRY_FIELDS
 from .ledger import Ledger
+from .mark_to_market import price_table, prices_at, lot_table, mark_lots
+from .partition import group_txs, has_lots, tx_symbols
 from .position import Position
-from .utils import check_type, create_tx
+from .tax_lots import check_strategy
+from .transactions.utils import numeric_mode, set_numeric_mode
+from .utils import check_type, create_tx, tx_timestamp
+
+
+SNAPSHOT_VERSION = 1
+VALIDATION_MODES = ['off', 'tx', 'sampled', 'batch']
+
+
+def sorted_stream(source, n):
+    # (timestamp, source number, tx) for heapq.merge; source numbers break
+    # ties, so txs themselves are never compared
+    last = None
+    for tx in source:
+        timestamp = tx_timestamp(tx)
+        if last is not None and timestamp < last:
+            raise Exception('Tx source {} is not sorted by timestamp: {} comes after {}'.format(
+                n, timestamp, last))
+        last = timestamp
+        yield timestamp, n, tx
+
+
+def replay_group(job):
+    """
+    Book one group of txs from add_txs_parallel, in a worker process.
+
+    Args:
+        job (tuple): (list of (tx index, tx), symbols owned by the group,
+            existing positions of those symbols, book settings)
+
+    Returns:
+        tuple: (owned positions, {tx index: (base and quote symbols, lots
+            opened on positions outside the group, entries, journal spans
+            of owned positions)})
+    """
+    txs, symbols, positions, settings = job
+    set_numeric_mode(settings['numeric_mode'])
+    bk = BookKeeper(settings['relief_strategy'], settings['tax_rates'], track_history=settings['track_history'])
+    bk.symbol_relief_strategies = settings['symbol_relief_strategies']
+    bk.positions.update(positions)
+    booked = {}
+    for index, tx in txs:
+        if not isinstance(tx, BaseTx):
+            tx = create_tx(**tx)
+        lots = []
+        entries = bk.book_tx(tx, lots)
+        spans = {}
+        if bk.track_history:
+            spans = {symbol: span for symbol, span in bk.history[-1][3].items() if symbol in symbols}
+        base_quote = [tx.assets['base'].symbol, tx.assets['quote'].symbol]
+        booked[index] = (base_quote, list([lot for lot in lots if lot[0] not in symbols]), entries, spans)
+    return {symbol: bk.positions[symbol] for symbol in symbols if symbol in bk.positions}, booked
+
+
+def taxable_entries(tx, fills):
+    """
+    Entries of a taxable tx, given the tax lots its taxable assets were
+    filled from.
+
+    Args:
+        tx (TaxableTx): Tx to build entries for.
+        fills (list): (taxable asset, lot price, qty, entry type) of each
+            lot filled, see BookKeeper.relieve_lots.
+
+    Returns:
+        list: The tx's Entry objects.
+    """
+    # check if tx has fee and isnt taxable
+    if 'fee' not in tx.taxable_assets.keys() and len(tx.taxable_assets.keys()) > 0:
+        # fee isnt in taxable assets so just overwrite entry config
+        entries = tx.get_entries(
+            config={'debit': tx.entry_template['debit']})
+    elif len(tx.taxable_assets.keys()) == 1:
+        # the fee is the only taxable asset
+        entries = tx.get_entries()
+    else:
+        # base or quote as well as fee are in taxable assets so just get debit entries
+        entries = tx.generate_debit_entry()
+
+    for taxable_asset, lot_price, qty, tx_type in fills:
+        entries += tx.generate_credit_entries(taxable_asset, lot_price, qty, type=tx_type)
+    return entries
+
+
+def tx_entries(tx, fills=None):
+    # entries of a booked tx, fills is None for txs that aren't taxable
+    if fills is None:
+        return tx.get_entries()
+    return taxable_entries(tx, fills)
+
+
+class DeferredEntries:
+    """
+    A booked tx whose entries are built when the ledger is first read,
+    see Ledger.defer. Only the tx and the tax lots it filled are held, and
+    both are dropped once the entries are built.
+    """
+    __slots__ = ('tx', 'fills', 'start')
+
+    def __init__(self, tx, fills) -> None:
+        self.tx = tx
+        self.fills = fills
+        self.start = None   # first ledger entry, set when built
+
+    def build(self):
+        entries = tx_entries(self.tx, self.fills)
+        self.tx = None
+        self.fills = None
+        return entries
+
+
+def entry_start(start):
+    # first ledger entry of a history record, see DeferredEntries
+    return start.start if isinstance(start, DeferredEntries) else start
 
 
 class BookKeeper:
-    def __init__(self) -> None:
-        self.positions = {'usd': Position('usd')}
+    def __init__(self, relief_strategy='max_tax', tax_rates=None, track_history=False) -> None:
+        self.tax_rates = tax_rates or {'long': check_type(.25), 'short': check_type(.4)}
+        self.relief_strategy = check_strategy(relief_strategy)
+        self.symbol_relief_strategies = {}
+        # keep every booked tx and position op so insert_txs can book late
+        # txs in place; both grow with the book, so they're off by default
+        self.track_history = track_history
+        self.positions = {'usd': Position('usd', self.tax_rates, journal=track_history)}
         self.ledger = Ledger()
-        self.tax_rates = {'long': check_type(.25), 'short': check_type(.4)}
+        # booked txs in booking order when tracked: (timestamp, tx as added,
+        # its first ledger entry or its DeferredEntries, {symbol: (first, end)
+        # of its ops in that position's journal})
+        self.history = []
+        self.booked = 0   # txs booked
+        self.lazy_entries = False
+        self.validation = 'off'
+        self.sample_every = 100
+        self.validated = 0   # ledger entries checked by validate
+        self.invalid = {}    # (tx id, timestamp) -> reason it failed validation
+
+    def save_snapshot(self, path):
+        """
+        Write the book to a binary snapshot: positions with their open and
+        closed lots and stats, the ledger, tax rates and relief strategies.
+        New txs can be added on top of the restored book instead of
+        replaying its whole history. Tx history and position journals are
+        only kept with track_history.
+
+        Args:
+            path (str): File to write.
+        """
+        self.ledger.materialize()
+        state = {
+            'version': SNAPSHOT_VERSION,
+            'numeric_mode': numeric_mode['mode'],
+            'tax_rates': self.tax_rates,
+            'relief_strategy': self.relief_strategy,
+            'symbol_relief_strategies': self.symbol_relief_strategies,
+            'positions': self.positions,
+            'ledger': self.ledger,
+            'track_history': self.track_history,
+            'booked': self.booked,
+            'history': self.history if self.track_history else None,
+        }
+        with open(path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """
+        Restore a book written by save_snapshot. Snapshots are pickles, so
+        only load ones you wrote.
+
+        Args:
+            path (str): File to read.
+
+        Returns:
+            BookKeeper: The restored book.
+        """
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if state.get('version') != SNAPSHOT_VERSION:
+            raise Exception('Unsupported snapshot version {}. Expected {}'.format(
+                state.get('version'), SNAPSHOT_VERSION))
+        if state['numeric_mode'] != numeric_mode['mode']:
+            raise Exception('Snapshot was written in {} mode. Set numeric mode {} to load it'.format(
+                state['numeric_mode'], state['numeric_mode']))
+        bk = cls(state['relief_strategy'], state['tax_rates'], track_history=state['track_history'])
+        bk.symbol_relief_strategies = state['symbol_relief_strategies']
+        bk.positions = state['positions']
+        bk.ledger = state['ledger']
+        bk.history = state['history'] or []
+        bk.booked = state['booked']
+        return bk
+
+    def set_relief_strategy(self, strategy, symbol=None):
+        """
+        Set the lot relief strategy for the whole book or a single symbol.
+
+        Args:
+            strategy (str): One of fifo, lifo, hifo, max_tax, min_tax or specific_id.
+            symbol (str): Symbol to override. Sets the book default if not given.
+        """
+        check_strategy(strategy)
+        if symbol is None:
+            self.relief_strategy = strategy
+        else:
+            self.symbol_relief_strategies[symbol.upper()] = strategy
+
+    def get_relief_strategy(self, symbol):
+        return self.symbol_relief_strategies.get(symbol.upper(), self.relief_strategy)
+
+    def set_lazy_entries(self, lazy=True):
+        """
+        Defer building the entries of txs added through add_tx, add_txs
+        and add_tx_stream until the ledger is first read, e.g. by a view,
+        summary or equity curve. Books only used for positions and taxes
+        never build entries. Not used while validation is tx or sampled,
+        which check entries as txs are booked.
+
+        Args:
+            lazy (bool): Defer entries.
+        """
+        self.lazy_entries = lazy
+
+    def set_validation(self, mode, sample_every=100):
+        """
+        Set when entries are validated. Problems found are kept in invalid.
+
+        Args:
+            mode (str): off, tx to check the entries of every tx as it is
+                booked, sampled to check every sample_every-th tx, or batch
+                to check all new entries at once at the end of add_txs,
+                add_tx_stream, add_txs_frame, add_txs_parallel and insert_txs.
+                validate can be called in any mode.
+            sample_every (int): Sampling interval of sampled mode.
+        """
+        if mode not in VALIDATION_MODES:
+            raise Exception('Unknown validation mode {}. Must be one of {}'.format(mode, VALIDATION_MODES))
+        self.validation = mode
+        self.sample_every = sample_every
+
+    def validate(self):
+        """
+        Validate the ledger entries added since the last call in one pass,
+        see Ledger.validate.
+
+        Returns:
+            DataFrame: id, timestamp and reason of each tx that failed.
+        """
+        report = self.ledger.validate(self.validated)
+        self.validated = len(self.ledger.store)
+        for id, timestamp, reason in report.itertuples(index=False):
+            self.invalid[(id, timestamp)] = reason
+        return report
+
+    def checkpoint(self):
+        # batch validation at the end of adding many txs
+        if self.validation == 'batch':
+            self.validate()
+
+    def mark_to_market(self, prices, timestamp=None):
+        """
+        Revalue all open tax lots of all positions against a price table.
+        Each position with a known price at timestamp is adjusted to it,
+        which also moves lots held over a year to long term.
+
+        Args:
+            prices (DataFrame): Prices with a row per date and a column per
+                symbol. Symbol x date tables are transposed.
+            timestamp (datetime): Valuation time, defaults to the last date.
+
+        Returns:
+            DataFrame: Open lots with their mkt_price, term and unrealized_gain.
+        """
+        prices = price_table(prices)
+        if timestamp is None:
+            timestamp = prices.index[-1]
+        timestamp = check_type(pd.Timestamp(timestamp))
+        current = prices_at(prices, timestamp)
+        lots = mark_lots(lot_table(self.positions), current, timestamp)
+        for symbol, position in self.positions.items():
+            price = current.get(symbol)
+            if price is not None and not pd.isna(price):
+                position.mark(check_type(price), timestamp)
+        return lots
 
     def add_txs(self, txs, auto_detect=True):
-        transactions = sorted(txs, key=lambda x: dict(x).get('timestamp'))
+        transactions = sorted(txs, key=tx_timestamp)
         for tx in transactions:
             self.add_tx(tx, auto_detect)
+        self.checkpoint()
+
+    def add_tx_stream(self, *sources, auto_detect=True):
+        """
+        Add txs from several sources that are each already sorted by
+        timestamp, e.g. one generator per exchange export. Sources are
+        merged lazily, so only one pending tx per source is held in memory.
+        Txs with equal timestamps are added in source order.
+
+        Args:
+            sources (iterable): Txs or tx dicts in timestamp order.
+        """
+        streams = list([sorted_stream(source, n) for n, source in enumerate(sources)])
+        for timestamp, n, tx in heapq.merge(*streams):
+            self.add_tx(tx, auto_detect)
+        self.checkpoint()
+
+    def add_txs_frame(self, txs):
+        """
+        Add txs held in a DataFrame or pyarrow Table, one tx per row with the
+        same fields add_tx accepts. Non-taxable txs skip tx and entry objects,
+        and all entries reach the ledger in one append. The book ends up the
+        same as add_txs on the rows as dicts.
+
+        Args:
+            txs (DataFrame): Txs to add.
+        """
+        txs = TxFrame(txs)
+        columns = entry_columns()
+        try:
+            for i in range(len(txs)):
+                start = len(self.ledger.store) + len(columns['timestamp'])
+                if not txs.bulk[i]:
+                    record = txs.tx(i)
+                    append_entries(columns, self.book_tx(create_tx(**record), source=record, start=start))
+                    continue
+                symbols, lot = txs.add_entries(i, columns)
+                self.booked += 1
+                spans = {}
+                for symbol in symbols:
+                    journal = self.get_position(symbol).journal
+                    if self.track_history:
+                        spans[symbol] = (len(journal), len(journal))
+                if lot is not None:
+                    symbol, id, price, timestamp, qty = lot
+                    self.positions[symbol].add(id, price, timestamp, qty)
+                    if self.track_history:
+                        spans[symbol] = (spans[symbol][0], len(self.positions[symbol].journal))
+                if self.track_history:
+                    self.history.append((txs.timestamps[i], txs.tx(i), start, spans))
+        finally:
+            # entries of txs booked before an error still reach the ledger
+            self.ledger.add_entries(columns)
+        self.checkpoint()
+
+    def add_txs_parallel(self, txs, processes=None):
+        """
+        Add txs like add_txs, booking independent groups of symbols in
+        separate processes. Symbols are grouped when a tx links them (swap
+        base and quote, fees); see partition.group_txs. Positions and
+        entries from each process are merged back in tx order, so the book
+        ends up the same as add_txs.
+
+        Args:
+            txs (list): Txs or tx dicts.
+            processes (int): Worker processes, defaults to the number of CPUs.
+        """
+        txs = sorted(txs, key=tx_timestamp)
+        processes = processes or os.cpu_count() or 1
+        settings = {
+            'tax_rates': self.tax_rates,
+            'relief_strategy': self.relief_strategy,
+            'symbol_relief_strategies': self.symbol_relief_strategies,
+            'numeric_mode': numeric_mode['mode'],
+            'track_history': self.track_history,
+        }
+        jobs = []
+        journals = {}   # journals of positions sent to workers, rejoined below
+        for indexes, symbols in group_txs(txs, processes):
+            positions = {symbol: self.positions[symbol] for symbol in symbols if symbol in self.positions}
+            for symbol, position in positions.items():
+                if position.journal is not None:
+                    journals[symbol] = position.journal
+                    position.journal = []
+            jobs.append((list([(index, txs[index]) for index in indexes]), symbols, positions, settings))
+        if len(jobs) > 1 and processes > 1:
+            with ProcessPoolExecutor(min(processes, len(jobs))) as pool:
+                results = list(pool.map(replay_group, jobs))
+        else:
+            results = list([replay_group(job) for job in jobs])
+
+        owners = {}   # symbol -> positions booked by a worker
+        booked = {}   # tx index -> (symbols, lots on other positions, entries)
+        for positions, group_booked in results:
+            for symbol, position in positions.items():
+                position.tax_rates = self.tax_rates
+                if position.journal is not None:
+                    position.journal = journals.get(symbol, []) + position.journal
+                owners[symbol] = positions
+            booked.update(group_booked)
+
+        columns = entry_columns()
+        try:
+            for index, tx in enumerate(txs):
+                start = len(self.ledger.store) + len(columns['timestamp'])
+                if index not in booked:
+                    source = tx
+                    if not isinstance(tx, BaseTx):
+                        tx = create_tx(**tx)
+                    append_entries(columns, self.book_tx(tx, source=source, start=start))
+                    continue
+                symbols, lots, entries, owned_spans = booked[index]
+                self.booked += 1
+                spans = {}
+                for symbol, (begin, end) in owned_spans.items():
+                    offset = len(journals.get(symbol, []))
+                    spans[symbol] = (begin + offset, end + offset)
+                for symbol in symbols:
+                    if symbol not in self.positions:
+                        self.positions[symbol] = owners[symbol][symbol] if symbol in owners else Position(symbol, self.tax_rates, journal=self.track_history)
+                    if self.track_history and symbol not in spans:
+                        journal = self.positions[symbol].journal
+                        spans[symbol] = (len(journal), len(journal))
+                for symbol, id, price, timestamp, qty in lots:
+                    self.positions[symbol].add(id, price, timestamp, qty)
+                    if self.track_history:
+                        spans[symbol] = (spans[symbol][0], len(self.positions[symbol].journal))
+                if self.track_history:
+                    self.history.append((tx_timestamp(tx), tx, start, spans))
+                self.check_entries(entries)
+                append_entries(columns, entries)
+            for symbol, positions in owners.items():
+                self.positions[symbol] = positions[symbol]
+        finally:
+            self.ledger.add_entries(columns)
+        self.checkpoint()
+
+    def insert_txs(self, txs, auto_detect=True):
+        """
+        Add txs dated before txs already in the book, e.g. trades an
+        exchange backfilled, without rebuilding the book. Each late tx goes
+        after the last booked tx that isn't later than it. Only the later
+        txs touching a symbol with lots that a late tx touches are booked
+        again. Every position they touch is rolled back to just before it
+        is first touched, and ops of other txs on it are replayed from its
+        journal; entries of other txs are moved as they are. The book ends
+        up as if all txs had been added in timestamp order. Marks from
+        mark_to_market on rolled back positions are applied again afterwards.
+        Needs a book created with track_history.
+
+        Args:
+            txs (list): Txs or tx dicts, in any order.
+        """
+        if not self.track_history:
+            raise Exception('insert_txs needs the tx history. Create the BookKeeper with track_history=True')
+        txs = sorted(txs, key=tx_timestamp)
+        self.ledger.materialize()
+        history = self.history
+        points = []   # history index each late tx is inserted at
+        for tx in txs:
+            timestamp = tx_timestamp(tx)
+            point = len(history)
+            while point > (points[-1] if points else 0) and history[point - 1][0] > timestamp:
+                point -= 1
+            points.append(point)
+        if not txs or points[0] == len(history):
+            for tx in txs:
+                self.add_tx(tx, auto_detect)
+            self.checkpoint()
+            return
+
+        # (history index, None) or (None, late tx) in their new order
+        first = points[0]
+        sequence = []
+        late = 0
+        for point in range(first, len(history) + 1):
+            while late < len(txs) and points[late] == point:
+                sequence.append((None, txs[late]))
+                late += 1
+            if point < len(history):
+                sequence.append((point, None))
+
+        # only lots of symbols the late txs touch change, so only txs that
+        # relieve or add to those depend on the insert; ops of the txs booked
+        # again on any other position come out the same as before
+        affected = set()   # symbols with lots whose lot history changes
+        for tx in txs:
+            affected.update([symbol for symbol in tx_symbols(tx) if has_lots(symbol)])
+        rebook = []
+        cuts = {}          # symbol -> journal length to keep
+        pending = set()    # symbols rolled back at the next record touching them
+        for index, tx in sequence:
+            record = None if index is None else history[index]
+            symbols = tx_symbols(tx) if record is None else list(record[3])
+            again = record is None or not affected.isdisjoint(symbols)
+            if again:
+                pending.update([symbol for symbol in symbols if symbol not in cuts])
+            if record is not None:
+                for symbol in pending.intersection(record[3]):
+                    cuts[symbol] = record[3][symbol][0]
+                pending.difference_update(cuts)
+            rebook.append(again)
+        undone = {}
+        for symbol, cut in cuts.items():
+            undone[symbol] = self.positions[symbol].rollback(cut)
+
+        base = entry_start(history[first][2])
+        removed = self.ledger.rollback(base)
+        if self.validated > base:
+            # moved entries are checked again, so earlier findings on them go
+            self.validated = base
+            self.invalid = {key: reason for key, reason in self.invalid.items()
+                            if key[1] < history[first][0]}
+        removed['timestamp'] = removed['timestamp'].tolist()
+        ends = list([entry_start(record[2]) for record in history[first + 1:]]) + [len(self.ledger.store) + len(removed['timestamp'])]
+        records = history[first:]
+        del history[first:]
+        columns = entry_columns()
+        try:
+            for (index, tx), again in zip(sequence, rebook):
+                start = len(self.ledger.store) + len(columns['timestamp'])
+                if again:
+                    source = tx if index is None else records[index - first][1]
+                    tx = source
+                    if auto_detect and not isinstance(tx, BaseTx):
+                        tx = create_tx(**tx)
+                    append_entries(columns, self.book_tx(tx, source=source, start=start))
+                    continue
+                # moved as is, its ops on rolled back positions are replayed
+                timestamp, source, old_start, spans = records[index - first]
+                old_start = entry_start(old_start)
+                end = ends[index - first]
+                for field in ENTRY_FIELDS:
+                    values = removed.get(field)
+                    columns[field].extend(values[old_start - base:end - base] if values is not None else [None] * (end - old_start))
+                moved = {}
+                for symbol, (begin, end) in spans.items():
+                    if symbol in cuts and begin >= cuts[symbol]:
+                        position = self.positions[symbol]
+                        moved_begin = len(position.journal)
+                        position.replay(undone[symbol][begin - cuts[symbol]:end - cuts[symbol]])
+                        moved[symbol] = (moved_begin, len(position.journal))
+                    else:
+                        moved[symbol] = (begin, end)
+                history.append((timestamp, source, start, moved))
+            for symbol, ops in undone.items():
+                self.positions[symbol].replay(list([op for op in ops if op[0] == 'mark']))
+        finally:
+            self.ledger.add_entries(columns)
+        self.checkpoint()
 
     def add_tx(self, tx, auto_detect=True):
+        source = tx
         if auto_detect:
             # if auto detect is allowed and the tx arg isnt already some form of BaseTx
             # create an instance of the correct tx class based on tx data
             if not isinstance(tx, BaseTx):
                 tx = create_tx(**tx)
-        # create position from base_currency if needed
-        if tx.assets['base'].symbol not in self.positions:
-            self.positions[tx.assets['base'].symbol] = Position(
-                tx.assets['base'].symbol)
-
-         # create position from quote_currency if needed
-        if 'quote' in tx.assets and tx.assets['quote'].symbol not in self.positions:
-            self.positions[tx.assets['quote'].symbol] = Position(
-                tx.assets['quote'].symbol)
-
-        if tx.taxable:
-            entries = self.process_taxable(tx)
-        else:
-            entries = tx.get_entries()
+        if self.lazy_entries and self.validation in ['off', 'batch']:
+            self.ledger.defer(self.book_tx(tx, source=source, lazy=True))
+            return
+        entries = self.book_tx(tx, source=source)
+
+        # add new tx's entries to ledger
+        for entry in entries:
+            self.ledger.add_entry(entry)
+
+    def get_position(self, symbol):
+        # position for symbol, created if needed
+        if symbol not in self.positions:
+            self.positions[symbol] = Position(symbol, self.tax_rates, journal=self.track_history)
+        return self.positions[symbol]
+
+    def book_tx(self, tx, lots=None, source=None, start=None, lazy=False):
+        """
+        Update positions for a tx and build its entries without adding
+        them to the ledger. The tx is recorded in history if tracked.
+
+        Args:
+            tx (BaseTx): Tx to book.
+            lots (list): If given, (symbol, id, price, timestamp, qty) of each
+                tax lot the tx opens is appended to it.
+            source (BaseTx or dict): Tx as it was added, kept in history to
+                book it again. Defaults to tx.
+            start (int): Ledger position its entries will get. Defaults to
+                the end of the ledger.
+            lazy (bool): Don't build the entries, return DeferredEntries
+                for Ledger.defer instead.
+
+        Returns:
+            list: The tx's Entry objects.
+        """
+        # create positions from base_currency and quote_currency if needed
+        self.get_position(tx.assets['base'].symbol)
+        if 'quote' in tx.assets:
+            self.get_position(tx.assets['quote'].symbol)
+        journals = {}
+        if self.track_history:
+            for asset in tx.assets.values():
+                if asset.symbol in self.positions:
+                    journals[asset.symbol] = self.positions[asset.symbol].journal
+        begins = {symbol: len(journal) for symbol, journal in journals.items()}
+
+        fills = self.relieve_lots(tx) if tx.taxable else None
 
+        # entries use the template the tx had before get_affected_balances,
+        # which switches a fiat reward's debit to cash after add_tx built them
+        entry_template = tx.entry_template.copy()
         affected_positions = tx.get_affected_balances()
+        tx.entry_template = entry_template
         for symbol, qty in affected_positions.items():
             if qty > 0:
                 # add tx to debit assets to positions
@@ -46,15 +616,34 @@ class BookKeeper:
                              if item.symbol == symbol])[0]
                 self.positions[symbol].add(
                     tx.id, asset.usd_price, tx.timestamp, asset.quantity)
+                if lots is not None:
+                    lots.append((symbol, tx.id, asset.usd_price, tx.timestamp, asset.quantity))
 
-        entry_dicts = list([x.to_dict() for x in entries])
-        entry_check = self.validate_entry_set(entry_dicts)
-        # if not entry_check['valid']:
-        #     print(entry_check)
+        if lazy:
+            start = DeferredEntries(tx, fills)
+        self.booked += 1
+        if self.track_history:
+            self.history.append((
+                tx.timestamp, tx if source is None else source,
+                len(self.ledger.store) if start is None else start,
+                {symbol: (begin, len(journals[symbol])) for symbol, begin in begins.items()}))
+        if lazy:
+            return start
 
-        # add new tx's entries to ledger
-        for entry in entries:
-            self.ledger.add_entry(entry.to_dict())
+        entries = tx_entries(tx, fills)
+        self.check_entries(entries)
+        return entries
+
+    def check_entries(self, entries):
+        # validate one tx's entries if the validation mode asks for it
+        sampled = self.validation == 'sampled' and (self.booked - 1) % self.sample_every == 0
+        if entries and (self.validation == 'tx' or sampled):
+            key = (entries[0].id, entries[0].timestamp)
+            entry_check = self.validate_entry_set(list([entry.to_dict() for entry in entries]))
+            if not entry_check['valid']:
+                self.invalid[key] = entry_check['reason']
+            else:
+                self.invalid.pop(key, None)
 
     def validate_entry_set(self, entries):
         """
@@ -136,7 +725,7 @@ class BookKeeper:
             if 'sub_account' in entry and not isinstance(entry['sub_account'],  str):
                 return {
                     'valid': False,
-                    'reason': 'Incorrect sub_account format. Must be Decimal'
+                    'reason': 'Incorrect sub_account format. Must be string'
                 }
             if 'close_quote' in entry and not isinstance(entry['close_quote'],  Decimal):
                 return {
@@ -160,56 +749,53 @@ class BookKeeper:
         return {'valid': True}
 
     def process_taxable(self, tx):
+        return taxable_entries(tx, self.relieve_lots(tx))
 
-        # check if tx has fee and isnt taxable
-        if 'fee' not in tx.taxable_assets.keys() and len(tx.taxable_assets.keys()) > 0:
-            # fee isnt in taxable assets so just overwrite entry config
-            entries = tx.get_entries(
-                config={'debit': tx.entry_template['debit']})
-        elif len(tx.taxable_assets.keys()) == 1:
-            # the fee is the only taxable asset
-            entries = tx.get_entries()
-        else:
-            # base or quote as well as fee are in taxable assets so just get debit entries
-            entries = tx.generate_debit_entry()
+    def relieve_lots(self, tx):
+        """
+        Close the tax lots a taxable tx's taxable assets are filled from.
 
-        for taxable_asset in tx.taxable_assets.keys():
-            # sort all open tax lots for tx's base currency position
-            position = self.positions[tx.assets[taxable_asset].symbol]
-            open_lots = position.open_tax_lots.copy()
+        Args:
+            tx (TaxableTx): Tx to book.
 
-            for lot in open_lots:
-                lot['tax_liability'] = lot['unrealized_gain'] * \
-                    self.tax_rates[lot['term']]
-            lots = sorted(
-                open_lots, key=lambda x: x['tax_liability'], reverse=True)
+        Returns:
+            list: (taxable asset, lot price, qty, entry type) of each lot
+                filled, in fill order. See taxable_entries.
+        """
+        fills = []
+        for taxable_asset in tx.taxable_assets.keys():
+            # position keeps its open tax lots indexed for each relief strategy
+            symbol = tx.assets[taxable_asset].symbol
+            position = self.positions[symbol]
+            strategy = self.get_relief_strategy(symbol)
 
             tx_type = tx.type if taxable_asset != 'fee' else 'fee'
-            # Loop through open tax lots (sorted by tax liability) until filled
+            # Loop through open tax lots (in relief strategy order) until filled
             # At each tax lot, use fillable qty => all available qty or qty needed to fill order
-            # Create credit entries from tx
             qty = tx.assets[taxable_asset].quantity
             filled_qty = 0  # tracks qty filled from open tax lots
             tax_lot_usage = {}
 
-            while filled_qty < qty and len(lots) > 0:
-                current_lot = lots[0]
-                lot_available_qty = current_lot['qty']
-                lot_price = current_lot['price']
-
-                unfilled_qty = qty - filled_qty
-                fillable_qty = unfilled_qty if lot_available_qty > unfilled_qty else lot_available_qty
+            # lots are relieved in the order they had before the first close
+            position.hold_marks()
+            try:
+                current_lot = position.next_tax_lot(strategy, tx.lot_ids)
+                while filled_qty < qty and current_lot is not None:
+                    lot_available_qty = current_lot['qty']
+                    lot_price = current_lot['price']
 
-                # partially or fully close position
-                tax_lot_usage = {}
-                tax_lot_usage[current_lot['id']] = fillable_qty
-                position.close(tx.id, lot_price, tx.timestamp, tax_lot_usage)
+                    unfilled_qty = qty - filled_qty
+                    fillable_qty = unfilled_qty if lot_available_qty > unfilled_qty else lot_available_qty
 
-                closing_entries = tx.generate_credit_entries(
-                    taxable_asset, lot_price, fillable_qty, type=tx_type)
+                    # partially or fully close position
+                    tax_lot_usage = {}
+                    tax_lot_usage[current_lot['id']] = fillable_qty
+                    position.close(tx.id, lot_price, tx.timestamp, tax_lot_usage)
 
-                entries += closing_entries
-                filled_qty += fillable_qty
-                del lots[0]
+                    fills.append((taxable_asset, lot_price, fillable_qty, tx_type))
+                    filled_qty += fillable_qty
+                    current_lot = position.next_tax_lot(strategy, tx.lot_ids)
+            finally:
+                position.release_marks()
 
-        return entries
+        return fills
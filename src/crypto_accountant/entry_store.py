@@ -0,0 +1,646 @@
+"""
+The EntryStore keeps ledger entries column by column instead of as a
+list of dicts. String fields are stored as integer codes into a per field
+dictionary, timestamps as int64 nanoseconds (UTC) and amounts in their own
+growable columns. DataFrames are built straight from the columns, so no
+per entry dicts are created when the Ledger builds its views.
+
+In fixed point mode every amount column is native int64 storage: value
+as int64 cents, and quantity/quote/close_quote, which are scaled by
+10 ** 18 and would overflow a single int64, as WideAmounts. Views still
+decode them back to Decimals, while scaled_column gives aggregations the
+integers directly. In decimal mode amounts stay Python lists of Decimals,
+so they round exactly the way Entry does.
+
+  Typical usage example:
+    store = EntryStore()
+    store.append(entry)
+    df = store.frame()
+"""
+from array import array
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from .transactions.components.entry import Entry
+from .transactions.utils import is_fixed_point, to_scaled, from_scaled, QUANTITY_PRECISION, PRICE_PRECISION, VALUE_PRECISION
+
+CATEGORICAL_FIELDS = ['id', 'account_type', 'account', 'sub_account', 'symbol', 'side', 'type']
+AMOUNT_FIELDS = ['quantity', 'value', 'quote', 'close_quote']
+AMOUNT_PRECISIONS = {
+    'quantity': QUANTITY_PRECISION,
+    'value': VALUE_PRECISION,
+    'quote': PRICE_PRECISION,
+    'close_quote': PRICE_PRECISION,
+}
+# column order matches Entry.to_dict
+FIELDS = ['id', 'account_type', 'account', 'sub_account', 'timestamp',
+          'symbol', 'side', 'type', 'quantity', 'value', 'quote', 'close_quote']
+# optional fields only become columns once an entry includes them
+OPTIONAL_FIELDS = ['close_quote']
+KNOWN_FIELDS = set(FIELDS)
+NAT = np.iinfo(np.int64).min
+MISSING = np.iinfo(np.int64).min   # missing int64 amount
+WIDE_SCALE = 10 ** QUANTITY_PRECISION   # fraction scale of WideAmounts
+WIDE_UNITS = np.iinfo(np.int64).max // WIDE_SCALE   # whole units that fit one scaled int64
+
+
+def to_nanoseconds(timestamp):
+    if timestamp is None or timestamp is pd.NaT:
+        return NAT
+    if not isinstance(timestamp, pd.Timestamp):
+        timestamp = pd.Timestamp(timestamp)
+    return timestamp.value
+
+
+def amount_strings(values, fixed):
+    """
+    Amounts as strings, '' for missing amounts. Returns None when the
+    column holds anything other than Decimals (ints in fixed point mode)
+    and missing values.
+    """
+    if isinstance(values, EncodedAmounts):
+        return values.strings()
+    kind = int if fixed else Decimal
+    strings = []
+    for value in values:
+        if type(value) is kind:
+            strings.append(str(value))
+        elif value is None or (isinstance(value, float) and np.isnan(value)):
+            strings.append('')
+        else:
+            return None
+    return strings
+
+
+def encode_amounts(values, fixed):
+    """
+    Dictionary encode an amount column: newline separated distinct
+    amounts plus an int32 code per entry. Amounts repeat a lot (every
+    entry of a tx shares its quote), so this is far smaller than the
+    column itself.
+
+    Returns:
+        tuple: (distinct amounts text, codes bytes) or None, see amount_strings.
+    """
+    strings = amount_strings(values, fixed)
+    if strings is None:
+        return None
+    codes, uniques = pd.factorize(pd.Series(strings, dtype=object))
+    return '\n'.join(uniques), codes.astype(np.int32).tobytes()
+
+
+def decode_amounts(text, codes, fixed):
+    codes = np.frombuffer(codes, dtype=np.int32)
+    if not len(codes):
+        return []
+    kind = int if fixed else Decimal
+    missing = None if fixed else np.nan
+    uniques = np.array([kind(x) if x else missing for x in text.split('\n')] + [missing], dtype=object)
+    return uniques.take(codes).tolist()
+
+
+class EncodedAmounts:
+    """
+    Amount column restored from a snapshot. History stays encoded until
+    something reads it; entries appended since the restore are kept in a
+    plain list, so adding txs on top of a snapshot never decodes history.
+    """
+
+    def __init__(self, text, codes, fixed) -> None:
+        self.text = text
+        self.codes = codes
+        self.count = len(codes) // 4
+        self.fixed = fixed
+        self.tail = []
+        self.values = None
+
+    def __len__(self):
+        if self.values is not None:
+            return len(self.values)
+        return self.count + len(self.tail)
+
+    def __iter__(self):
+        return iter(self.decoded())
+
+    def __getitem__(self, key):
+        if self.values is None:
+            start = key.start or 0 if isinstance(key, slice) else None
+            if start is not None and key.step is None and start >= self.count:
+                return self.tail[start - self.count:None if key.stop is None else key.stop - self.count]
+            if isinstance(key, int) and key < 0 and -key <= len(self.tail):
+                return self.tail[key]
+        return self.decoded()[key]
+
+    def append(self, value):
+        (self.tail if self.values is None else self.values).append(value)
+
+    def extend(self, values):
+        (self.tail if self.values is None else self.values).extend(values)
+
+    def __delitem__(self, key):
+        # trailing slices only, see EntryStore.truncate
+        start = key.start or 0
+        if self.values is None and start >= self.count:
+            del self.tail[start - self.count:]
+        else:
+            del self.decoded()[start:]
+
+    def decoded(self):
+        if self.values is None:
+            self.values = decode_amounts(self.text, self.codes, self.fixed) + self.tail
+            self.text = self.codes = self.tail = None
+        return self.values
+
+    def strings(self):
+        # amounts as strings without decoding them
+        if self.values is not None:
+            return amount_strings(self.values, self.fixed)
+        tail = amount_strings(self.tail, self.fixed)
+        if tail is None:
+            return None
+        uniques = np.array(self.text.split('\n') + [''], dtype=object)
+        return uniques.take(np.frombuffer(self.codes, dtype=np.int32)).tolist() + tail
+
+
+class WideAmounts:
+    """
+    Fixed point amount column scaled by 10 ** 18. Each amount is kept as
+    whole units and the fraction scaled by 10 ** 18, in two int64 arrays.
+    Reads give back the scaled Python ints, None for missing amounts.
+    """
+
+    def __init__(self, values=()) -> None:
+        self.units = array('q')
+        self.fractions = array('q')
+        self.extend(values)
+
+    def __len__(self):
+        return len(self.units)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(map(self._join, self.units[key], self.fractions[key]))
+        return self._join(self.units[key], self.fractions[key])
+
+    def __delitem__(self, key):
+        del self.units[key]
+        del self.fractions[key]
+
+    def append(self, value):
+        units, fraction = self._split(value)
+        self.units.append(units)
+        self.fractions.append(fraction)
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def missing(self, start=0):
+        return np.frombuffer(self.units, dtype=np.int64)[start:] == MISSING
+
+    def scaled(self, start=0):
+        """
+        Amounts from start on as one scaled array, int64 when every amount
+        fits and Python ints otherwise. Missing amounts are 0.
+        """
+        missing = self.missing(start)
+        units = np.where(missing, 0, np.frombuffer(self.units, dtype=np.int64)[start:])
+        fractions = np.where(missing, 0, np.frombuffer(self.fractions, dtype=np.int64)[start:])
+        if not len(units) or (units.min() >= -WIDE_UNITS and units.max() < WIDE_UNITS):
+            return units * WIDE_SCALE + fractions
+        return units.astype(object) * WIDE_SCALE + fractions.astype(object)
+
+    def take(self, order):
+        taken = WideAmounts()
+        taken.units = array('q', np.frombuffer(self.units, dtype=np.int64).take(order).tobytes())
+        taken.fractions = array('q', np.frombuffer(self.fractions, dtype=np.int64).take(order).tobytes())
+        return taken
+
+    @classmethod
+    def concat(cls, columns):
+        joined = cls()
+        for column in columns:
+            joined.units.extend(column.units)
+            joined.fractions.extend(column.fractions)
+        return joined
+
+    @staticmethod
+    def _split(value):
+        if value is None:
+            return MISSING, 0
+        return divmod(value, WIDE_SCALE)
+
+    @staticmethod
+    def _join(units, fraction):
+        return None if units == MISSING else units * WIDE_SCALE + fraction
+
+
+def amount_columns(fixed):
+    # empty amount columns of a store in the given numeric mode
+    if not fixed:
+        return {field: [] for field in AMOUNT_FIELDS}
+    return {field: array('q') if field == 'value' else WideAmounts() for field in AMOUNT_FIELDS}
+
+
+class Categories:
+    """
+    Dictionary encoding for a single string column.
+    """
+
+    def __init__(self) -> None:
+        self.values = []
+        self.lookup = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, value):
+        if value is None:
+            return -1
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.lookup[value] = code
+            self.values.append(value)
+        return code
+
+    def decode(self, codes):
+        # missing values (-1) decode to nan like a missing dict key would
+        values = np.empty(len(self.values) + 1, dtype=object)
+        values[:-1] = self.values
+        values[-1] = np.nan
+        return values.take(codes)
+
+
+class EntryStore:
+
+    def __init__(self) -> None:
+        self.categories = {field: Categories() for field in CATEGORICAL_FIELDS}
+        self.codes = {field: array('i') for field in CATEGORICAL_FIELDS}
+        self.timestamps = array('q')
+        self.fixed = is_fixed_point()
+        self.amounts = amount_columns(self.fixed)
+        self.present = set(FIELDS) - set(OPTIONAL_FIELDS)
+        self.extras = {}   # columns for keys outside of FIELDS
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getstate__(self):
+        # decimal amount columns are pickled as text, which restores far
+        # faster than pickled Decimals and is only decoded when first read
+        state = self.__dict__.copy()
+        amounts = {}
+        for field, values in self.amounts.items():
+            encoded = None if isinstance(values, (array, WideAmounts)) else encode_amounts(values, self.fixed)
+            amounts[field] = values if encoded is None else encoded
+        state['amounts'] = amounts
+        return state
+
+    def __setstate__(self, state):
+        for field, values in state['amounts'].items():
+            if isinstance(values, tuple):
+                state['amounts'][field] = EncodedAmounts(*values, state['fixed'])
+        self.__dict__.update(state)
+
+    def append(self, entry):
+        if isinstance(entry, Entry):
+            return self._append_entry(entry)
+        for field in CATEGORICAL_FIELDS:
+            self.codes[field].append(self.categories[field].encode(entry.get(field)))
+        self.timestamps.append(to_nanoseconds(entry.get('timestamp')))
+        for field in AMOUNT_FIELDS:
+            self.amounts[field].append(self._encode_amount(field, entry.get(field)))
+        for field in OPTIONAL_FIELDS:
+            if field in entry:
+                self.present.add(field)
+        if self.extras or not KNOWN_FIELDS.issuperset(entry):
+            self._append_extras(entry)
+        self.size += 1
+
+    def _append_entry(self, entry):
+        # Entry objects are read field by field; when the entry and the store
+        # share a numeric mode its amounts are stored as they are
+        for field in CATEGORICAL_FIELDS:
+            self.codes[field].append(self.categories[field].encode(getattr(entry, field)))
+        self.timestamps.append(to_nanoseconds(entry.timestamp))
+        if entry._fixed == self.fixed:
+            amounts = [entry._quantity, entry._value, entry._quote, entry._close_quote]
+        else:
+            amounts = list([self._encode_amount(field, getattr(entry, field)) for field in AMOUNT_FIELDS])
+        if entry._close_quote == 0:
+            amounts[3] = self._encode_amount('close_quote', None)
+        else:
+            self.present.add('close_quote')
+        for field, amount in zip(AMOUNT_FIELDS, amounts):
+            self.amounts[field].append(amount)
+        if self.extras:
+            self._append_extras(entry.to_dict())
+        self.size += 1
+
+    def extend(self, columns):
+        """
+        Append many entries given column by column. String columns are
+        encoded once per distinct value rather than once per entry.
+
+        Args:
+            columns (dict): Field -> list of values, all the same length.
+                Timestamps may be given as int64 nanoseconds.
+        """
+        count = len(columns['timestamp'])
+        for field in CATEGORICAL_FIELDS:
+            values = columns.get(field)
+            if values is None:
+                self.codes[field].extend(array('i', [-1]) * count)
+                continue
+            codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+            lookup = np.array([self.categories[field].encode(x) for x in uniques] + [-1], dtype=np.int32)
+            self.codes[field].extend(array('i', lookup.take(codes).tobytes()))
+        timestamps = columns['timestamp']
+        if not (isinstance(timestamps, np.ndarray) and timestamps.dtype == np.int64):
+            timestamps = np.array([to_nanoseconds(x) for x in timestamps], dtype=np.int64)
+        self.timestamps.extend(array('q', timestamps.tobytes()))
+        for field in AMOUNT_FIELDS:
+            values = columns.get(field, [None] * count)
+            self.amounts[field].extend([self._encode_amount(field, x) for x in values])
+            if field in OPTIONAL_FIELDS and any(x is not None and not self._is_missing(x) for x in values):
+                self.present.add(field)
+        for field in columns:
+            if field not in KNOWN_FIELDS and field not in self.extras:
+                self.extras[field] = [np.nan] * self.size
+        for field, values in self.extras.items():
+            values.extend(columns.get(field, [np.nan] * count))
+        self.size += count
+
+    def truncate(self, size):
+        """
+        Remove the entries from size on.
+
+        Args:
+            size (int): Entries to keep.
+
+        Returns:
+            dict: The removed entries column by column, in the form extend
+                takes. Timestamps are int64 nanoseconds.
+        """
+        removed = {}
+        for field in self.columns():
+            if field in CATEGORICAL_FIELDS:
+                removed[field] = self.column(field, size).tolist()
+            elif field in AMOUNT_FIELDS:
+                amounts = self.amounts[field][size:]
+                removed[field] = list([self.decode_amount(field, x) for x in amounts]) if self.fixed else list(amounts)
+            elif field != 'timestamp':
+                removed[field] = self.extras[field][size:]
+        removed['timestamp'] = self.timestamp_array()[size:].copy()
+        for values in self.codes.values():
+            del values[size:]
+        del self.timestamps[size:]
+        for values in self.amounts.values():
+            del values[size:]
+        for values in self.extras.values():
+            del values[size:]
+        self.size = min(self.size, size)
+        return removed
+
+    @classmethod
+    def merge(cls, stores):
+        """
+        Combine stores into a new one ordered by timestamp. Entries with
+        equal timestamps keep the order of stores and, within a store,
+        their own order; entries without one go last. The first store's
+        dictionaries carry over unchanged and every store's codes are
+        remapped through a table built once per distinct value. A stable
+        sort of the concatenated timestamps merges the stores' already
+        sorted runs, and columns are kept in place when no entries move.
+
+        Args:
+            stores (list): EntryStores kept in the same numeric mode.
+
+        Returns:
+            EntryStore: The merged entries.
+        """
+        if len(set([store.fixed for store in stores])) > 1:
+            raise Exception('Cannot merge ledgers kept in different numeric modes')
+        merged = cls()
+        merged.fixed = stores[0].fixed if stores else merged.fixed
+        merged.amounts = amount_columns(merged.fixed)
+        merged.size = sum([len(store) for store in stores])
+        if not stores:
+            return merged
+        timestamps = np.concatenate([store.timestamp_array() for store in stores])
+        order = np.argsort(np.where(timestamps == NAT, np.iinfo(np.int64).max, timestamps), kind='stable')
+        moved = bool(len(order)) and bool((order != np.arange(len(order))).any())
+
+        def take(values):
+            if not moved:
+                return values
+            if isinstance(values, list):
+                return list(map(values.__getitem__, order.tolist()))
+            return values.take(order)
+
+        for field in CATEGORICAL_FIELDS:
+            categories = merged.categories[field]
+            codes = []
+            for store in stores:
+                table = np.array([categories.encode(x) for x in store.categories[field].values] + [-1], dtype=np.int32)
+                codes.append(table.take(store.code_array(field)))
+            merged.codes[field] = array('i', take(np.concatenate(codes)).tobytes())
+        merged.timestamps = array('q', take(timestamps).tobytes())
+        for field in AMOUNT_FIELDS:
+            if merged.fixed and field == 'value':
+                values = np.concatenate([np.frombuffer(store.amounts[field], dtype=np.int64, count=len(store)) for store in stores])
+                merged.amounts[field] = array('q', take(values).tobytes())
+                continue
+            if merged.fixed:
+                values = WideAmounts.concat([store.amounts[field] for store in stores])
+                merged.amounts[field] = values.take(order) if moved else values
+                continue
+            values = []
+            for store in stores:
+                values.extend(store.amounts[field][:len(store)])
+            merged.amounts[field] = take(values)
+        merged.present = set().union(*[store.present for store in stores])
+        for field in dict.fromkeys([field for store in stores for field in store.extras]):
+            values = []
+            for store in stores:
+                values.extend(store.extras.get(field, [np.nan] * len(store))[:len(store)])
+            merged.extras[field] = take(values)
+        return merged
+
+    def column(self, field, start=0):
+        """
+        Decoded values of a single field.
+
+        Args:
+            field (str): Field name.
+            start (int): First entry to include.
+
+        Returns:
+            ndarray: Values in entry order.
+        """
+        if field in CATEGORICAL_FIELDS:
+            return self.categories[field].decode(self.code_array(field)[start:])
+        if field == 'timestamp':
+            return pd.DatetimeIndex(self.timestamp_array()[start:].view('M8[ns]')).tz_localize('UTC')
+        values = np.empty(self.size - start, dtype=object)
+        if field in AMOUNT_FIELDS:
+            amounts = self.amounts[field][start:]
+            values[:] = list([self.decode_amount(field, x) for x in amounts]) if self.fixed else amounts
+        else:
+            values[:] = self.extras[field][start:]
+        return values
+
+    def scaled_column(self, field, start=0):
+        """
+        Amount column as integers scaled by 10 ** precision. Returns a
+        native int64 array when every amount fits, otherwise an object
+        array of Python ints. Missing amounts are 0.
+
+        Args:
+            field (str): Amount field.
+            start (int): First entry to include.
+
+        Returns:
+            ndarray: Scaled amounts in entry order.
+        """
+        if self.fixed and field == 'value':
+            values = np.frombuffer(self.amounts[field], dtype=np.int64, count=self.size)[start:]
+            return np.where(values == MISSING, 0, values)
+        if self.fixed:
+            return self.amounts[field].scaled(start)
+        amounts = list([self.scale_amount(field, x) for x in self.amounts[field][start:]])
+        try:
+            return np.array(amounts, dtype=np.int64)
+        except OverflowError:
+            values = np.empty(len(amounts), dtype=object)
+            values[:] = amounts
+            return values
+
+    def malformed(self, field, start=0):
+        """
+        Which entries have a missing or wrongly typed field: strings for
+        categorical fields, a timestamp, Decimals for amounts (any stored
+        amount in fixed point mode). Optional fields may be missing.
+
+        Args:
+            field (str): Field name.
+            start (int): First entry to include.
+
+        Returns:
+            ndarray: Boolean mask in entry order.
+        """
+        count = self.size - start
+        optional = field in OPTIONAL_FIELDS or field == 'sub_account'
+        if field in CATEGORICAL_FIELDS:
+            codes = self.code_array(field)[start:]
+            wrong = list([code for code, value in enumerate(self.categories[field].values) if not isinstance(value, str)])
+            return np.isin(codes, wrong) | (False if optional else codes < 0)
+        if field == 'timestamp':
+            return self.timestamp_array()[start:] == NAT
+        if self.fixed and field == 'value':
+            return np.frombuffer(self.amounts[field], dtype=np.int64, count=self.size)[start:] == MISSING
+        if self.fixed:
+            return np.zeros(count, dtype=bool) if optional else self.amounts[field].missing(start)
+        amounts = self.amounts[field][start:]
+        decimal = np.fromiter((isinstance(x, Decimal) for x in amounts), dtype=bool, count=count)
+        if optional:
+            return ~decimal & ~np.fromiter((self._is_missing(x) for x in amounts), dtype=bool, count=count)
+        return ~decimal
+
+    def last_amount(self, field):
+        # amount of the latest entry as stored, 0 when missing
+        return self._stored_amount(field, self.amounts[field][-1])
+
+    def amount_slice(self, field, start):
+        # amounts from start on as stored, 0 when missing
+        return list([self._stored_amount(field, x) for x in self.amounts[field][start:]])
+
+    def _stored_amount(self, field, amount):
+        if self._is_missing(amount) or amount is None or (self.fixed and field == 'value' and amount == MISSING):
+            return 0
+        return amount
+
+    def scale_amount(self, field, amount):
+        if self._is_missing(amount) or amount is None:
+            return 0
+        return amount if self.fixed else to_scaled(amount, AMOUNT_PRECISIONS[field])
+
+    def decode_amount(self, field, amount):
+        if not self.fixed:
+            return amount
+        if amount is None or (field == 'value' and amount == MISSING):
+            return np.nan
+        return from_scaled(amount, AMOUNT_PRECISIONS[field])
+
+    def _encode_amount(self, field, amount):
+        if amount is None:
+            amount = np.nan
+        if not self.fixed:
+            return amount
+        if self._is_missing(amount):
+            return MISSING if field == 'value' else None
+        return to_scaled(amount, AMOUNT_PRECISIONS[field])
+
+    def code_array(self, field):
+        # zero copy view of a categorical column's codes
+        return np.frombuffer(self.codes[field], dtype=np.int32, count=self.size)
+
+    def timestamp_array(self):
+        return np.frombuffer(self.timestamps, dtype=np.int64, count=self.size)
+
+    def columns(self):
+        return [field for field in FIELDS if field in self.present] + list(self.extras.keys())
+
+    def frame(self, start=0):
+        """
+        Entries as a DataFrame, same shape as pd.DataFrame(entries).
+
+        Args:
+            start (int): First entry to include. Index values keep their
+                position in the store.
+
+        Returns:
+            DataFrame: Unindexed DataFrame
+        """
+        if self.size - start <= 0:
+            return pd.DataFrame()
+        return pd.DataFrame(
+            {field: self.column(field, start) for field in self.columns()},
+            index=pd.RangeIndex(start, self.size))
+
+    def rows(self):
+        """
+        Rebuild the entries as dicts. Missing optional fields are left out.
+
+        Yields:
+            dict: A single entry.
+        """
+        columns = self.columns()
+        data = {field: self.column(field) for field in columns}
+        for i in range(self.size):
+            row = {}
+            for field in columns:
+                value = data[field][i]
+                if self._is_missing(value):
+                    continue
+                row[field] = value
+            yield row
+
+    def _append_extras(self, entry):
+        for field, value in entry.items():
+            if field in FIELDS:
+                continue
+            if field not in self.extras:
+                self.extras[field] = [np.nan] * self.size
+            self.extras[field].append(value)
+        for field, values in self.extras.items():
+            if len(values) == self.size:
+                values.append(np.nan)
+
+    def _is_missing(self, value):
+        return value is pd.NaT or (isinstance(value, float) and np.isnan(value))
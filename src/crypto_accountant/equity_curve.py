@@ -0,0 +1,189 @@
+"""
+An EquityCurve keeps the daily running quantity balance of every symbol
+for one account type. Balances are integers scaled by
+10 ** QUANTITY_PRECISION, which overflow a single int64, so each is held
+as three int64 limbs: whole units and two nine digit parts of the
+fraction. Day by symbol matrices of limbs are summed with np.cumsum and
+carried between limbs afterwards, so sums are exact and native. Balances
+are only decoded to Decimals when a frame is read. The curve is brought
+up to date from the EntryStore incrementally: only entries appended since
+the last update are read, and only days from the earliest of them on are
+re-accumulated.
+
+  Typical usage example:
+    curve = EquityCurve('assets')
+    curve.update(store)
+    df = curve.frame()
+"""
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from .entry_store import NAT
+from .transactions.utils import from_scaled, QUANTITY_PRECISION
+
+DAY = 24 * 60 * 60 * 10 ** 9   # nanoseconds
+ZERO = Decimal(0)
+LIMB = 10 ** 9   # scale of each fraction limb, two make up QUANTITY_PRECISION
+
+
+def decode_balance(balance):
+    return from_scaled(balance, QUANTITY_PRECISION) if balance else ZERO
+
+
+def split_limbs(values):
+    """
+    Scaled quantities as int64 limbs.
+
+    Args:
+        values (ndarray): Quantities scaled by 10 ** QUANTITY_PRECISION,
+            int64 or Python ints.
+
+    Returns:
+        ndarray: (len(values), 3) int64 whole units, then the fraction's
+            first and last nine digits, each fraction limb in [0, LIMB).
+    """
+    units = values // (LIMB * LIMB)
+    rest = values % (LIMB * LIMB)
+    return np.stack([units, rest // LIMB, rest % LIMB], axis=-1).astype(np.int64)
+
+
+def carry(limbs):
+    # bring summed fraction limbs back into [0, LIMB), in place
+    for i in [2, 1]:
+        limbs[..., i - 1] += limbs[..., i] // LIMB
+        limbs[..., i] %= LIMB
+    return limbs
+
+
+def join_limbs(limbs):
+    # limbs -> scaled quantities as Python ints
+    limbs = limbs.astype(object)
+    return (limbs[..., 0] * LIMB + limbs[..., 1]) * LIMB + limbs[..., 2]
+
+
+class EquityCurve:
+
+    def __init__(self, account_type) -> None:
+        self.account_type = account_type
+        self.reset()
+
+    def reset(self):
+        self.size = 0            # entries read from the store
+        self.first_day = None    # day number of row 0
+        self.days = 0            # rows in use
+        self.changes = np.zeros((0, 0, 3), dtype=np.int64)    # net change limbs per day and symbol code
+        self.balances = np.zeros((0, 0, 3), dtype=np.int64)   # running balance limbs per day and symbol code
+        self.decoded = {}                                      # as_float -> balances decoded when read
+        self.stale = {}                                        # as_float -> first decoded row out of date
+        self.seen = np.zeros(0, dtype=bool)                    # symbol codes with entries
+        self.symbols = []
+
+    def update(self, store):
+        """
+        Read entries appended to store since the last update.
+
+        Args:
+            store (EntryStore): The ledger's entries.
+        """
+        if len(store) < self.size:
+            self.reset()
+        start = self.size
+        if len(store) == start:
+            return
+        self.size = len(store)
+        symbols = store.code_array('symbol')[start:]
+        timestamps = store.timestamp_array()[start:]
+        keep = (symbols >= 0) & (timestamps != NAT)
+        if not keep.any():
+            return
+        days = timestamps[keep] // DAY
+        symbols = symbols[keep]
+
+        # signed quantity, only entries of this account type count
+        categories = store.categories
+        sides = store.code_array('side')[start:][keep]
+        sign = np.where(sides == categories['side'].lookup.get('debit', -2), 1,
+                        np.where(sides == categories['side'].lookup.get('credit', -2), -1, 0))
+        if self.account_type != 'assets':
+            sign = -sign
+        sign[store.code_array('account_type')[start:][keep] != categories['account_type'].lookup.get(self.account_type, -2)] = 0
+        quantities = split_limbs(store.scaled_column('quantity', start)[keep]) * sign[:, None]
+
+        self.symbols = categories['symbol'].values
+        days_before = self.days + self._reshape(int(days.min()), int(days.max()), len(self.symbols))
+        rows = days - self.first_day
+        np.add.at(self.changes, (rows, symbols), quantities)
+        self.seen[symbols] = True
+        # days added after the last one carry its balances forward
+        self._accumulate(min(int(rows.min()), days_before))
+
+    def frame(self, as_float=False):
+        """
+        Running balances with one row per day and one column per symbol.
+
+        Args:
+            as_float (bool): Return float64 balances instead of Decimals.
+
+        Returns:
+            DataFrame: DataFrame with a daily UTC index named timestamp
+        """
+        if not self.days:
+            return pd.DataFrame()
+        codes = np.flatnonzero(self.seen)
+        names = list([self.symbols[code] for code in codes])
+        order = codes[np.argsort(names, kind='mergesort')]
+        values = self._decode(as_float)[:self.days, order]
+        index = pd.DatetimeIndex((self.first_day + np.arange(self.days)) * DAY, tz='UTC', freq='D', name='timestamp')
+        return pd.DataFrame(values, index=index, columns=sorted(names))
+
+    def _reshape(self, first_day, last_day, symbols):
+        # make room for days first_day..last_day and symbols symbol codes
+        if self.first_day is None:
+            self.first_day = first_day
+        shift = max(self.first_day - first_day, 0)
+        days = max(self.days + shift, last_day - self.first_day + shift + 1)
+        capacity, width = self.changes.shape[:2]
+        if shift or days > capacity or symbols > width:
+            capacity = max(days, 2 * capacity)
+            width = max(symbols, width)
+            for name in ['changes', 'balances']:
+                old = getattr(self, name)
+                new = np.zeros((capacity, width, 3), dtype=np.int64)
+                new[shift:shift + self.days, :old.shape[1]] = old[:self.days]
+                setattr(self, name, new)
+            seen = np.zeros(width, dtype=bool)
+            seen[:len(self.seen)] = self.seen
+            self.seen = seen
+            for as_float, old in self.decoded.items():
+                new = np.full((capacity, width), 0.0 if as_float else ZERO, dtype=old.dtype)
+                new[shift:shift + self.days, :old.shape[1]] = old[:self.days]
+                self.decoded[as_float] = new
+                self.stale[as_float] += shift
+            self.first_day -= shift
+        self.days = days
+        return shift
+
+    def _accumulate(self, row):
+        # re-accumulate running balances from row on
+        balances = np.cumsum(self.changes[row:self.days], axis=0)
+        if row > 0:
+            balances += self.balances[row - 1]
+        self.balances[row:self.days] = carry(balances)
+        for as_float, stale in self.stale.items():
+            self.stale[as_float] = min(stale, row)
+
+    def _decode(self, as_float):
+        # balances as float64 or Decimals, only rows changed since the last read are decoded
+        decoded = self.decoded.get(as_float)
+        if decoded is None:
+            decoded = self.decoded[as_float] = np.empty(self.balances.shape[:2], dtype=np.float64 if as_float else object)
+            self.stale[as_float] = 0
+        stale = self.stale[as_float]
+        if stale < self.days:
+            balances = join_limbs(self.balances[stale:self.days])
+            if as_float:
+                decoded[stale:self.days] = balances.astype(np.float64) / 10 ** QUANTITY_PRECISION
+            else:
+                decoded[stale:self.days] = np.frompyfunc(decode_balance, 1, 1)(balances)
+            self.stale[as_float] = self.days
+        return decoded
@@ -0,0 +1,259 @@
+"""
+Bulk ingestion of txs held in a pandas DataFrame or pyarrow Table.
+
+Non-taxable txs (deposits, withdrawals, receives, rewards, interest) only
+ever add tax lots and produce fixed entries, so they are built column by
+column straight into the Ledger's EntryStore without creating tx, asset
+or entry objects. Taxable txs still go through BookKeeper.add_tx one row
+at a time, in timestamp order with the rest of the frame.
+
+  Typical usage example:
+    txs = TxFrame(df)
+    columns = entry_columns()
+    for i in range(len(txs)):
+        if txs.bulk[i]:
+            symbols, lot = txs.add_entries(i, columns)
+"""
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from .transactions import deposit, withdrawal, receive, reward, interest_in_stake, interest_in_account
+from .transactions.base import fee_config
+from .transactions.utils import round_amount, QUANTITY_PRECISION, PRICE_PRECISION, VALUE_PRECISION
+from .utils import check_type, normalize_key, TX_TYPES
+
+# tx type -> (entry template, debit config used instead when the base is fiat)
+# reward switches its debit to cash only after its entries are built, so it never applies
+BULK_TEMPLATES = {
+    'deposit': (deposit.entry_template, None),
+    'withdrawal': (withdrawal.entry_template, None),
+    'receive': (receive.entry_template, None),
+    'reward': (reward.entry_template, None),
+    'interest-in-stake': (interest_in_stake.entry_template, interest_in_stake.debit_cash_base_entry),
+    'interest-in-account': (interest_in_account.entry_template, interest_in_account.debit_cash_base_entry),
+}
+# class each template belongs to, types registered to another class go through create_tx
+BULK_CLASSES = {
+    'deposit': deposit.Deposit,
+    'withdrawal': withdrawal.Withdrawal,
+    'receive': receive.Receive,
+    'reward': reward.Reward,
+    'interest-in-stake': interest_in_stake.InterestInStake,
+    'interest-in-account': interest_in_account.InterestInAccount,
+}
+# sign of the base quantity in each type's affected balances
+BASE_SIGNS = {'withdrawal': -1}
+ENTRY_FIELDS = ['id', 'account_type', 'account', 'sub_account', 'timestamp',
+                'symbol', 'side', 'type', 'quantity', 'value', 'quote', 'close_quote']
+
+
+def to_frame(txs):
+    """
+    Normalize a tx table the way create_tx normalizes a tx dict. Column
+    names are converted to snake case, timestamps are parsed and rows are
+    sorted by timestamp, keeping input order for equal timestamps. Rows
+    without a timestamp go last.
+
+    Args:
+        txs (DataFrame): Txs, one per row. pyarrow Tables are converted.
+
+    Returns:
+        DataFrame: Sorted txs with a RangeIndex.
+    """
+    if not isinstance(txs, pd.DataFrame):
+        txs = txs.to_pandas()
+    frame = txs.copy()
+    frame.columns = [normalize_key(str(column)) for column in frame.columns]
+    # like create_tx, the last of several aliased keys wins
+    frame = frame.loc[:, ~frame.columns.duplicated(keep='last')]
+    if 'timestamp' in frame.columns:
+        frame['timestamp'] = parse_timestamps(frame['timestamp'])
+        nanoseconds = frame['timestamp'].to_numpy(dtype=np.int64)
+        last = np.iinfo(np.int64).max
+        order = np.argsort(np.where(frame['timestamp'].isna().to_numpy(), last, nanoseconds), kind='stable')
+        frame = frame.iloc[order]
+    return frame.reset_index(drop=True)
+
+
+def parse_timestamps(column):
+    """
+    Parse a timestamp column in one pass into UTC timestamps. Like
+    check_type, datetimes with another time zone are relabelled as UTC;
+    strings with an offset are converted to UTC, and ones that don't parse
+    are NaT.
+
+    Returns:
+        Series: datetime64[ns, UTC] timestamps.
+    """
+    if pd.api.types.is_datetime64_any_dtype(column):
+        if column.dt.tz is not None:
+            column = column.dt.tz_localize(None)
+        return column.dt.tz_localize('UTC')
+    return pd.to_datetime(column, utc=True, errors='coerce')
+
+
+def bulk_mask(frame, fee_quantities):
+    """
+    Rows that can skip create_tx: a bulk type with every field its tx
+    would read present. Anything else, including rows create_tx would
+    reject, is left to add_tx.
+
+    Args:
+        frame (DataFrame): Txs from to_frame.
+        fee_quantities (list): Their fee quantities, see _amounts.
+
+    Returns:
+        ndarray: Boolean mask in row order.
+    """
+    if 'type' not in frame.columns or 'timestamp' not in frame.columns:
+        return np.zeros(len(frame), dtype=bool)
+    types = list([tx_type for tx_type, tx_class in BULK_CLASSES.items() if TX_TYPES.get(tx_type) is tx_class])
+    mask = frame['type'].isin(types).to_numpy()
+    for field in ['base_currency', 'base_quantity', 'base_usd_price', 'timestamp']:
+        mask &= _present(frame, field)
+    has_fee = np.array([x is not None and x > 0 for x in fee_quantities], dtype=bool)
+    mask &= ~has_fee | _present(frame, 'fee_currency')
+    return mask
+
+
+class TxFrame:
+    """
+    A normalized tx table, read one row at a time in timestamp order. Bulk
+    rows write their entries straight into entry columns; every other row
+    is handed back as a tx dict for create_tx.
+    """
+
+    def __init__(self, txs) -> None:
+        self.frame = to_frame(txs)
+        frame = self.frame
+        self.amounts = {field: _amounts(frame, field) for field in [
+            'base_quantity', 'base_usd_price', 'quote_usd_price', 'fee_quantity', 'fee_usd_price']}
+        self.bulk = bulk_mask(frame, self.amounts['fee_quantity'])
+        # only rows left to create_tx are needed as dicts
+        self.records = dict(zip(np.flatnonzero(~self.bulk).tolist(), frame[~self.bulk].to_dict('records')))
+        self.ids = frame['id'].tolist() if 'id' in frame.columns else [None] * len(frame)
+        self.types = frame['type'].tolist() if 'type' in frame.columns else [None] * len(frame)
+        self.timestamps = frame['timestamp'].tolist() if 'timestamp' in frame.columns else [None] * len(frame)
+        self.currencies = {field: _strings(frame, field) for field in [
+            'base_currency', 'quote_currency', 'fee_currency']}
+
+    def __len__(self):
+        return len(self.frame)
+
+    def tx(self, i):
+        # row i as create_tx kwargs, missing values left out
+        record = self.records.get(i)
+        if record is None:
+            record = self.frame.iloc[[i]].to_dict('records')[0]
+        return {key: value for key, value in record.items() if not _is_missing(value)}
+
+    def add_entries(self, i, columns):
+        """
+        Append bulk row i's entries to columns, in the order its tx would
+        produce them.
+
+        Args:
+            i (int): Row number.
+            columns (dict): Entry columns, see entry_columns.
+
+        Returns:
+            tuple: (symbols the tx references, (symbol, id, price, timestamp, qty)
+                    of the tax lot it opens or None)
+        """
+        tx_type = self.types[i]
+        timestamp = self.timestamps[i]
+        amounts = {field: values[i] for field, values in self.amounts.items()}
+        base_currency = self.currencies['base_currency'][i]
+        quote_currency = self.currencies['quote_currency'][i]
+        fee_currency = self.currencies['fee_currency'][i]
+        base_symbol = str(base_currency).upper()
+        base = _asset(amounts['base_quantity'], amounts['base_usd_price'])
+
+        fee = None
+        fee_symbol = None
+        if amounts['fee_quantity'] is not None and amounts['fee_quantity'] > 0:
+            fee_price = amounts['fee_usd_price']
+            if fee_currency == base_currency:
+                fee_price = amounts['base_usd_price']
+            elif quote_currency is not None and fee_currency == quote_currency:
+                fee_price = amounts['quote_usd_price']
+            fee = _asset(amounts['fee_quantity'], fee_price)
+            fee_symbol = str(fee_currency).upper()
+
+        template, fiat_debit = BULK_TEMPLATES[tx_type]
+        configs = list(template.values())
+        if fiat_debit is not None and base_symbol == 'USD':
+            configs = list([fiat_debit if config is template['debit'] else config for config in configs])
+        if fee is not None and fee[0] > 0:
+            configs += list(fee_config.values()) if fee_symbol == 'USD' else [fee_config['debit']]
+        for config in configs:
+            symbol, asset = (fee_symbol, fee) if config.get('mkt') == 'fee' else (base_symbol, base)
+            columns['id'].append(self.ids[i])
+            columns['account_type'].append(config.get('account_type'))
+            columns['account'].append(config.get('account'))
+            columns['sub_account'].append(config.get('sub_account'))
+            columns['timestamp'].append(timestamp)
+            columns['symbol'].append(symbol)
+            columns['side'].append(config.get('side', ''))
+            columns['type'].append(config.get('type', tx_type))
+            columns['quantity'].append(asset[0])
+            columns['value'].append(asset[2])
+            columns['quote'].append(asset[1])
+            columns['close_quote'].append(asset[1] if asset[1] != 0 else None)
+
+        # a fee in the base currency replaces the base's affected balance
+        qty = BASE_SIGNS.get(tx_type, 1) * base[0]
+        if fee is not None and fee_symbol == base_symbol:
+            qty = -fee[0]
+        lot = (base_symbol, self.ids[i], base[1], timestamp, base[0]) if qty > 0 else None
+        return [base_symbol, (quote_currency or '').upper()], lot
+
+
+def entry_columns():
+    return {field: [] for field in ENTRY_FIELDS}
+
+
+def append_entries(columns, entries):
+    # Entry objects -> entry columns
+    for entry in entries:
+        for field in ENTRY_FIELDS:
+            columns[field].append(entry.get(field))
+
+
+def _asset(qty, price):
+    # (quantity, price, value) rounded as Asset rounds them
+    qty = round_amount(qty if qty is not None else 0, QUANTITY_PRECISION)
+    price = round_amount(price if price is not None else 0, PRICE_PRECISION)
+    return qty, price, round_amount(qty * price, VALUE_PRECISION)
+
+
+def _amounts(frame, field):
+    # one conversion per column, numbers become Decimals as check_type makes them
+    if field not in frame.columns:
+        return [None] * len(frame)
+    column = frame[field]
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        values = list(map(Decimal, column.to_numpy().astype(str)))
+    elif pd.api.types.infer_dtype(column, skipna=True) in ['decimal', 'empty']:
+        values = column.tolist()
+    else:
+        values = list([check_type(x) for x in column])
+    for i in np.flatnonzero(column.isna().to_numpy()).tolist():
+        values[i] = None
+    return values
+
+
+def _strings(frame, field):
+    if field not in frame.columns:
+        return [None] * len(frame)
+    return list([None if _is_missing(x) else x for x in frame[field]])
+
+
+def _present(frame, field):
+    if field not in frame.columns:
+        return np.zeros(len(frame), dtype=bool)
+    return frame[field].notna().to_numpy()
+
+
+def _is_missing(value):
+    return value is None or value is pd.NaT or (isinstance(value, float) and np.isnan(value))
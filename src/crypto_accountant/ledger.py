@@ -4,6 +4,9 @@ those entries within a pandas dataframe. The Ledger provides a
 simple interface for organizing data into common accounting structures.
 
 The Ledger's main role is to act as the general ledger for the book keeper.
+Entries are kept column by column in an EntryStore rather than as dicts.
+Txs can also be deferred: their entries are only built when the store is
+first read.
 
   Typical usage example:
     entry = {...}
@@ -16,12 +19,79 @@ from decimal import Decimal
 from re import T
 import pandas as pd
 import numpy as np
+from .balance_history import BalanceHistory
+from .balance_tree import BalanceTree, LEVELS, SIDE_COLUMNS
+from .entry_store import EntryStore, AMOUNT_PRECISIONS
+from .equity_curve import EquityCurve
+from .running_balances import RunningBalances, running_sum
+from .transactions.utils import from_scaled
+
+# index of each cached view built from raw
+VIEW_INDEXES = {
+    'simple': ['timestamp'],
+    'accounts': ['account_type', 'account', 'sub_account', 'timestamp', 'type', 'symbol'],
+}
+# field checks in the order BookKeeper.validate_entry_set makes them
+ENTRY_CHECKS = [
+    ('timestamp', 'Incorrect timestamp format. Must be datetime instance'),
+    ('account_type', 'Incorrect account_type format. Must be string'),
+    ('account', 'Incorrect account format. Must be string'),
+    ('symbol', 'Incorrect symbol format. Must be string'),
+    ('side', 'Incorrect side format. Must be credit or debit'),
+    ('type', 'Incorrect type format. Must be string'),
+    ('quantity', 'Incorrect quantity format. Must be Decimal'),
+    ('value', 'Incorrect value format. Must be Decimal'),
+    ('quote', 'Incorrect quote format. Must be Decimal'),
+    ('sub_account', 'Incorrect sub_account format. Must be string'),
+    ('close_quote', 'Incorrect close_quote format. Must be Decimal'),
+]
+REPORT_COLUMNS = ['id', 'timestamp', 'reason']
 
 class Ledger:
 
     def __init__(self) -> None:
 
-        self.entries = []
+        self._store = EntryStore()
+        self.pending = []  # deferred entries not yet built, see defer
+        self._views = {}   # view name -> (entry count, DataFrame)
+        self._curves = {}  # account type -> EquityCurve
+        self._balances = BalanceTree()
+        self._histories = {}   # path depth -> BalanceHistory
+        self._running = {}     # path depth -> RunningBalances
+        self.totals = {column: 0 for column in SIDE_COLUMNS}   # as stored, see EntryStore
+
+    def __getstate__(self):
+        # cached views and curves are rebuilt from the store on demand
+        self.materialize()
+        state = self.__dict__.copy()
+        state['_views'] = {}
+        state['_curves'] = {}
+        state['_balances'] = BalanceTree()
+        state['_histories'] = {}
+        state['_running'] = {}
+        return state
+
+    @property
+    def store(self):
+        """
+        The ledger's EntryStore, with the entries of deferred txs built.
+
+        Returns:
+            EntryStore: All entries.
+        """
+        if self.pending:
+            self.materialize()
+        return self._store
+
+    @property
+    def entries(self):
+        """
+        Entries rebuilt as dicts from the columnar store.
+
+        Returns:
+            list: A list of entry dicts.
+        """
+        return list(self.store.rows())
 
     @property
     def raw(self):
@@ -32,11 +102,7 @@ class Ledger:
         Returns:
             DataFrame: Unindexed DataFrame
         """
-        if len(self.entries) > 0:
-            return pd.DataFrame(self.entries)
-        return pd.DataFrame()
-
-        # rename columns even if empty.
+        return self.get_view('raw')
 
     @property
     def simple(self):
@@ -46,7 +112,7 @@ class Ledger:
         Returns:
             DataFrame: DataFrame with index ['timestamp', 'id']
         """
-        return self.apply_index(self.raw, fill=True)
+        return self.get_view('simple')
 
     
     @property
@@ -58,8 +124,7 @@ class Ledger:
         Returns:
             DataFrame: DataFrame with index ['account', 'sub_account', 'timestamp', 'type', 'symbol']
         """
-        return self.apply_index(self.simple, 
-            ['account_type', 'account', 'sub_account', 'timestamp', 'type', 'symbol'])
+        return self.get_view('accounts')
 
     @property
     def symbols(self):
@@ -69,89 +134,354 @@ class Ledger:
         Returns:
             list: A list containing the capitalized symbols.
         """
-        return np.unique(np.array(self.simple['symbol'].tolist()))
+        return np.unique(np.array(self.store.categories['symbol'].values))
 
     @property
     def debit_value_sum(self):
-        summary = self.summarize(self.simple)
-        return summary['debit_value'].sum()
+        return self.get_total('debit_value')
 
     @property
     def debit_quantity_sum(self):
-        summary = self.summarize(self.simple)
-        return summary['debit_quantity'].sum()
+        return self.get_total('debit_quantity')
     
     @property
     def credit_value_sum(self):
-        summary = self.summarize(self.simple)
-        return summary['credit_value'].sum()
+        return self.get_total('credit_value')
     
     @property
     def credit_quantity_sum(self):
-        summary = self.summarize(self.simple)
-        return summary['credit_quantity'].sum()
+        return self.get_total('credit_quantity')
+
+    def get_total(self, column):
+        self.materialize()
+        total = self.totals[column]
+        if self.store.fixed:
+            return self.store.decode_amount(column.split('_')[-1], total)
+        return Decimal(0) + total
     
     def add_entry(self, entry):
-        self.entries.append(entry)
+        """
+        Add a single entry.
+
+        Args:
+            entry (dict or Entry): Entry to add. Entry objects are read
+                directly, without to_dict.
+        """
+        self.store.append(entry)
+        side = entry.get('side')
+        if side == 'debit' or side == 'credit':
+            self.totals[side + '_value'] += self.store.last_amount('value')
+            self.totals[side + '_quantity'] += self.store.last_amount('quantity')
+
+    def defer(self, entries):
+        """
+        Add a tx's entries without building them yet. They are built, in
+        the order they were deferred, the next time the store is read.
+
+        Args:
+            entries: Object with a build method returning the tx's entries
+                and a start attribute, set to the tx's first entry index
+                when it is built.
+        """
+        self.pending.append(entries)
+
+    def materialize(self):
+        """
+        Build and add the entries of all deferred txs.
+        """
+        pending, self.pending = self.pending, []
+        for deferred in pending:
+            deferred.start = len(self._store)
+            for entry in deferred.build():
+                self.add_entry(entry)
+
+    def add_entries(self, columns):
+        """
+        Append many entries at once, given column by column.
+
+        Args:
+            columns (dict): Entry field -> list of values.
+        """
+        start = len(self.store)
+        self.store.extend(columns)
+        sides = columns.get('side', [])
+        values = self.store.amount_slice('value', start)
+        quantities = self.store.amount_slice('quantity', start)
+        for side, value, quantity in zip(sides, values, quantities):
+            if side == 'debit' or side == 'credit':
+                self.totals[side + '_value'] += value
+                self.totals[side + '_quantity'] += quantity
+
+    def rollback(self, size):
+        """
+        Remove the entries from size on, e.g. to add them again in another
+        order. Cached views and equity curves are rebuilt on next use.
+
+        Args:
+            size (int): Entries to keep.
+
+        Returns:
+            dict: The removed entries column by column, see add_entries.
+        """
+        sides = self.store.column('side', size)
+        values = self.store.amount_slice('value', size)
+        quantities = self.store.amount_slice('quantity', size)
+        for side, value, quantity in zip(sides, values, quantities):
+            if side == 'debit' or side == 'credit':
+                self.totals[side + '_value'] -= value
+                self.totals[side + '_quantity'] -= quantity
+        self._views = {}
+        self._curves = {}
+        self._histories = {}
+        self._running = {}
+        self._balances.remove(self.store, size)
+        return self.store.truncate(size)
+
+    def validate(self, start=0):
+        """
+        Check entries the way BookKeeper.validate_entry_set checks the
+        entries of one tx, for all txs at once: required fields and their
+        types, side values and that credit and debit values balance. Entries
+        are grouped into txs by id and timestamp.
+
+        Args:
+            start (int): First entry to check, the first entry of a tx.
+
+        Returns:
+            DataFrame: One row per tx that fails, with its id, timestamp and
+                the reason validate_entry_set would give, in ledger order.
+        """
+        store = self.store
+        count = len(store) - start
+        if count <= 0:
+            return pd.DataFrame(columns=REPORT_COLUMNS)
+        sides = store.code_array('side')[start:]
+        credit = store.categories['side'].lookup.get('credit', -2)
+        debit = store.categories['side'].lookup.get('debit', -2)
+        checks = np.stack([store.malformed(field, start) for field, reason in ENTRY_CHECKS])
+        checks[4] |= (sides != credit) & (sides != debit)
+
+        # groups are numbered in order of their first entry
+        ids = store.code_array('id')[start:]
+        timestamps = store.timestamp_array()[start:]
+        groups = pd.DataFrame({'id': ids, 'timestamp': timestamps}).groupby(
+            ['id', 'timestamp'], sort=False).ngroup().to_numpy()
+        firsts = np.unique(groups, return_index=True)[1]
+        values = store.scaled_column('value', start) * np.where(sides == credit, 1, -1)
+        diffs = np.zeros(len(firsts), dtype=values.dtype)
+        np.add.at(diffs, groups, values)
+
+        reasons = {}
+        failed = np.flatnonzero(checks.any(axis=0))
+        for group, entry in zip(*np.unique(groups[failed], return_index=True)):
+            reasons[group] = ENTRY_CHECKS[int(np.argmax(checks[:, failed[entry]]))][1]
+        for group in np.flatnonzero(diffs != 0):
+            if group not in reasons:
+                diff = from_scaled(int(diffs[group]), AMOUNT_PRECISIONS['value'])
+                reasons[group] = 'Credit and debit entries do not balance. Diff = ' + str(diff)
+        order = sorted(reasons)
+        entries = firsts[order]
+        return pd.DataFrame({
+            'id': store.categories['id'].decode(ids[entries]),
+            'timestamp': pd.DatetimeIndex(timestamps[entries].view('M8[ns]')).tz_localize('UTC'),
+            'reason': list([reasons[group] for group in order]),
+        }, columns=REPORT_COLUMNS)
+
+    def get_view(self, name):
+        """
+        Cached DataFrame view of the ledger. Views remember how many entries
+        they were built from; entries added since are indexed on their own
+        and merged into the cached view instead of rebuilding it.
+
+        Args:
+            name (str): raw, simple or accounts
+
+        Returns:
+            DataFrame: Copy of the view, safe for callers to modify.
+        """
+        size = len(self.store)
+        cached = self._views.get(name)
+        if cached is None or cached[0] != size:
+            start = cached[0] if cached else 0
+            delta = self.store.frame(start)
+            if name in VIEW_INDEXES and not delta.empty:
+                delta = self.apply_index(delta, VIEW_INDEXES[name], fill=True)
+            if cached is None or cached[0] == 0 or list(delta.columns) != list(cached[1].columns):
+                view = delta if start == 0 else self._build_view(name)
+            else:
+                view = pd.concat([cached[1], delta])
+                if name in VIEW_INDEXES:
+                    view = view.sort_index(kind='mergesort')
+            cached = (size, view)
+            self._views[name] = cached
+        return cached[1].copy()
+
+    def _build_view(self, name):
+        view = self.store.frame()
+        if name in VIEW_INDEXES:
+            view = self.apply_index(view, VIEW_INDEXES[name], fill=True)
+        return view
 
     def apply_index(self, ledger, index=['timestamp'], fill=False,):
         ledger.reset_index(inplace=True)
         if fill:
             ledger.fillna(0, inplace=True)
         ledger.set_index(index, inplace=True)
-        return ledger.sort_index()
+        return ledger.sort_index(kind='mergesort')
+
+    def split_sides(self, ledger):
+        # debit and credit value/quantity columns from side
+        is_debit = ledger['side'] == 'debit'
+        is_credit = ledger['side'] == 'credit'
+        ledger['debit_value'] = ledger['value'].where(is_debit, Decimal(0))
+        ledger['credit_value'] = ledger['value'].where(is_credit, Decimal(0))
+        ledger['debit_quantity'] = ledger['quantity'].where(is_debit, Decimal(0))
+        ledger['credit_quantity'] = ledger['quantity'].where(is_credit, Decimal(0))
+        return ledger
+
+    def summarize(self, ledger=None, index=['account_type', 'account', 'sub_account']):
+        """
+        Debit and credit totals and balances grouped by index.
+
+        Args:
+            ledger (DataFrame): Entries to summarize, e.g. self.simple.
+                Defaults to the whole ledger, which is read from the balance
+                tree without a scan when index is account_type, account,
+                sub_account and symbol or a start of them.
+            index (list): Fields to group by.
 
-    def summarize(self, ledger, index=['account_type', 'account', 'sub_account']):
-        ledger = self.apply_index(ledger, index, fill=True)
-        ledger = ledger.groupby(level=-1).sum(numeric_only=False)
+        Returns:
+            DataFrame: DataFrame with index index
+        """
+        if ledger is None:
+            if list(index) == LEVELS[:len(index)]:
+                return self.trial_balance(index)
+            ledger = self.simple
+        ledger = self.apply_index(self.split_sides(ledger), index, fill=True)
+        ledger = ledger.groupby(level=list(range(len(index))))[SIDE_COLUMNS].sum()
         ledger = self.add_balance(ledger)
         return ledger
 
-    def generate_equity_curve(self, account_type):
-        # calculate debit and credit qty balanaces for given account type
+    def balance_tree(self):
+        """
+        Totals of every account path, kept between calls. Only entries
+        added since the last call are read.
 
-        ledger = self.simple.copy()
-        ledger['account_type_quantity'] = ledger['quantity'].where((ledger['account_type'] == account_type), 0)
-        ledger['debit_balance'] = ledger['account_type_quantity'].where(ledger['side'] == 'debit', 0)
-        ledger['credit_balance'] = ledger['account_type_quantity'].where(ledger['side'] == 'credit', 0)
+        Returns:
+            BalanceTree: The ledger's tree.
+        """
+        self._balances.update(self.store)
+        return self._balances
 
-        # calculate balance according to account type
-        if account_type == 'assets':
-            ledger['balance'] = ledger['debit_balance'] - ledger['credit_balance']
-        else:
-            ledger['balance'] =  ledger['credit_balance'] - ledger['debit_balance']
-        
-        # create new df with timestamp (index), symbol, and balance
-        # convert timestamps to utc then round down to nearest day
-        affected_symbol_balances = ledger[['symbol', 'balance']].copy()
-        affected_symbol_balances.index = affected_symbol_balances.index.tz_convert(tz='UTC').floor('1D')
-
-        #! DO NOT MESS WITH THE ORDER BELOW
-        # Affected Symbol Balances -> Equity Curve
-        # 1. group df by timestamp and symbol
-        # 2. sum balances to get symbols' affected balances each day
-        # 3. reset index to place timestamp back in columns
-        # 3. pivote with index=timestamp, columns=symbol, values=balance
-        #      this restructures df
-        #      from -> timestamp | symbol | balance |
-        #      to   -> timestamp | symbols[0] | ... | symbols[n]
-        #      where the values in symbols[n] represent that symbols total affected balance that day
-        # 4. remove colunm name "symbol", set to None
-        # 5. Expand df to include row for everyday between first and last entry
-        # 6. Set unavailable balances to 0
-        # 6. Run cumsum on all symbol columns to get running balances
-        eq_curve = (
-            affected_symbol_balances
-                .groupby(['timestamp','symbol'])['balance']
-                .apply(lambda x: x.sum())
-                .reset_index()
-                .pivot('timestamp', 'symbol', 'balance')
-                .rename_axis(columns=None)
-                .asfreq(freq='1D', normalize=True)
-                .fillna(Decimal(0))
-                .cumsum()
-        )
-        return eq_curve
+    def account_totals(self, *path):
+        """
+        Debit and credit totals of an account path.
+
+        Args:
+            path (str): account_type, then optionally account, sub_account
+                and symbol.
+
+        Returns:
+            dict: SIDE_COLUMNS -> Decimal, 0 for paths without entries.
+        """
+        node = self.balance_tree().node(*path)
+        if node is None:
+            return {column: Decimal(0) for column in SIDE_COLUMNS}
+        return dict(zip(SIDE_COLUMNS, self._decode_totals(node)))
+
+    def trial_balance(self, index=LEVELS[:3]):
+        """
+        summarize of the whole ledger, read from the balance tree.
+
+        Args:
+            index (list): account_type, account, sub_account and symbol or
+                a start of them.
+
+        Returns:
+            DataFrame: DataFrame with index index
+        """
+        index = list(index)
+        rows = []
+        for path, node in self.balance_tree().nodes(len(index)):
+            rows.append(list(path) + self._decode_totals(node))
+        return self._summary(rows, index)
+
+    def balances_as_of(self, timestamp, level='sub_account'):
+        """
+        summarize of the entries up to and including timestamp, e.g. a year
+        end balance sheet. The first query at a level indexes the ledger;
+        further queries are a binary search and a gather until entries
+        are added.
+
+        Args:
+            timestamp (datetime): As of time, naive timestamps are UTC.
+            level (str): Deepest level to group by: account_type, account,
+                sub_account or symbol.
+
+        Returns:
+            DataFrame: DataFrame with index account_type down to level
+        """
+        if level not in LEVELS:
+            raise Exception('Unknown level {}. Must be one of {}'.format(level, LEVELS))
+        depth = LEVELS.index(level) + 1
+        history = self._histories.get(depth)
+        if history is None or history.size != len(self.store):
+            history = BalanceHistory(depth)
+            history.build(self.store)
+            self._histories[depth] = history
+        paths, totals, counts = history.as_of(timestamp)
+        values = list([self.store.categories[field].values for field in LEVELS[:depth]])
+        rows = []
+        for path, path_totals, path_counts in zip(paths, totals, counts):
+            row = list([values[i][code] if code >= 0 else None for i, code in enumerate(path)])
+            for column, total in zip(SIDE_COLUMNS, path_totals):
+                field = column.split('_')[-1]
+                count = path_counts[0 if column.startswith('debit') else 1]
+                row.append(from_scaled(total, AMOUNT_PRECISIONS[field]) if count else Decimal(0))
+            rows.append(row)
+        return self._summary(rows, LEVELS[:depth])
+
+    def _summary(self, rows, index):
+        # summarize output from rows of index values and SIDE_COLUMNS totals;
+        # missing index values group as 0, the way summarize fills them
+        ledger = pd.DataFrame(rows, columns=index + SIDE_COLUMNS)
+        ledger[index] = ledger[index].fillna(0)
+        ledger.set_index(index, inplace=True)
+        if rows:
+            ledger = ledger.groupby(level=list(range(len(index))))[SIDE_COLUMNS].sum()
+        return self.add_balance(ledger)
+
+    def _decode_totals(self, node):
+        # Decimal totals of a node, 0 when no entries are on that side
+        totals = []
+        for column, total in zip(SIDE_COLUMNS, node.totals):
+            if not node.counts[1 if column.startswith('debit') else 2]:
+                totals.append(Decimal(0))
+            elif self.store.fixed:
+                totals.append(self.store.decode_amount(column.split('_')[-1], total))
+            else:
+                totals.append(Decimal(0) + total)
+        return totals
+
+    def generate_equity_curve(self, account_type, as_float=False):
+        """
+        Daily running quantity balance of each symbol in an account type.
+        Assets are debit minus credit, other account types credit minus debit.
+        The curve is kept between calls and only entries added since the
+        last call are read.
+
+        Args:
+            account_type (str): Account type to track, e.g. assets.
+            as_float (bool): Return float64 balances instead of Decimals.
+
+        Returns:
+            DataFrame: DataFrame with a daily index and one column per symbol
+        """
+        if account_type not in self._curves:
+            self._curves[account_type] = EquityCurve(account_type)
+        curve = self._curves[account_type]
+        curve.update(self.store)
+        return curve.frame(as_float)
 
     def add_balance(self, ledger):
         ledger['debit_balance'] = ledger['debit_value'] - ledger['credit_value']
@@ -182,15 +512,52 @@ class Ledger:
         sort_val.append('timestamp')
         ledger = ledger.sort_values(sort_val)
 
-        ledger['running_bal'] = ledger.groupby(level=-1)['balance'].apply(lambda x: x.cumsum())
-        ledger['running_bal_quantity'] = ledger.groupby(level=-1)['balance_quantity'].apply(lambda x: x.cumsum())
-
-        # ledger['balance'] = ledger['account_type'].apply(lambda x: ledger['debit_balance'] if x == 'assets' else (ledger['credit_value'] - ledger['debit_value']))
-        # ledger['balance_quantity'] = ledger['credit_quantity'] - ledger['debit_quantity']
-        # ledger['balance_quantity'] = ledger['balance'].apply(lambda x: ledger['debit_quantity'] - ledger['credit_quantity'] if ledger['account_type'] == 'assets' else x)
+        # running sums within groups of the last index level
+        groups = pd.factorize(ledger.index.get_level_values(-1))[0]
+        ledger['running_bal'] = running_sum(ledger['balance'].to_numpy(), groups, AMOUNT_PRECISIONS['value'])
+        ledger['running_bal_quantity'] = running_sum(ledger['balance_quantity'].to_numpy(), groups, AMOUNT_PRECISIONS['quantity'])
         return ledger
 
+    def running_balances(self, level='symbol', as_float=False):
+        """
+        Running value and quantity balance of every entry within its account
+        path, in timestamp order. Balances are kept between calls and only
+        entries added since the last call are read.
+
+        Args:
+            level (str): Deepest level of the path: account_type, account,
+                sub_account or symbol.
+            as_float (bool): Return float64 balances instead of Decimals.
+
+        Returns:
+            DataFrame: DataFrame with index account_type down to level and
+                columns timestamp, balance, balance_quantity, running_bal
+                and running_bal_quantity
+        """
+        if level not in LEVELS:
+            raise Exception('Unknown level {}. Must be one of {}'.format(level, LEVELS))
+        depth = LEVELS.index(level) + 1
+        if depth not in self._running:
+            self._running[depth] = RunningBalances(depth)
+        balances = self._running[depth]
+        balances.update(self.store)
+        return balances.frame(self.store, as_float)
+
     def merge(self, ledgers):
-        for l in ledgers:
-            for e in l.entries:
-                self.add_entry(e)
+        """
+        Merge the entries of other ledgers into this one, all ordered by
+        timestamp; see EntryStore.merge. Entries with equal timestamps keep
+        this ledger's, then the given ledgers' order.
+
+        Args:
+            ledgers (list): Ledgers kept in the same numeric mode.
+        """
+        ledgers = [self] + list(ledgers)
+        store = EntryStore.merge(list([ledger.store for ledger in ledgers]))
+        self.totals = {column: sum([ledger.totals[column] for ledger in ledgers]) for column in SIDE_COLUMNS}
+        self._store = store
+        self._views = {}
+        self._curves = {}
+        self._histories = {}
+        self._running = {}
+        self._balances = BalanceTree()
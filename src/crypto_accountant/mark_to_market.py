@@ -0,0 +1,136 @@
+"""
+Mark to market for every open tax lot of a book at once.
+
+Open lots of all positions are flattened into one table and valued
+against a price table with one column per symbol and one row per date,
+the shape dev.get_historical_df builds. Prices are looked up with
+array indexing instead of per lot loops, so revaluing many lots on many
+dates is a single matrix product.
+
+  Typical usage example:
+    lots = lot_table(bk.positions)
+    gains = revalue(lots, prices)
+"""
+import numpy as np
+import pandas as pd
+from .utils import check_type
+
+DAY = 24 * 60 * 60 * 10 ** 9   # nanoseconds
+LONG_TERM_DAYS = 365
+LOT_COLUMNS = ['symbol', 'id', 'timestamp', 'qty', 'price', 'term', 'mkt_price']
+
+
+def lot_table(positions):
+    """
+    Open lots of all positions, one row per lot with available quantity.
+    Quantities and prices are float64, like the gains revalue returns.
+
+    Args:
+        positions (dict): Symbol -> Position.
+
+    Returns:
+        DataFrame: Columns symbol, id, timestamp, qty, price, term and the
+            position's current mkt_price.
+    """
+    symbols = list(positions.keys())
+    opens = list([(code, id, lot) for code, position in enumerate(positions.values())
+                  for id, lot in position._opens.items() if lot['available_qty'] > 0])
+    count = len(opens)
+    codes = np.fromiter((code for code, id, lot in opens), np.int64, count)
+    mkt_prices = np.fromiter((check_type(position.mkt_price) for position in positions.values()), np.float64, len(symbols))
+    return pd.DataFrame({
+        'symbol': np.array(symbols, dtype=object)[codes],
+        'id': list([id for code, id, lot in opens]),
+        'timestamp': pd.to_datetime(np.fromiter((pd.Timestamp(lot['timestamp']).value for code, id, lot in opens), np.int64, count), utc=True),
+        'qty': np.fromiter((lot['available_qty'] for code, id, lot in opens), np.float64, count),
+        'price': np.fromiter((lot['price'] for code, id, lot in opens), np.float64, count),
+        'term': np.array(list([lot['term'] for code, id, lot in opens]), dtype=object),
+        'mkt_price': mkt_prices[codes],
+    }, columns=LOT_COLUMNS)
+
+
+def price_table(prices):
+    """
+    Normalize a price table to rows of UTC dates and columns of symbols.
+    Tables with symbols as rows and dates as columns are transposed.
+
+    Returns:
+        DataFrame: Prices sorted by date.
+    """
+    if not isinstance(prices.index, pd.DatetimeIndex) and isinstance(prices.columns, pd.DatetimeIndex):
+        prices = prices.T
+    prices = prices.copy()
+    index = pd.DatetimeIndex(prices.index)
+    prices.index = index.tz_localize('UTC') if index.tz is None else index.tz_convert('UTC')
+    return prices.sort_index(kind='mergesort')
+
+
+def prices_at(prices, timestamp):
+    # latest known price of each symbol at timestamp, nan if there is none
+    known = prices.loc[:timestamp]
+    if known.empty:
+        return pd.Series(np.nan, index=prices.columns, dtype=object)
+    return known.ffill().iloc[-1]
+
+
+def long_term(lots, timestamps):
+    """
+    Which lots are long term on each timestamp.
+
+    Args:
+        lots (DataFrame): See lot_table.
+        timestamps (DatetimeIndex): UTC timestamps.
+
+    Returns:
+        ndarray: Boolean matrix, timestamps x lots.
+    """
+    opened = pd.DatetimeIndex(lots['timestamp']).asi8
+    days = (np.asarray(timestamps.asi8)[:, None] - opened[None, :]) // DAY
+    return (days > LONG_TERM_DAYS) | (lots['term'].to_numpy() == 'long')[None, :]
+
+
+def revalue(lots, prices):
+    """
+    Unrealized gain (available qty * market price) of every lot on every
+    date of a price table, as float64. Dates before a lot was opened are 0
+    and lots whose symbol has no price are nan.
+
+    Args:
+        lots (DataFrame): See lot_table.
+        prices (DataFrame): Price table, see price_table.
+
+    Returns:
+        DataFrame: Dates x lots, columns indexed by (symbol, id).
+    """
+    prices = price_table(prices)
+    matrix = prices.reindex(columns=list(dict.fromkeys(lots['symbol']))).ffill()
+    columns = matrix.columns.get_indexer(lots['symbol'])
+    values = matrix.to_numpy(dtype=np.float64)[:, columns]
+    gains = values * lots['qty'].to_numpy(dtype=np.float64)[None, :]
+    opened = pd.DatetimeIndex(lots['timestamp']).asi8
+    gains[prices.index.asi8[:, None] < opened[None, :] // DAY * DAY] = 0
+    return pd.DataFrame(gains, index=prices.index,
+                        columns=pd.MultiIndex.from_arrays([lots['symbol'], lots['id']], names=['symbol', 'id']))
+
+
+def mark_lots(lots, prices, timestamp):
+    """
+    Value lots at a single timestamp.
+
+    Args:
+        lots (DataFrame): See lot_table.
+        prices (Series): Symbol -> price, see prices_at.
+        timestamp (Timestamp): UTC valuation time.
+
+    Returns:
+        DataFrame: lots with mkt_price, term and unrealized_gain updated.
+            Lots without a price are left as they were.
+    """
+    lots = lots.copy()
+    mkt_prices = prices.reindex(lots['symbol']).to_numpy(dtype=np.float64)
+    priced = ~np.isnan(mkt_prices)
+    lots['mkt_price'] = np.where(priced, mkt_prices, lots['mkt_price'].to_numpy(dtype=np.float64))
+    is_long = long_term(lots, pd.DatetimeIndex([timestamp]))[0]
+    lots['term'] = np.where(priced & is_long, 'long', lots['term'].to_numpy(dtype=object))
+    lots['unrealized_gain'] = lots['qty'].to_numpy(dtype=np.float64) * lots['mkt_price'].to_numpy(dtype=np.float64)
+    return lots
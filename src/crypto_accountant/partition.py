@@ -0,0 +1,93 @@
+"""
+Splits a tx stream into groups of txs that can be booked independently.
+
+Only positions of non-stable symbols ever have tax lots relieved; stable
+coin and fiat positions are only ever added to. A tx therefore links the
+non-stable symbols it touches (base, quote and fee), and symbols that are
+never linked, directly or through other txs, share no state. Each
+connected component of symbols can be replayed on its own, in any
+process, as long as its txs keep their order.
+
+  Typical usage example:
+    groups = group_txs(txs, 4)
+    for indexes, symbols in groups:
+        ...
+"""
+from .transactions.base import BaseTx
+from .transactions.components.asset import stable_coins
+from .utils import check_type, tx_schema
+
+SYMBOL_FIELDS = ['base_currency', 'quote_currency', 'fee_currency']
+
+
+def tx_symbols(tx):
+    """
+    Symbols a tx touches, upper cased the way Asset upper cases them.
+    The fee only counts when the tx has a fee quantity.
+
+    Args:
+        tx (BaseTx or dict): Tx to read.
+
+    Returns:
+        list: Base, quote and fee symbols.
+    """
+    if isinstance(tx, BaseTx):
+        return list([asset.symbol for asset in tx.assets.values()])
+    fields = dict(zip(tx_schema(tuple(tx)), tx.values()))
+    symbols = list([str(fields.get(field, '')).upper() for field in SYMBOL_FIELDS[:2]])
+    if check_type(fields.get('fee_quantity', 0)) > 0:
+        symbols.append(str(fields.get('fee_currency', '')).upper())
+    return symbols
+
+
+def has_lots(symbol):
+    # positions that can have tax lots relieved
+    return symbol != '' and symbol.lower() not in stable_coins
+
+
+def group_txs(txs, count):
+    """
+    Group txs by connected component of the symbols with relievable lots,
+    then pack the components into at most count groups of similar size.
+    Txs that only touch stable coins and fiat belong to no group.
+
+    Args:
+        txs (list): Txs in booking order.
+        count (int): Maximum number of groups.
+
+    Returns:
+        list: (tx indexes in order, set of symbols) per group.
+    """
+    parents = {}
+
+    def find(symbol):
+        parents.setdefault(symbol, symbol)
+        while parents[symbol] != symbol:
+            parents[symbol] = parents[parents[symbol]]
+            symbol = parents[symbol]
+        return symbol
+
+    tx_roots = []
+    for tx in txs:
+        symbols = list([symbol for symbol in tx_symbols(tx) if has_lots(symbol)])
+        for symbol in symbols[1:]:
+            parents[find(symbol)] = find(symbols[0])
+        tx_roots.append(symbols[0] if symbols else None)
+
+    components = {}
+    for index, symbol in enumerate(tx_roots):
+        if symbol is not None:
+            components.setdefault(find(symbol), []).append(index)
+    members = {}
+    for symbol in parents:
+        members.setdefault(find(symbol), set()).add(symbol)
+
+    # largest components first, each into the currently smallest group
+    groups = []
+    for root in sorted(components, key=lambda root: (-len(components[root]), components[root][0])):
+        if len(groups) < count:
+            groups.append(([], set()))
+        indexes, symbols = min(groups, key=lambda group: len(group[0]))
+        indexes += components[root]
+        symbols |= members[root]
+    return list([(sorted(indexes), symbols) for indexes, symbols in groups])
@@ -1,48 +1,65 @@
 
+import heapq
 from datetime import datetime
 from .utils import check_type
+from .transactions.utils import is_fixed_point, to_scaled, from_scaled, QUANTITY_PRECISION, PRICE_PRECISION
+from .tax_lots import TaxLotIndex, RELIEF_STRATEGIES, TAX_STRATEGIES, SPECIFIC_ID, SPECIFIC_ID_FALLBACK, check_strategy, insertion_key
 import pytz
 utc=pytz.UTC
 class Position:
 
-    def __init__(self, symbol) -> None:
+    def __init__(self, symbol, tax_rates=None, journal=False) -> None:
         self.symbol = symbol
+        self.tax_rates = tax_rates
         self._opens = {}
         self._closes = {}
+        self._lot_seq = {}
+        self._lot_version = {}
+        self._indexes = {}
+        self._short_lots = []  # heap of (timestamp, seq, id) waiting to become long term
+        # running aggregates, updated on every add/close so reads are O(1)
+        # fixed point positions keep quantity and price totals as scaled integers
+        self._fixed = is_fixed_point()
+        self._open_qty = 0
+        self._close_qty = 0
+        self._available_qty = 0
+        self._realized_gain = 0
+        self._price_sums = {'open': 0, 'close': 0}
         self.stats = {'open': {}, 'close': {}}
         self.mkt_price = 0
         self.mkt_timestamp = None
+        self._held_mark = None  # latest (price, timestamp) while a fill holds marks, see hold_marks
+        # (method, args) of every add, close and mark when kept, see rollback
+        self.journal = [] if journal else None
+
+    def __getstate__(self):
+        # lot indexes are rebuilt from the open lots when next used
+        state = self.__dict__.copy()
+        state['_indexes'] = {}
+        return state
 
     @property
     def balance(self):
-        # sum opens available qtys
-        debit_sum = sum(list([x['qty'] for x in self._opens.values()]))
-        credit_sum = sum(list([x['qty'] for x in self._closes.values()]))
-        return debit_sum - credit_sum
+        # opened qty less closed qty
+        return self._unscale(self._open_qty - self._close_qty, QUANTITY_PRECISION)
 
     @property
     def available_quantity(self):
         # sum opens available qtys
-        return sum(list([x['available_qty'] for x in self._opens.values()]))
+        return self._unscale(self._available_qty, QUANTITY_PRECISION)
 
     @property
     def tax_lots(self):
-        # sum opens available qtys
+        # lot unrealized gains are derived from the market price on read
+        price = check_type(self.mkt_price)
+        for lot in self._opens.values():
+            lot['unrealized_gain'] = lot['available_qty'] * price
         return self._opens
 
     @property
     def open_tax_lots(self):
         # sum opens available qtys
-        lots = self._opens.copy()
-        open_lots = []
-        for id, lot in lots.items():
-            if lot['available_qty'] > 0:
-                new_lot = {**lot}
-                new_lot['id'] = id
-                new_lot['qty'] = new_lot['available_qty']
-                del new_lot['available_qty']
-                open_lots.append(new_lot)
-        return open_lots
+        return list([self._lot_view(id) for id, lot in self._opens.items() if lot['available_qty'] > 0])
 
     @property
     def days_open(self):
@@ -50,27 +67,122 @@ class Position:
 
     @property
     def realized_gain(self):
-        return sum(list([(lambda x: x['realized_gain'])(x) for x in list(self._closes.values())]))
+        return self._realized_gain
 
     @property
     def unrealized_gain(self):
-        return sum(list([(lambda x: x['unrealized_gain'])(x) for x in list(self._opens.values())]))
+        return self.available_quantity * check_type(self.mkt_price)
 
+    def next_tax_lot(self, strategy='max_tax', lot_ids=None):
+        """
+        Next open tax lot to relieve under the given strategy. Each strategy
+        has its own persistent index so nothing is copied or sorted here.
+
+        Args:
+            strategy (str): One of fifo, lifo, hifo, max_tax, min_tax or specific_id.
+            lot_ids (list): Lot ids to relieve first when strategy is specific_id.
+
+        Returns:
+            dict: Lot formatted like open_tax_lots or None if no lots are open.
+        """
+        check_strategy(strategy)
+        if strategy == SPECIFIC_ID:
+            for id in lot_ids or []:
+                lot = self._opens.get(id)
+                if lot and lot['available_qty'] > 0:
+                    return self._lot_view(id)
+            strategy = SPECIFIC_ID_FALLBACK
+        if strategy in TAX_STRATEGIES and self.mkt_price == 0:
+            # every lot's liability is 0, ties keep the order lots were opened in
+            index = self._get_index('insertion', insertion_key)
+        else:
+            index = self._get_index(strategy, RELIEF_STRATEGIES[strategy])
+        id = index.peek()
+        return self._lot_view(id) if id is not None else None
 
     def adjust_to_mtk(self, price, timestamp):
+        # unrealized gains follow mkt_price, so only lots crossing into long term are touched
+        if self._held_mark is not None:
+            self._held_mark = (price, timestamp)
+            return
         self.mkt_price = price
         self.mkt_timestamp = timestamp
-        for id in self._opens.keys():
-            self._opens[id]['unrealized_gain'] = self._opens[id]['available_qty'] * check_type(price)
-            if (timestamp  - self._opens[id]['timestamp']).days > 365:
-                self._opens[id]['term'] = 'long'
+        short_lots = self._short_lots
+        while short_lots and (timestamp - short_lots[0][0]).days > 365:
+            lot_timestamp, _, id = heapq.heappop(short_lots)
+            lot = self._opens.get(id)
+            if lot and lot['term'] == 'short' and lot['timestamp'] == lot_timestamp:
+                lot['term'] = 'long'
+                self._reindex(id)
+
+    def hold_marks(self):
+        """
+        Hold back mkt price and lot term changes until release_marks, so
+        the closes of a multi lot fill don't reorder the lots still to be
+        relieved. Lots come out in the order they had when the fill began.
+        """
+        self._held_mark = (self.mkt_price, self.mkt_timestamp)
+
+    def release_marks(self):
+        # apply the last mark held back since hold_marks
+        price, timestamp = self._held_mark
+        self._held_mark = None
+        self.adjust_to_mtk(price, timestamp)
+
+    def mark(self, price, timestamp):
+        # adjust_to_mtk from outside the position's own adds and closes, journaled
+        if self.journal is not None:
+            self.journal.append(('mark', (price, timestamp)))
+        self.adjust_to_mtk(price, timestamp)
+
+    def rollback(self, length):
+        """
+        Rebuild the position from the first length ops of its journal,
+        undoing everything after them.
+
+        Args:
+            length (int): Journal ops to keep.
+
+        Returns:
+            list: The undone (method, args) ops, oldest first.
+        """
+        if self.journal is None:
+            raise Exception('Position {} keeps no journal to roll back'.format(self.symbol))
+        undone = self.journal[length:]
+        position = Position(self.symbol, self.tax_rates, journal=True)
+        position.replay(self.journal[:length])
+        self.__dict__.update(position.__dict__)
+        return undone
+
+    def replay(self, ops):
+        # apply journaled (method, args) ops in order
+        for method, args in ops:
+            getattr(self, method)(*args)
+
+    def _get_index(self, name, key):
+        if name not in self._indexes:
+            self._indexes[name] = TaxLotIndex(self, key)
+        return self._indexes[name]
+
+    def _reindex(self, id):
+        # invalidate lot's existing index items and push it again if still open
+        self._lot_version[id] = self._lot_version.get(id, 0) + 1
+        if self._opens[id]['available_qty'] > 0:
+            for index in self._indexes.values():
+                index.push(id)
+
+    def _lot_view(self, id):
+        new_lot = {**self._opens[id]}
+        new_lot['unrealized_gain'] = new_lot['available_qty'] * check_type(self.mkt_price)
+        new_lot['id'] = id
+        new_lot['qty'] = new_lot['available_qty']
+        del new_lot['available_qty']
+        return new_lot
 
     def _update_stats(self, name, price, timestamp):
         timestamp = timestamp.replace(tzinfo=utc)
-        entries = self._opens.values() if name == 'open' else self._closes.values()
-        entries = list(entries)
-        prices = list([(lambda x: x['price'])(x) for x in entries])
-        self.stats[name]['avg'] = sum(prices) / len(entries)
+        count = len(self._opens) if name == 'open' else len(self._closes)
+        self.stats[name]['avg'] = self._unscale(self._price_sums[name], PRICE_PRECISION) / count
         highest = self.stats[name].get('highest', 0)
         lowest = self.stats[name].get('lowest', 999999999)
         first = self.stats[name].get('first_timestamp', datetime(year=3000, month=1, day=1, tzinfo=utc))
@@ -89,9 +201,16 @@ class Position:
 
     def add(self, id, price, timestamp, qty):
         # add entry to opens and update open_stats
+        if self.journal is not None:
+            self.journal.append(('add', (id, price, timestamp, qty)))
         timestamp = timestamp.replace(tzinfo=utc)
         price = check_type(price)
         qty = check_type(qty)
+        replaced = self._opens.get(id)
+        if replaced:
+            self._open_qty -= self._scale(replaced['qty'], QUANTITY_PRECISION)
+            self._available_qty -= self._scale(replaced['available_qty'], QUANTITY_PRECISION)
+            self._price_sums['open'] -= self._scale(replaced['price'], PRICE_PRECISION)
         self._opens[id] = {
             'timestamp': timestamp,
             'price': check_type(price),
@@ -100,19 +219,28 @@ class Position:
             'unrealized_gain': check_type(0),
             'term': 'short'
         }
+        self._open_qty += self._scale(qty, QUANTITY_PRECISION)
+        self._available_qty += self._scale(qty, QUANTITY_PRECISION)
+        self._price_sums['open'] += self._scale(price, PRICE_PRECISION)
+        # re-added ids keep their place in the lot order, like the dict key does
+        self._lot_seq.setdefault(id, len(self._lot_seq))
+        heapq.heappush(self._short_lots, (timestamp, self._lot_seq[id], id))
+        self._reindex(id)
         self._update_stats('open', price, timestamp)
 
     def close(self, id, price, timestamp, config):
         # add entry to closes and update close_stats
+        if self.journal is not None:
+            self.journal.append(('close', (id, price, timestamp, config)))
         timestamp = timestamp.replace(tzinfo=utc)
         price = check_type(price)
         qty =  sum(list([check_type(x) for x in list(config.values())]))
-        self._closes[id] = {
+        self._set_close(id, {
             'timestamp': timestamp,
             'price': price,
             'qty': qty,
             'realized_gain': check_type(0)
-        }
+        })
 
         # update available quantities
         # config = {id1: qty1, id2: qty2}
@@ -122,14 +250,34 @@ class Position:
                 close_qty = check_type(config_qty)
                 if entry['available_qty'] >= config_qty:
                     self._opens[config_id]['available_qty'] -= close_qty
+                    self._available_qty -= self._scale(close_qty, QUANTITY_PRECISION)
                 else:
+                    self._available_qty -= self._scale(entry['available_qty'], QUANTITY_PRECISION)
                     self._opens[config_id]['available_qty'] = check_type(0)
                     close_qty = self._opens[config_id]['available_qty']
+                self._reindex(config_id)
 
                 self._closes[id]['realized_gain'] += close_qty * price
+                self._realized_gain += close_qty * price
             else:
                 raise Exception('No matching entry found for', id)
         
         self._update_stats('close', price, timestamp)
-        
 
+    def _set_close(self, id, close):
+        # record a close, replacing any earlier close with the same id
+        replaced = self._closes.get(id)
+        if replaced:
+            self._close_qty -= self._scale(replaced['qty'], QUANTITY_PRECISION)
+            self._realized_gain -= replaced['realized_gain']
+            self._price_sums['close'] -= self._scale(replaced['price'], PRICE_PRECISION)
+        self._closes[id] = close
+        self._close_qty += self._scale(close['qty'], QUANTITY_PRECISION)
+        self._realized_gain += close['realized_gain']
+        self._price_sums['close'] += self._scale(close['price'], PRICE_PRECISION)
+
+    def _scale(self, val, precision):
+        return to_scaled(val, precision) if self._fixed else val
+
+    def _unscale(self, val, precision):
+        return from_scaled(val, precision) if self._fixed else val
@@ -0,0 +1,131 @@
+"""
+A PriceStore keeps daily historical prices on disk as a single float64
+matrix, one row per UTC day and one column per symbol, memory mapped on
+open. A small json index holds the first day and the symbol order, so a
+(symbol, day) lookup is two dict/arithmetic steps and slicing a range of
+days is a view into the map rather than a copy.
+
+Rows line up with Ledger.generate_equity_curve: both are indexed by UTC
+day, so an equity curve can be valued without joining frames.
+
+  Typical usage example:
+    PriceStore.write('prices', historical_df)
+    store = PriceStore('prices')
+    btc = store.price('BTC', '2021-01-01')
+    curve = ledger.generate_equity_curve('assets', as_float=True)
+    values = curve * store.align(curve)
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+
+DAY = 24 * 60 * 60 * 10 ** 9   # nanoseconds
+MATRIX_FILE = 'prices.npy'
+INDEX_FILE = 'index.json'
+
+
+def day_number(timestamp):
+    # days since epoch of a timestamp's UTC day, naive timestamps are UTC
+    return pd.Timestamp(timestamp).value // DAY
+
+
+class PriceStore:
+
+    def __init__(self, path) -> None:
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            index = json.load(f)
+        self.path = path
+        self.first_day = index['first_day']
+        self.symbols = index['symbols']
+        self.columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.prices = np.load(os.path.join(path, MATRIX_FILE), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.prices)
+
+    @staticmethod
+    def write(path, prices):
+        """
+        Write a price table as a store, replacing any store at path.
+
+        Args:
+            path (str): Directory to write to.
+            prices (DataFrame): Prices with a row per date and a column per
+                symbol. Rows are floored to UTC days; the last price of a
+                day wins and missing days are nan.
+        """
+        prices = prices.sort_index(kind='mergesort')
+        days = pd.DatetimeIndex(prices.index).asi8 // DAY
+        symbols = sorted(str(symbol) for symbol in prices.columns)
+        first_day = int(days.min()) if len(days) else 0
+        matrix = np.full((int(days.max()) - first_day + 1 if len(days) else 0, len(symbols)), np.nan)
+        values = prices.rename(columns=str)[symbols].to_numpy(dtype=np.float64)
+        matrix[days - first_day] = values
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, MATRIX_FILE), matrix)
+        with open(os.path.join(path, INDEX_FILE), 'w') as f:
+            json.dump({'first_day': first_day, 'symbols': symbols}, f)
+
+    def price(self, symbol, timestamp):
+        """
+        Price of symbol on timestamp's UTC day.
+
+        Returns:
+            float: The price or nan if it isn't stored.
+        """
+        row = day_number(timestamp) - self.first_day
+        column = self.columns.get(symbol)
+        if column is None or row < 0 or row >= len(self.prices):
+            return np.nan
+        return float(self.prices[row, column])
+
+    def rows(self, start=None, end=None):
+        """
+        Prices of all symbols for the days start to end inclusive. Days
+        outside the store are clipped.
+
+        Returns:
+            ndarray: Read only view into the memory map, days x symbols.
+        """
+        first = 0 if start is None else max(day_number(start) - self.first_day, 0)
+        last = len(self.prices) if end is None else min(day_number(end) - self.first_day + 1, len(self.prices))
+        return self.prices[first:max(first, last)]
+
+    def frame(self, start=None, end=None):
+        """
+        Prices for the days start to end inclusive as a DataFrame backed
+        by the memory map.
+
+        Returns:
+            DataFrame: DataFrame with a daily UTC index and a column per symbol
+        """
+        first = 0 if start is None else max(day_number(start) - self.first_day, 0)
+        values = self.rows(start, end)
+        index = pd.DatetimeIndex((self.first_day + first + np.arange(len(values))) * DAY, tz='UTC', freq='D', name='timestamp')
+        return pd.DataFrame(values, index=index, columns=self.symbols, copy=False)
+
+    def align(self, curve, fill=np.nan):
+        """
+        Prices lined up with an equity curve: same days, same symbol
+        columns. Days or symbols the store doesn't have are fill.
+
+        Args:
+            curve (DataFrame): Daily frame such as Ledger.generate_equity_curve.
+            fill (float): Value for missing prices.
+
+        Returns:
+            DataFrame: Prices with the curve's index and columns
+        """
+        if curve.empty:
+            return pd.DataFrame(index=curve.index, columns=curve.columns, dtype=np.float64)
+        rows = pd.DatetimeIndex(curve.index).asi8 // DAY - self.first_day
+        columns = np.array([self.columns.get(str(symbol), -1) for symbol in curve.columns], dtype=np.int64)
+        inside = (rows >= 0) & (rows < len(self.prices))
+        values = np.full((len(rows), len(columns)), fill, dtype=np.float64)
+        if self.symbols:
+            # a store without symbols has no column to gather from
+            block = self.prices[rows[inside]][:, np.maximum(columns, 0)]
+            block[:, columns < 0] = fill
+            values[inside] = np.where(np.isnan(block), fill, block)
+        return pd.DataFrame(values, index=curve.index, columns=curve.columns)
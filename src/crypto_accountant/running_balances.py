@@ -0,0 +1,194 @@
+"""
+RunningBalances keeps the running value and quantity balance of every
+ledger entry within its account path, in timestamp order. Assets balance
+debit minus credit, other account types credit minus debit, the way
+Ledger.add_balance does. Amounts are exact scaled integers held as int64
+limbs like EquityCurve's, so each path's running balances are one native
+cumulative sum. Like EquityCurve, the
+balances are brought up to date from the EntryStore incrementally: a path
+whose new entries are all no earlier than its last one is extended from
+its last running balance, and only paths given earlier entries are summed
+again.
+
+  Typical usage example:
+    balances = RunningBalances(4)
+    balances.update(store)
+    df = balances.frame(store)
+"""
+import numpy as np
+import pandas as pd
+from .balance_tree import LEVELS
+from .entry_store import NAT, AMOUNT_PRECISIONS
+from .equity_curve import LIMB, split_limbs, carry, join_limbs
+from .transactions.utils import from_scaled, to_scaled
+
+LAST = np.iinfo(np.int64).max   # entries without a timestamp sort last
+COLUMNS = ['timestamp', 'balance', 'balance_quantity', 'running_bal', 'running_bal_quantity']
+
+
+def amount_limbs(values):
+    # int64 limbs, see split_limbs, or limbs of Python ints when whole
+    # units overflow int64; either sums exactly
+    try:
+        return split_limbs(values)
+    except OverflowError:
+        values = values.astype(object)
+        return np.stack([values // (LIMB * LIMB), values % (LIMB * LIMB) // LIMB, values % LIMB], axis=-1)
+
+
+def running_sum(values, groups, precision):
+    """
+    Cumulative sum of values within each group, in the order given. Sums
+    are exact, taken over int64 limbs of the values scaled by precision.
+
+    Args:
+        values (ndarray): Decimals to sum.
+        groups (ndarray): Group code of each value, -1 for none.
+        precision (int): Decimal places of the values.
+
+    Returns:
+        ndarray: Object array of running sums, nan where there is no group
+            or value.
+    """
+    sums = np.full(len(values), np.nan, dtype=object)
+    if not len(values):
+        return sums
+    missing = pd.isna(values)
+    scaled = list([0 if skip else to_scaled(x, precision) for x, skip in zip(values, missing)])
+    try:
+        scaled = np.array(scaled, dtype=np.int64)
+    except OverflowError:
+        scaled = np.array(scaled, dtype=object)
+    order = np.argsort(groups, kind='stable')
+    ordered = groups[order]
+    limbs = np.cumsum(amount_limbs(scaled[order]), axis=0)
+    # take off the sums of the groups before each row's own
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    before = np.concatenate([np.zeros((1, 3), dtype=limbs.dtype), limbs])[starts]
+    limbs -= np.repeat(before, np.diff(np.r_[starts, len(order)]), axis=0)
+    running = join_limbs(carry(limbs))
+    keep = (ordered >= 0) & ~missing[order]
+    sums[order[keep]] = np.frompyfunc(lambda x: from_scaled(x, precision), 1, 1)(running[keep])
+    return sums
+
+
+class PathBalances:
+    __slots__ = ('entries', 'times', 'changes', 'running')
+
+    def __init__(self) -> None:
+        self.entries = np.zeros(0, dtype=np.int64)           # store positions in running order
+        self.times = np.zeros(0, dtype=np.int64)             # their timestamps, LAST when missing
+        self.changes = np.zeros((0, 2, 3), dtype=np.int64)   # limbs of the scaled value and quantity balance of each entry
+        self.running = np.zeros((0, 2, 3), dtype=np.int64)   # limbs of the running sums of changes
+
+
+class RunningBalances:
+
+    def __init__(self, depth) -> None:
+        self.depth = depth   # path levels, see LEVELS
+        self.reset()
+
+    def reset(self):
+        self.size = 0     # entries read from the store
+        self.paths = {}   # path codes -> PathBalances
+
+    def update(self, store):
+        """
+        Read entries appended to store since the last update.
+
+        Args:
+            store (EntryStore): The ledger's entries.
+        """
+        if len(store) < self.size:
+            self.reset()
+        start = self.size
+        if len(store) == start:
+            return
+        self.size = len(store)
+        codes = np.stack([store.code_array(level)[start:] for level in LEVELS[:self.depth]], axis=1)
+        times = store.timestamp_array()[start:]
+        times = np.where(times == NAT, LAST, times)
+
+        # balance of each entry, signed by side and account type
+        categories = store.categories
+        sides = store.code_array('side')[start:]
+        sign = np.where(sides == categories['side'].lookup.get('debit', -2), 1,
+                        np.where(sides == categories['side'].lookup.get('credit', -2), -1, 0))
+        sign[store.code_array('account_type')[start:] != categories['account_type'].lookup.get('assets', -2)] *= -1
+        changes = np.stack([amount_limbs(store.scaled_column('value', start) * sign),
+                            amount_limbs(store.scaled_column('quantity', start) * sign)], axis=1)
+
+        paths, inverse = np.unique(codes, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.lexsort((times, inverse))
+        bounds = np.searchsorted(inverse[order], np.arange(len(paths) + 1))
+        for path, first, last in zip(paths, bounds[:-1], bounds[1:]):
+            rows = order[first:last]
+            key = tuple(path.tolist())
+            balances = self.paths.get(key)
+            if balances is None:
+                balances = self.paths[key] = PathBalances()
+            self._extend(balances, rows + start, times[rows], changes[rows])
+
+    def _extend(self, balances, entries, times, changes):
+        if len(balances.times) and times[0] < balances.times[-1]:
+            # earlier entries than the last one, sum the whole path again
+            entries = np.r_[balances.entries, entries]
+            times = np.r_[balances.times, times]
+            changes = np.concatenate([balances.changes, changes])
+            order = np.lexsort((entries, times))
+            entries, times, changes = entries[order], times[order], changes[order]
+            running = carry(np.cumsum(changes, axis=0))
+            balances.entries, balances.times, balances.changes, balances.running = entries, times, changes, running
+            return
+        running = np.cumsum(changes, axis=0)
+        if len(balances.running):
+            running += balances.running[-1]
+        carry(running)
+        balances.entries = np.r_[balances.entries, entries]
+        balances.times = np.r_[balances.times, times]
+        balances.changes = np.concatenate([balances.changes, changes])
+        balances.running = np.concatenate([balances.running, running])
+
+    def frame(self, store, as_float=False):
+        """
+        Running balances with one row per entry, sorted by path, then
+        timestamp, then ledger order.
+
+        Args:
+            store (EntryStore): The store the balances were updated from.
+            as_float (bool): Return float64 balances instead of Decimals.
+
+        Returns:
+            DataFrame: DataFrame with index account_type down to the path
+                depth and columns timestamp, balance, balance_quantity,
+                running_bal and running_bal_quantity
+        """
+        names = LEVELS[:self.depth]
+        if not self.paths:
+            return pd.DataFrame(columns=names + COLUMNS).set_index(names)
+        values = list([store.categories[level].values + [np.nan] for level in names])
+        keys = list([tuple([values[i][code] for i, code in enumerate(path)]) for path in self.paths])
+        # paths in the order sort_values puts them, missing values last
+        order = sorted(range(len(keys)), key=lambda i: list([(pd.isna(key), '' if pd.isna(key) else key) for key in keys[i]]))
+        groups = list([self.paths[path] for path in self.paths])
+        groups = list([groups[i] for i in order])
+        lengths = list([len(group.entries) for group in groups])
+        index = pd.MultiIndex.from_arrays(
+            list([np.repeat(np.array([keys[i][level] for i in order], dtype=object), lengths) for level in range(self.depth)]),
+            names=names)
+        times = np.concatenate([group.times for group in groups])
+        changes = join_limbs(np.concatenate([group.changes for group in groups]))
+        running = join_limbs(np.concatenate([group.running for group in groups]))
+        frame = pd.DataFrame(index=index)
+        frame['timestamp'] = pd.DatetimeIndex(np.where(times == LAST, NAT, times).view('M8[ns]')).tz_localize('UTC')
+        for column, amounts, i in [('balance', changes, 0), ('balance_quantity', changes, 1),
+                                   ('running_bal', running, 0), ('running_bal_quantity', running, 1)]:
+            precision = AMOUNT_PRECISIONS['value' if i == 0 else 'quantity']
+            if as_float:
+                frame[column] = amounts[:, i].astype(np.float64) / 10 ** precision
+            else:
+                frame[column] = np.frompyfunc(lambda x: from_scaled(x, precision), 1, 1)(amounts[:, i])
+        if self.depth == 1:
+            frame.index = frame.index.get_level_values(0)
+        return frame
@@ -0,0 +1,186 @@
+"""
+Async tx sources that page a user's txs in timestamp order.
+
+A source returns one page of txs at a time, starting after a cursor, and
+the cursor to continue from. Cursors are opaque to callers but plain
+values, so the cursor of the last synced tx can be stored with a book
+and a later sync only fetches txs added since. Txs are ordered by
+timestamp, then id, so txs sharing a timestamp aren't skipped or repeated
+across pages.
+
+sync_book fetches pages in a producer task while BookKeeper books the
+pages already fetched. Booking blocks, so pages are booked one at a time
+in the loop's default executor and the event loop stays free. Pages wait
+in a bounded queue, so a fast source never runs more than queue_size
+pages ahead of the book.
+
+MemorySource keeps txs in memory and JsonFileSource reads a json export
+such as tests/example_txs.json, both with optional simulated latency, to
+sync offline. FirestoreSource pages a Firestore transactions collection.
+
+  Typical usage example:
+    loop = asyncio.get_event_loop()
+    source = FirestoreSource(firestore_ref, uid)
+    cursor = loop.run_until_complete(sync_book(bk, source))
+    ...
+    cursor = loop.run_until_complete(sync_book(bk, source, cursor))
+"""
+from abc import ABC, abstractmethod
+import asyncio
+from bisect import bisect_right
+import json
+from decimal import Decimal
+from .utils import tx_timestamp
+
+PAGE_SIZE = 500
+QUEUE_SIZE = 4   # pages fetched ahead of the book
+
+
+def tx_key(tx):
+    # (timestamp, id) order of a tx dict, see MemorySource
+    timestamp = tx_timestamp(tx)
+    return (timestamp.value if timestamp is not None else -1, str(tx.get('id', '')))
+
+
+class PagedSource(ABC):
+
+    @abstractmethod
+    async def page(self, cursor=None, limit=PAGE_SIZE):
+        """
+        Txs after cursor in timestamp order.
+
+        Args:
+            cursor: Cursor returned with an earlier page, None to start
+                from the first tx.
+            limit (int): Most txs to return.
+
+        Returns:
+            tuple: (list of tx dicts, cursor after the last of them). The
+                list is empty and the cursor unchanged when there are no
+                more txs.
+        """
+
+    async def pages(self, cursor=None, page_size=PAGE_SIZE):
+        """
+        Yield (txs, cursor) pages after cursor until the source is exhausted.
+        """
+        while True:
+            txs, cursor = await self.page(cursor, page_size)
+            if not txs:
+                return
+            yield txs, cursor
+            if len(txs) < page_size:
+                return
+
+
+class MemorySource(PagedSource):
+
+    def __init__(self, txs=None, latency=0) -> None:
+        self.latency = latency   # seconds each page takes to fetch
+        self.txs = []
+        self.keys = []   # tx_key of each tx
+        self.add(txs or [])
+
+    def add(self, txs):
+        """
+        Add tx dicts to the source, e.g. to simulate new trades between
+        syncs.
+        """
+        rows = sorted(list(zip(self.keys, self.txs)) + list([(tx_key(tx), tx) for tx in txs]), key=lambda row: row[0])
+        self.keys = list([key for key, tx in rows])
+        self.txs = list([tx for key, tx in rows])
+
+    async def page(self, cursor=None, limit=PAGE_SIZE):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        start = 0 if cursor is None else bisect_right(self.keys, tuple(cursor))
+        txs = self.txs[start:start + limit]
+        return txs, (self.keys[start + len(txs) - 1] if txs else cursor)
+
+
+class JsonFileSource(MemorySource):
+
+    def __init__(self, path, latency=0) -> None:
+        super().__init__(latency=latency)
+        self.path = path
+        self.loaded = False
+
+    def load(self):
+        # numbers become Decimals, the way Fixes.local_txs reads exports
+        with open(self.path, 'r') as json_file:
+            txs = json.load(json_file)
+        for tx in txs:
+            for key, value in tx.items():
+                if isinstance(value, (int, float)):
+                    tx[key] = Decimal(str(value))
+        self.add(txs)
+        self.loaded = True
+
+    async def page(self, cursor=None, limit=PAGE_SIZE):
+        if not self.loaded:
+            await asyncio.get_event_loop().run_in_executor(None, self.load)
+        return await super().page(cursor, limit)
+
+
+class FirestoreSource(PagedSource):
+
+    def __init__(self, firestore_ref, uid, collection='transactions') -> None:
+        self.firestore_ref = firestore_ref   # firestore.client(), see Fixes.firestore_ref
+        self.uid = uid
+        self.collection = collection
+
+    def fetch(self, cursor, limit):
+        query = self.firestore_ref.collection(self.collection).where(u'uid', u'==', self.uid)
+        query = query.order_by(u'timestamp').order_by(u'id')
+        if cursor is not None:
+            query = query.start_after({u'timestamp': cursor[0], u'id': cursor[1]})
+        txs = list([doc.to_dict() for doc in query.limit(limit).get()])
+        return txs, ((txs[-1]['timestamp'], txs[-1]['id']) if txs else cursor)
+
+    async def page(self, cursor=None, limit=PAGE_SIZE):
+        # the client blocks, so each page is fetched in a thread
+        return await asyncio.get_event_loop().run_in_executor(None, self.fetch, cursor, limit)
+
+
+async def sync_book(bk, source, cursor=None, page_size=PAGE_SIZE, queue_size=QUEUE_SIZE, auto_detect=True):
+    """
+    Add txs of source after cursor to a book, fetching the next pages while
+    earlier ones are booked in the loop's default executor. Don't use the
+    book elsewhere until the sync returns.
+
+    Args:
+        bk (BookKeeper): Book to add to.
+        source (PagedSource): Where to read txs.
+        cursor: Cursor returned by the last sync of this book and source,
+            None to add every tx.
+        page_size (int): Txs per page.
+        queue_size (int): Most fetched pages waiting to be booked.
+
+    Returns:
+        Cursor after the last tx added, to pass to the next sync.
+    """
+    loop = asyncio.get_event_loop()
+    queue = asyncio.Queue(maxsize=queue_size)
+    start = cursor
+
+    async def fetch():
+        try:
+            async for page in source.pages(start, page_size):
+                await queue.put(page)
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.ensure_future(fetch())
+    try:
+        while True:
+            page = await queue.get()
+            if page is None:
+                break
+            txs, page_cursor = page
+            await loop.run_in_executor(None, bk.add_txs, txs, auto_detect)
+            cursor = page_cursor
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+    return cursor
@@ -0,0 +1,124 @@
+"""
+Tax lot indexes keep a position's open tax lots ordered for relief
+without copying or re-sorting every open lot on each close.
+
+An index is a binary heap with lazy deletion. Whenever a lot changes
+(opened, partially closed, reclassified to long term) the position bumps
+the lot's version and pushes a fresh heap item. Items whose version is
+out of date, or whose lot has no available quantity left, are discarded
+when they reach the top of the heap.
+
+Each relief strategy is backed by its own index, keyed by one of the
+functions in RELIEF_STRATEGIES. Ties are always broken by the order the
+lots were opened in.
+
+  Typical usage example:
+    index = TaxLotIndex(position, RELIEF_STRATEGIES['fifo'])
+    lot_id = index.peek()
+"""
+import heapq
+import pandas as pd
+
+
+def insertion_key(position, id, lot):
+    # empty key -> lots come out in the order they were opened
+    return ()
+
+
+def fifo_key(position, id, lot):
+    return (lot['timestamp'],)
+
+
+def lifo_key(position, id, lot):
+    # integer nanoseconds, so lots apart by less than a microsecond still order
+    return (-pd.Timestamp(lot['timestamp']).value, -position._lot_seq[id])
+
+
+def hifo_key(position, id, lot):
+    return (-lot['price'],)
+
+
+def tax_liability_key(position, id, lot):
+    # market price is a shared positive factor of every lot's unrealized
+    # gain, so qty * tax rate gives the same ordering as unrealized_gain * tax rate
+    rates = position.tax_rates
+    rate = rates[lot['term']] if rates else 1
+    return (-(lot['available_qty'] * rate),)
+
+
+def min_tax_key(position, id, lot):
+    rates = position.tax_rates
+    rate = rates[lot['term']] if rates else 1
+    return (lot['available_qty'] * rate,)
+
+
+RELIEF_STRATEGIES = {
+    'fifo': fifo_key,
+    'lifo': lifo_key,
+    'hifo': hifo_key,
+    'max_tax': tax_liability_key,
+    'min_tax': min_tax_key,
+}
+# strategies whose keys scale with market price
+TAX_STRATEGIES = ['max_tax', 'min_tax']
+# specific id relieves the lots named by the tx, then falls back to this strategy
+SPECIFIC_ID = 'specific_id'
+SPECIFIC_ID_FALLBACK = 'fifo'
+
+
+def check_strategy(strategy):
+    if strategy != SPECIFIC_ID and strategy not in RELIEF_STRATEGIES:
+        raise Exception('Unknown lot relief strategy {}. Must be one of {}'.format(
+            strategy, list(RELIEF_STRATEGIES.keys()) + [SPECIFIC_ID]))
+    return strategy
+
+
+class TaxLotIndex:
+
+    def __init__(self, position, key) -> None:
+        self.position = position
+        self.key = key
+        self._heap = []
+        self.rebuild()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def rebuild(self):
+        """
+        Rebuild the heap from the position's current open lots. Used on
+        creation and to drop stale items once they outnumber live ones.
+        """
+        position = self.position
+        self._heap = list([self._item(id, lot) for id, lot in position._opens.items()
+                           if lot['available_qty'] > 0])
+        heapq.heapify(self._heap)
+
+    def push(self, id):
+        heapq.heappush(self._heap, self._item(id, self.position._opens[id]))
+        if len(self._heap) > 2 * len(self.position._opens) + 32:
+            self.rebuild()
+
+    def peek(self):
+        """
+        Id of the next lot to relieve.
+
+        Returns:
+            str: Lot id or None if there are no open lots.
+        """
+        heap = self._heap
+        while heap:
+            id, version = heap[0][-1], heap[0][-2]
+            if self._is_live(id, version):
+                return id
+            heapq.heappop(heap)
+        return None
+
+    def _item(self, id, lot):
+        position = self.position
+        return (*self.key(position, id, lot), position._lot_seq[id], position._lot_version[id], id)
+
+    def _is_live(self, id, version):
+        position = self.position
+        lot = position._opens.get(id)
+        return lot is not None and position._lot_version[id] == version and lot['available_qty'] > 0
@@ -10,7 +10,7 @@ This allows for tracking higher level positions outside the scope of a tx.
 """
 
 from .components.asset import Asset
-from .components.entry import Entry
+from .components.entry import Entry, compile_template
 from .entry_config import FEES_PAID, CASH, CRYPTO
 
 debit_fee_entry = {'side': "debit", 'mkt': 'fee', **FEES_PAID}
@@ -33,11 +33,13 @@ class BaseTx:
         **kwargs
     ) -> None:
         self.entry_template = entry_template
-        self.fee_entry_template = fee_entry_template
+        # copied so a stable coin fee below doesn't change the shared default
+        self.fee_entry_template = fee_entry_template.copy()
         self.id = kwargs.get("id", None)
         self.type = kwargs.get("type", None)
         self.taxable = kwargs.get("taxable", False)
         self.timestamp = kwargs.get("timestamp", None)
+        self.lot_ids = kwargs.get("lot_ids", [])  # tax lots to relieve with specific id strategy
         self.assets = {}
         self.add_asset("base", **kwargs)
         self.add_asset("quote", **kwargs)
@@ -53,7 +55,7 @@ class BaseTx:
                 kwargs['fee_usd_price'] = kwargs['quote_usd_price']
             self.add_asset("fee", **kwargs)
             if self.assets['fee'].is_stable and not self.assets['fee'].is_fiat:
-                self.fee_entry_template['credit'] = stable_credit_fee_entry.copy()
+                self.fee_entry_template['credit'] = stable_credit_fee_entry
             self.total += self.assets['fee'].usd_value
 
     def get_affected_balances(self):
@@ -102,14 +104,14 @@ class BaseTx:
         return entry
 
     def create_entries(self, entry_configs, fee_configs):
-        entries = list([self.create_entry(**config) for config in list(entry_configs.values())])
+        entries = list([compile_template(config).build(self) for config in list(entry_configs.values())])
         if 'fee' in self.assets and self.assets['fee'].quantity > 0:
             if self.assets['fee'].is_fiat:
                 # add fee entries to list of tx entries
-                fee_entries = list([self.create_entry(**config) for config in list(fee_configs.values())])
+                fee_entries = list([compile_template(config).build(self) for config in list(fee_configs.values())])
                 entries += fee_entries
             else:
-                entries.append(self.create_entry(**self.fee_entry_template['debit']))
+                entries.append(compile_template(self.fee_entry_template['debit']).build(self))
 
         self.entries = entries
         return entries
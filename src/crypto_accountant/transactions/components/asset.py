@@ -3,7 +3,7 @@ An Asset represents the info about a coin that makes up part
 of a transaction. Currently it is used as a base coin, 
 quote coin, or fee coin in a tx.
 """
-from ..utils import set_precision
+from ..utils import set_precision, is_fixed_point, to_scaled, from_scaled, QUANTITY_PRECISION, PRICE_PRECISION, VALUE_PRECISION
 
 stable_coins = [
     'usd',
@@ -18,6 +18,7 @@ stable_coins = [
 
 
 class Asset:
+    __slots__ = ('_fixed', 'symbol', '_quantity', '_usd_price', '_usd_value', 'is_fiat', 'is_stable')
 
     def __init__(
         self,
@@ -25,34 +26,60 @@ class Asset:
         qty,
         price,
     ) -> None:
+        # fixed point assets keep amounts as scaled integers
+        self._fixed = is_fixed_point()
         self.symbol = symbol.upper()
         self.quantity = qty
         self.usd_price = price
-        self.usd_value = set_precision(self.quantity * self.usd_price, 2)
+        self.usd_value = self.quantity * self.usd_price
         self.is_fiat = self.symbol.lower() == "usd"
         self.is_stable = self.is_fiat or self.symbol.lower() in stable_coins
 
     @property
     def quantity(self):
+        if self._fixed:
+            return from_scaled(self._quantity, QUANTITY_PRECISION)
         return self._quantity
 
     @property
     def usd_price(self):
+        if self._fixed:
+            return from_scaled(self._usd_price, PRICE_PRECISION)
         return self._usd_price
 
+    @property
+    def usd_value(self):
+        if self._fixed:
+            return from_scaled(self._usd_value, VALUE_PRECISION)
+        return self._usd_value
+
     @quantity.setter
     def quantity(self, val):
-        self._quantity = set_precision(val, 18)
+        if self._fixed:
+            self._quantity = to_scaled(val, QUANTITY_PRECISION)
+        else:
+            self._quantity = set_precision(val, QUANTITY_PRECISION)
 
     @usd_price.setter
     def usd_price(self, val):
-        self._usd_price = set_precision(val, 18)
+        if self._fixed:
+            self._usd_price = to_scaled(val, PRICE_PRECISION)
+        else:
+            self._usd_price = set_precision(val, PRICE_PRECISION)
 
-    def to_dict(self):
-        val = self.__dict__.copy()
-        val['usd_price'] = val['_usd_price']
-        val['quantity'] = val['_quantity']
-        del val['_usd_price']
-        del val['_quantity']
+    @usd_value.setter
+    def usd_value(self, val):
+        if self._fixed:
+            self._usd_value = to_scaled(val, VALUE_PRECISION)
+        else:
+            self._usd_value = set_precision(val, VALUE_PRECISION)
 
-        return val
+    def to_dict(self):
+        return {
+            'symbol': self.symbol,
+            'is_fiat': self.is_fiat,
+            'is_stable': self.is_stable,
+            'usd_price': self.usd_price,
+            'quantity': self.quantity,
+            'usd_value': self.usd_value,
+        }
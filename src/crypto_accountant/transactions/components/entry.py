@@ -1,9 +1,26 @@
-from ..utils import set_precision
+from ..utils import set_precision, is_fixed_point, to_scaled, from_scaled, QUANTITY_PRECISION, PRICE_PRECISION, VALUE_PRECISION
+
+
+# fields in to_dict order, close_quote is left out when 0
+FIELDS = ('id', 'account_type', 'account', 'sub_account', 'timestamp', 'symbol',
+          'side', 'type', 'quantity', 'value', 'quote', 'close_quote')
+PRECISIONS = {
+    'quantity': QUANTITY_PRECISION,
+    'value': VALUE_PRECISION,
+    'quote': PRICE_PRECISION,
+    'close_quote': PRICE_PRECISION,
+}
+# asset attribute each amount defaults to, same precision as the entry's
+ASSET_AMOUNTS = {'quantity': '_quantity', 'value': '_usd_value', 'quote': '_usd_price', 'close_quote': '_usd_price'}
 
 
 class Entry:
+    __slots__ = ('_fixed', 'id', 'account_type', 'account', 'sub_account', 'timestamp', 'symbol',
+                 'side', 'type', '_quantity', '_value', '_quote', '_close_quote')
 
     def __init__(self, **kwargs) -> None:
+        # fixed point entries keep amounts as scaled integers
+        self._fixed = is_fixed_point()
         self.id = kwargs.get('id', '')
         self.account_type = kwargs.get('account_type', '')
         self.account = kwargs.get('account', '')
@@ -21,47 +38,123 @@ class Entry:
 
     @property
     def quantity(self):
-        return self._quantity
+        return self._get(self._quantity, QUANTITY_PRECISION)
 
     @property
     def value(self):
-        return self._value
+        return self._get(self._value, VALUE_PRECISION)
 
     @property
     def quote(self):
-        return self._quote
+        return self._get(self._quote, PRICE_PRECISION)
 
     @property
     def close_quote(self):
-        return self._close_quote
+        return self._get(self._close_quote, PRICE_PRECISION)
 
     @quantity.setter
     def quantity(self, qty):
-        self._quantity = set_precision(qty, 18)
+        self._quantity = self._set(qty, QUANTITY_PRECISION)
 
     @value.setter
     def value(self, val):
-        self._value = set_precision(val, 2)
+        self._value = self._set(val, VALUE_PRECISION)
 
     @quote.setter
     def quote(self, val):
-        self._quote = set_precision(val, 18)
+        self._quote = self._set(val, PRICE_PRECISION)
 
     @close_quote.setter
     def close_quote(self, val):
-        self._close_quote = set_precision(val, 18)
+        self._close_quote = self._set(val, PRICE_PRECISION)
 
-    def to_dict(self):
-        val = self.__dict__.copy()
-        val['quantity'] = val['_quantity']
-        val['value'] = val['_value']
-        val['quote'] = val['_quote']
-        del val['_quantity']
-        del val['_value']
-        del val['_quote']
-
-        if val['_close_quote'] != 0:
-            val['close_quote'] = val['_close_quote']
-        del val['_close_quote']
+    def _get(self, val, precision):
+        return from_scaled(val, precision) if self._fixed else val
+
+    def _set(self, val, precision):
+        return to_scaled(val, precision) if self._fixed else set_precision(val, precision)
 
+    def get(self, field, default=None):
+        # read a field the way to_dict()[field] would, without building the dict
+        if field not in FIELDS or (field == 'close_quote' and self._close_quote == 0):
+            return default
+        return getattr(self, field)
+
+    def to_dict(self):
+        val = {field: getattr(self, field) for field in FIELDS[:-1]}
+        if self._close_quote != 0:
+            val['close_quote'] = self.close_quote
         return val
+
+
+class EntryTemplate:
+    """
+    An entry config dict compiled once into the fields it fixes, see
+    compile_template. Entries built from it only fill in what varies per
+    tx or lot, instead of merging config dicts and passing them through
+    Entry(**kwargs).
+    """
+    __slots__ = ('mkt', 'fields', 'amounts')
+
+    def __init__(self, config) -> None:
+        self.mkt = config.get('mkt', 'base')
+        self.fields = {field: config[field] for field in FIELDS[:8] if field in config}
+        self.amounts = {field: config[field] for field in PRECISIONS if field in config}
+
+    def build(self, tx, mkt=None, **overrides):
+        """
+        Entry for tx, the same as tx.create_entry(**{**config, 'mkt': mkt, **overrides}).
+
+        Args:
+            tx (BaseTx): Tx the entry belongs to.
+            mkt (str): Asset of the tx to use instead of the template's.
+            overrides: type and amount fields to set instead of the template's.
+
+        Returns:
+            Entry: The new entry.
+        """
+        asset = tx.assets[mkt or self.mkt]
+        fields = self.fields
+        entry = Entry.__new__(Entry)
+        entry._fixed = is_fixed_point()
+        entry.id = fields.get('id', tx.id)
+        entry.account_type = fields.get('account_type')
+        entry.account = fields.get('account')
+        entry.sub_account = fields.get('sub_account')
+        entry.timestamp = fields.get('timestamp', tx.timestamp)
+        entry.symbol = fields.get('symbol', asset.symbol)
+        entry.side = fields.get('side', '')
+        entry.type = overrides['type'] if 'type' in overrides else fields.get('type', tx.type)
+        for field, precision in PRECISIONS.items():
+            if field in overrides:
+                stored = entry._set(overrides[field], precision)
+            elif field in self.amounts:
+                stored = entry._set(self.amounts[field], precision)
+            elif asset._fixed == entry._fixed:
+                # already rounded to the entry's precision
+                stored = getattr(asset, ASSET_AMOUNTS[field])
+            else:
+                stored = entry._set(getattr(asset, ASSET_AMOUNTS[field][1:]), precision)
+            setattr(entry, '_' + field, stored)
+        return entry
+
+
+_templates = {}   # config items -> EntryTemplate
+
+
+def compile_template(config):
+    """
+    Compiled EntryTemplate of an entry config dict, cached by the dict's
+    items. Equal configs share a template, so copies made per tx don't
+    grow the cache.
+    """
+    key = tuple(config.items())
+    try:
+        template = _templates.get(key)
+    except TypeError:
+        # unhashable config values aren't cached
+        return EntryTemplate(config)
+    if template is None:
+        template = EntryTemplate(config)
+        _templates[key] = template
+    return template
@@ -1,4 +1,5 @@
 from .base import BaseTx
+from .components.entry import compile_template
 from .entry_config import CRYPTO, REALIZED_GAIN_LOSS, UNREALIZED_GAIN_LOSS, CRYPTO_FAIR_VALUE_ADJ
 
 # first, adjust to market and accrue unrealized gains.
@@ -49,9 +50,9 @@ class TaxableTx(BaseTx):
         self.taxable = True
 
     def generate_debit_entry(self):
-        entries = [self.create_entry(**self.entry_template['debit'])]
+        entries = [compile_template(self.entry_template['debit']).build(self)]
         if 'fee' in self.taxable_assets.keys():
-            entries.append(self.create_entry(**self.fee_entry_template['debit']))
+            entries.append(compile_template(self.fee_entry_template['debit']).build(self))
         return entries
 
     def generate_credit_entries(self, asset, open_price, qty, **kwargs):
@@ -61,52 +62,25 @@ class TaxableTx(BaseTx):
         closing_val = tx_asset.usd_price * qty
         open_val = open_price * qty
         change_val = closing_val - open_val
+        tx_type = kwargs.get('type', self.type)
         all_entries = []
         # entries are the same otherwise, so for loop
         for entry in self.adj_entries:
-            adj_config = {
-                **entry,
-                'mkt': asset,
-                'quote': tx_asset.usd_price,
-                'value': change_val,
-            }
+            all_entries.append(compile_template(entry).build(
+                self, asset, quote=tx_asset.usd_price, value=change_val))
 
-            all_entries.append(self.create_entry(**adj_config))
-
-        close_cost_basis_entry = self.close_entries[0]
-        close_fair_value_entry = self.close_entries[1]
         # 2. close crypto and fair value
-        close_base_config = {
-            'mkt': asset,
-            'type': kwargs.get('type', self.type),
-            'quote': open_price,
-            'close_quote': tx_asset.usd_price,
-        }
-        close_cost_basis_entry = {
-            **close_cost_basis_entry,
-            **close_base_config,
-            'quantity': qty,  # intentionally 0, if overwritten will affect quantity which is not wanted
-            'value': open_val,
-        }
-        close_fair_value_entry = {
-            **close_fair_value_entry,
-            **close_base_config,
-            'quantity': 0,  # intentionally 0, if overwritten will affect quantity which is not wanted
-            'value': change_val,
-        }
-        all_entries.append(self.create_entry(**close_cost_basis_entry))
-        all_entries.append(self.create_entry(**close_fair_value_entry))
+        all_entries.append(compile_template(self.close_entries[0]).build(
+            self, asset, type=tx_type, quote=open_price, close_quote=tx_asset.usd_price,
+            quantity=qty, value=open_val))
+        # quantity intentionally 0, if overwritten will affect quantity which is not wanted
+        all_entries.append(compile_template(self.close_entries[1]).build(
+            self, asset, type=tx_type, quote=open_price, close_quote=tx_asset.usd_price,
+            quantity=0, value=change_val))
         # 3. Move gains (use same value as fair value entry uses)
         for entry in self.gain_entries:
-            adj_config = {
-                **entry,
-                'mkt': asset,
-                'type': kwargs.get('type', self.type),
-                'quantity': 0,  # intentionally 0, if overwritten will affect quantity which is not wanted
-                'quote': open_price,
-                'close_quote': tx_asset.usd_price,
-                'value': change_val,
-            }
-            all_entries.append(self.create_entry(**adj_config))
+            all_entries.append(compile_template(entry).build(
+                self, asset, type=tx_type, quantity=0, quote=open_price,
+                close_quote=tx_asset.usd_price, value=change_val))
 
         return all_entries
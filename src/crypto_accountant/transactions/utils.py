@@ -1,4 +1,17 @@
-from decimal import Decimal
+from decimal import Decimal, Context, ROUND_HALF_EVEN, MAX_PREC, MAX_EMAX, MIN_EMIN
+
+# decimal places amounts are kept at
+QUANTITY_PRECISION = 18
+PRICE_PRECISION = 18
+VALUE_PRECISION = 2
+
+# amounts are Decimals by default. In fixed mode Asset, Entry, Position and
+# Ledger keep them as integers scaled by 10 ** precision instead.
+NUMERIC_MODES = ['decimal', 'fixed']
+numeric_mode = {'mode': 'decimal'}
+
+# wide enough that scaling never rounds, so results match set_precision exactly
+exact_context = Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN, rounding=ROUND_HALF_EVEN)
 
 
 def set_precision(val, precision):
@@ -6,3 +19,33 @@ def set_precision(val, precision):
     fmt_str = '{' + fmt_str + '}'
     val = fmt_str.format(val)
     return Decimal(val)
+
+
+def set_numeric_mode(mode):
+    if mode not in NUMERIC_MODES:
+        raise Exception('Unknown numeric mode {}. Must be one of {}'.format(mode, NUMERIC_MODES))
+    numeric_mode['mode'] = mode
+
+
+def is_fixed_point():
+    return numeric_mode['mode'] == 'fixed'
+
+
+def to_scaled(val, precision):
+    # integer equal to set_precision(val, precision) * 10 ** precision
+    if isinstance(val, int):
+        return val * 10 ** precision
+    if not isinstance(val, Decimal):
+        val = Decimal(val)
+    return int(val.scaleb(precision, exact_context).to_integral_value(context=exact_context))
+
+
+def from_scaled(val, precision):
+    return Decimal(val).scaleb(-precision, exact_context)
+
+
+def round_amount(val, precision):
+    # Decimal rounded the way Asset and Entry round amounts in the current mode
+    if is_fixed_point():
+        return from_scaled(to_scaled(val, precision), precision)
+    return set_precision(val, precision)
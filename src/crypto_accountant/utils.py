@@ -3,7 +3,9 @@ import logging
 from os import replace
 from google.api_core.datetime_helpers import DatetimeWithNanoseconds
 from decimal import Decimal
+from functools import lru_cache
 import pandas as pd
+from src.crypto_accountant.transactions.base import BaseTx
 from src.crypto_accountant.transactions.interest_in_account import InterestInAccount
 from src.crypto_accountant.transactions.interest_in_stake import InterestInStake
 from src.crypto_accountant.transactions.reward import Reward
@@ -40,61 +42,105 @@ def check_type(val, check_string=False, types=[Decimal]):
     return val
 
 
+TYPE_KEYS = ['tx_type', 'txn_type', 'type', 'trans_type', 'transaction_type']
+TIMESTAMP_KEYS = ['timestamp', 'time', 'date', 'time_stamp']
+# tx type -> tx class create_tx builds, see register_tx
+TX_TYPES = {
+    'deposit': Deposit,
+    'withdrawal': Withdrawal,
+    'buy': Buy,
+    'sell': Sell,
+    'swap': Swap,
+    'send': Send,
+    'receive': Receive,
+    'reward': Reward,
+    'interest-in-stake': InterestInStake,
+    'interest-in-account': InterestInAccount,
+}
+
+
+def register_tx(tx_type, tx_class):
+    """
+    Make create_tx build tx_class for txs of the given type. Registering
+    an existing type replaces its class.
+
+    Args:
+        tx_type (str): Tx type as it appears in tx dicts.
+        tx_class (class): BaseTx subclass taking create_tx's kwargs.
+    """
+    if not (isinstance(tx_class, type) and issubclass(tx_class, BaseTx)):
+        raise Exception('{} is not a BaseTx subclass'.format(tx_class))
+    TX_TYPES[tx_type] = tx_class
+
+
+@lru_cache(maxsize=4096)
+def normalize_key(key):
+    # camelCase, kebab-case and spaced keys -> snake_case, aliases -> type/timestamp
+    key = key.replace('-', '_')
+    key = key.replace(' ', '_')
+    key_pieces = re.findall('[A-Za-z][^A-Z]*', key)
+    key = '_'.join(key_pieces)
+    key = key.replace('__', '_')
+    key = key.lower()
+    if key in TYPE_KEYS:
+        return 'type'
+    if key in TIMESTAMP_KEYS:
+        return 'timestamp'
+    return key
+
+
+def tx_timestamp(tx):
+    """
+    Timestamp of a tx object or tx dict, parsed the way create_tx parses it.
+
+    Args:
+        tx (BaseTx or dict): Tx to read.
+
+    Returns:
+        Timestamp: The tx's timestamp or None if it has none.
+    """
+    if isinstance(tx, BaseTx):
+        return tx.timestamp
+    timestamp = None
+    for name, value in zip(tx_schema(tuple(tx)), tx.values()):
+        if name == 'timestamp':
+            timestamp = value
+    return check_type(timestamp, check_string=True, types=[pd.Timestamp])
+
+
+@lru_cache(maxsize=1024)
+def tx_schema(keys):
+    """
+    Normalized names of a tx dict's keys, computed once per distinct key
+    tuple. Txs read from the same source share their keys, so only the
+    first pays for normalize_key.
+
+    Args:
+        keys (tuple): Keys in dict order.
+
+    Returns:
+        tuple: normalize_key of each key.
+    """
+    return tuple([normalize_key(key) for key in keys])
+
+
 def create_tx(**kwargs):
-    type = kwargs.get('type', 'other')
     args = {}
-    for key, value in kwargs.items():
-        key = key.replace('-', '_')
-        key = key.replace(' ', '_')
-        key_pieces = re.findall('[A-Za-z][^A-Z]*', key)
-        key = '_'.join(key_pieces)
-        key = key.replace('__', '_')
-        key = key.lower()
-        if key in ['tx_type', 'txn_type', 'type', 'trans_type', 'transaction_type']:
-            tx_type = value
-            args['type'] = tx_type
-        elif key in ['timestamp', 'time', 'date', 'time_stamp']:
+    for key, value in zip(tx_schema(tuple(kwargs)), kwargs.values()):
+        if key == 'type':
+            args['type'] = value
+        elif key == 'timestamp':
             args['timestamp'] = check_type(value, check_string=True, types=[pd.Timestamp])
         else:
             args[key] = check_type(value)
 
     if 'type' in args.keys():
-        type = args['type']
-        if type == 'deposit':
-            return Deposit(**args)
-        elif type == 'withdrawal':
-            return Withdrawal(**args)
-        elif type == 'buy':
-            return Buy(**args)
-        elif type == 'sell':
-            return Sell(**args)
-        elif type == 'swap':
-            return Swap(**args)
-        elif type == 'send':
-            return Send(**args)
-        elif type == 'receive':
-            return Receive(**args)
-        elif type == 'reward':
-            return Reward(**args)
-        elif type == 'interest-in-stake':
-            return InterestInStake(**args)
-        elif type == 'interest-in-account':
-            return InterestInAccount(**args)
-        # elif type == 'interest_in':
-            # return InterestInAccount(**args)
-        else:
-            raise Exception('TYPE {} NOT CREATED'.format(type))
-            return False
+        tx_class = TX_TYPES.get(args['type'])
+        if tx_class is None:
+            raise Exception('TYPE {} NOT CREATED'.format(args['type']))
+        return tx_class(**args)
     else:
         return False
-        # raise Exception('NO TYPE INCLUDED')
-
-    # if tx['type'] == 'reward':
-    #     return Deposit(tx)
-    # if tx['type'] == 'interest_earned_account':
-    #     return Deposit(tx)
-    # if tx['type'] == 'interest_earned_stake':
-    #     return Deposit(tx)
 
 
 def query_df(df, col, val):
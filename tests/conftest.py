@@ -0,0 +1,21 @@
+import pytest
+from src.crypto_accountant.bookkeeper import BookKeeper
+from src.crypto_accountant.transactions.utils import set_numeric_mode
+
+
+@pytest.fixture(params=['decimal', 'fixed'])
+def mode(request):
+    # runs a test once per numeric mode
+    set_numeric_mode(request.param)
+    yield request.param
+    set_numeric_mode('decimal')
+
+
+@pytest.fixture
+def booked():
+    # book txs with plain add_txs, the reference other booking paths match
+    def book(txs, strategy='max_tax', track_history=False):
+        bk = BookKeeper(strategy, track_history=track_history)
+        bk.add_txs(txs)
+        return bk
+    return book
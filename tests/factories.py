@@ -127,12 +127,12 @@ class TxnFactory:
         tx = Buy(**tx_kwargs)
         self.positions[base_currency].add(
             tx.id, tx.assets['base'].usd_price, tx.timestamp, tx.assets['base'].quantity)
-        self.positions['usd']._closes[tx.id] = {
+        self.positions['usd']._set_close(tx.id, {
             'timestamp': tx.timestamp,
             'price': check_type(1),
             'qty': quote_quantity,
             'realized_gain': 0
-        }
+        })
         self.positions['usd'].adjust_to_mtk(check_type(1), timestamp)
         self.transactions.append(tx)
 
@@ -163,12 +163,12 @@ class TxnFactory:
         tx = Swap(**tx_kwargs)
         self.positions[base_currency].add(
             tx.id, tx.assets['base'].usd_price, tx.timestamp, tx.assets['base'].quantity)
-        self.positions[quote_currency]._closes[tx.id] = {
+        self.positions[quote_currency]._set_close(tx.id, {
             'timestamp': tx.timestamp,
             'price': quote_usd_price,
             'qty': quote_quantity,
             'realized_gain': 0
-        }
+        })
         self.positions[quote_currency].adjust_to_mtk(quote_usd_price, timestamp)
         self.transactions.append(tx)
 
@@ -197,12 +197,12 @@ class TxnFactory:
         tx = Sell(**tx_kwargs)
         self.positions['usd'].add(
             tx.id, check_type(1), tx.timestamp, tx.assets['quote'].quantity)
-        self.positions[base_currency]._closes[tx.id] = {
+        self.positions[base_currency]._set_close(tx.id, {
             'timestamp': tx.timestamp,
             'price': base_usd_price,
             'qty': base_quantity,
             'realized_gain': 0
-        }
+        })
         self.positions[base_currency].adjust_to_mtk(base_usd_price, timestamp)
         
         self.transactions.append(tx)
@@ -294,6 +294,49 @@ class TxnFactory:
               
         return txs
 
+    def seeded_txs(count=200, seed=1, types=None):
+        # deterministic tx dicts shaped like example_txs.json, so books built
+        # different ways can be compared tx for tx
+        rand = random.Random(seed)
+        types = types or ['deposit', 'buy', 'buy', 'sell', 'swap', 'send', 'receive', 'reward', 'interest-in-account', 'withdrawal']
+        prices = {'BTC': 1000.0, 'ETH': 100.0, 'LINK': 2.0, 'ADA': 0.5, 'USDC': 1.0}
+        symbols = ['BTC', 'ETH', 'LINK', 'ADA']
+        timestamp = datetime(2017, 1, 1)
+        txs = []
+        for x in range(count):
+            timestamp += timedelta(hours=rand.randint(1, 200))
+            for symbol in symbols:
+                prices[symbol] *= 1 + rand.uniform(-.05, .06)
+            tx_type = rand.choice(types)
+            tx = {
+                'id': str(uuid.UUID(int=rand.getrandbits(128))),
+                'timestamp': timestamp.isoformat() + 'Z',
+                'type': tx_type,
+            }
+            base = rand.choice(symbols)
+            qty = check_type(round(rand.uniform(.01, 3), 8))
+            if tx_type in ['deposit', 'withdrawal']:
+                tx.update(baseCurrency='USD', baseQuantity=check_type(round(rand.uniform(10, 5000), 2)), baseUsdPrice=check_type(1))
+            elif tx_type in ['buy', 'sell']:
+                price = check_type(round(prices[base], 6))
+                tx.update(baseCurrency=base, baseQuantity=qty, baseUsdPrice=price,
+                          quoteCurrency='USD', quoteQuantity=(qty * price).quantize(check_type(.01)), quoteUsdPrice=check_type(1))
+            elif tx_type == 'swap':
+                quote = rand.choice([symbol for symbol in prices if symbol != base])
+                price = check_type(round(prices[base], 6))
+                quote_price = check_type(round(prices[quote], 6))
+                tx.update(baseCurrency=base, baseQuantity=qty, baseUsdPrice=price,
+                          quoteCurrency=quote, quoteQuantity=(qty * price / quote_price).quantize(check_type(1e-8)), quoteUsdPrice=quote_price)
+            else:
+                tx.update(baseCurrency=base, baseQuantity=qty, baseUsdPrice=check_type(round(prices[base], 6)))
+            fee = rand.random()
+            if fee < .3:
+                tx.update(feeCurrency=tx['baseCurrency'], feeQuantity=check_type(round(rand.uniform(.0001, .01), 8)), feeUsdPrice=tx['baseUsdPrice'])
+            elif fee < .45:
+                tx.update(feeCurrency='USD', feeQuantity=check_type(round(rand.uniform(.5, 5), 2)), feeUsdPrice=check_type(1))
+            txs.append(tx)
+        return txs
+
 
 class HistoricalDataFactory:
     def __init__(self, start='1/1/2018', end=datetime.now(), freq='D'):
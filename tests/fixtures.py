@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 import random
 from randomtimestamp.functions import randomtimestamp
 import uuid
+import pandas as pd
 
 import firebase_admin
 from firebase_admin import credentials, firestore
@@ -39,8 +40,8 @@ class Fixes:
 
     def firestore_user_transactions(firestore_ref, uid='903Rf3cVflW2bzWc8x1YL8E78gy1'):
         trans_ref = firestore_ref.collection(u'transactions')
-        riley_trans = trans_ref.where(u'uid', u'==', u'903Rf3cVflW2bzWc8x1YL8E78gy1')
-        raw_transactions = riley_trans.get()
+        user_trans = trans_ref.where(u'uid', u'==', uid)
+        raw_transactions = user_trans.get()
         all_transactions = []
         for raw in raw_transactions:
             trans = raw.to_dict()
@@ -59,6 +60,19 @@ class Fixes:
                     trans[key] = val
         return sorted(all_trans, key=lambda x: x['timestamp'])
 
+    def book_state(bk):
+        # positions and open lots of a book, comparable across booking paths
+        state = {}
+        for symbol, position in bk.positions.items():
+            lots = sorted((str(lot['id']), lot['qty'], lot['price'], lot['term']) for lot in position.open_tax_lots)
+            state[symbol] = (position.balance, position.available_quantity, position.realized_gain,
+                             position.unrealized_gain, position.stats, lots)
+        return state
+
+    def assert_same_book(bk, expected):
+        assert Fixes.book_state(bk) == Fixes.book_state(expected)
+        pd.testing.assert_frame_equal(bk.ledger.raw, expected.ledger.raw)
+
     def test_simple_buy_sell():
         short_buy_date = randomtimestamp(start_year=datetime.now().year, text=False)
         long_buy_date = randomtimestamp(start_year=2018, text=False)
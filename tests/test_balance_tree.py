@@ -0,0 +1,67 @@
+from decimal import Decimal
+import pandas as pd
+import pytest
+from src.crypto_accountant.balance_tree import LEVELS, SIDE_COLUMNS
+from src.crypto_accountant.bookkeeper import BookKeeper
+from tests.factories import TxnFactory
+
+
+def assert_matches_scan(ledger, depths=range(1, 5)):
+    for depth in depths:
+        pd.testing.assert_frame_equal(ledger.trial_balance(LEVELS[:depth]), ledger.summarize(ledger.simple, LEVELS[:depth]))
+
+
+def test_trial_balance_matches_summarize(mode, booked):
+    ledger = booked(TxnFactory.seeded_txs(300, 1)).ledger
+    assert_matches_scan(ledger)
+    pd.testing.assert_frame_equal(ledger.summarize(), ledger.summarize(ledger.simple))
+
+
+def test_trial_balance_follows_added_txs(mode, booked):
+    txs = TxnFactory.seeded_txs(300, 2)
+    bk = booked(txs[:100])
+    assert_matches_scan(bk.ledger)
+    bk.add_txs(txs[100:])
+    assert_matches_scan(bk.ledger)
+    pd.testing.assert_frame_equal(bk.ledger.trial_balance(), booked(txs).ledger.trial_balance())
+
+
+def test_trial_balance_of_lazy_book(booked):
+    txs = TxnFactory.seeded_txs(200, 3)
+    bk = BookKeeper()
+    bk.set_lazy_entries()
+    bk.add_txs(txs)
+    pd.testing.assert_frame_equal(bk.ledger.trial_balance(LEVELS), booked(txs).ledger.trial_balance(LEVELS))
+
+
+def test_totals_restored_after_rollback(mode, booked):
+    txs = TxnFactory.seeded_txs(300, 4)
+    ledger = booked(txs).ledger
+    prefix = booked(txs[:150]).ledger
+    ledger.trial_balance(LEVELS)
+    ledger.rollback(len(prefix.store))
+    pd.testing.assert_frame_equal(ledger.trial_balance(LEVELS), prefix.trial_balance(LEVELS))
+    assert ledger.account_totals('assets') == prefix.account_totals('assets')
+
+
+def test_insert_txs_matches_add_txs(mode, booked):
+    txs = TxnFactory.seeded_txs(300, 5)
+    bk = booked(txs[::2], track_history=True)
+    bk.ledger.trial_balance(LEVELS)
+    bk.insert_txs(txs[1::2])
+    assert_matches_scan(bk.ledger)
+    pd.testing.assert_frame_equal(bk.ledger.trial_balance(LEVELS), booked(txs).ledger.trial_balance(LEVELS))
+
+
+@pytest.mark.parametrize('depth', [1, 2, 3, 4])
+def test_account_totals_match_summarize(mode, depth, booked):
+    ledger = booked(TxnFactory.seeded_txs(300, 6)).ledger
+    summary = ledger.summarize(ledger.simple, LEVELS[:depth])
+    for path, row in summary.iterrows():
+        path = path if isinstance(path, tuple) else (path,)
+        assert ledger.account_totals(*path) == dict(row[SIDE_COLUMNS])
+
+
+def test_account_totals_of_unknown_path(booked):
+    ledger = booked(TxnFactory.seeded_txs(50, 7)).ledger
+    assert ledger.account_totals('assets', 'nope') == {column: Decimal(0) for column in SIDE_COLUMNS}
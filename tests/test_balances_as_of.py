@@ -0,0 +1,43 @@
+import pytest
+import pandas as pd
+from src.crypto_accountant.balance_tree import LEVELS
+from src.crypto_accountant.bookkeeper import BookKeeper
+from tests.factories import TxnFactory
+
+
+@pytest.fixture
+def bk(mode):
+    bk = BookKeeper()
+    bk.add_txs(TxnFactory.seeded_txs(300, 1))
+    return bk
+
+
+@pytest.mark.parametrize('level', LEVELS)
+def test_balances_match_summarized_entries(bk, level):
+    simple = bk.ledger.simple
+    timestamps = simple.index
+    for timestamp in [timestamps[0], timestamps[len(timestamps) // 3], timestamps[len(timestamps) // 2] + pd.Timedelta('1s'), timestamps[-1]]:
+        expected = bk.ledger.summarize(simple[simple.index <= timestamp], LEVELS[:LEVELS.index(level) + 1])
+        pd.testing.assert_frame_equal(bk.ledger.balances_as_of(timestamp, level), expected)
+
+
+def test_balances_after_last_entry_match_summarize(bk):
+    pd.testing.assert_frame_equal(bk.ledger.balances_as_of('2100-01-01'), bk.ledger.summarize(bk.ledger.simple))
+
+
+def test_balances_follow_new_entries(bk):
+    before = bk.ledger.balances_as_of('2100-01-01')
+    bk.add_txs(TxnFactory.seeded_txs(50, 2))
+    after = bk.ledger.balances_as_of('2100-01-01')
+    assert not after.equals(before)
+    pd.testing.assert_frame_equal(after, bk.ledger.summarize(bk.ledger.simple))
+
+
+def test_balances_before_first_entry_are_empty(bk):
+    assert len(bk.ledger.balances_as_of('2000-01-01')) == 0
+    assert len(BookKeeper().ledger.balances_as_of('2021-01-01')) == 0
+
+
+def test_unknown_level_raises(bk):
+    with pytest.raises(Exception, match='Unknown level region'):
+        bk.ledger.balances_as_of('2021-01-01', 'region')
@@ -0,0 +1,70 @@
+from decimal import Decimal
+from functools import partial
+import numpy as np
+import pandas as pd
+import pytest
+from src.crypto_accountant.batch import run_books, TIMING_COLUMNS
+from src.crypto_accountant.bookkeeper import BookKeeper
+from src.crypto_accountant.price_store import PriceStore
+from tests.factories import TxnFactory
+from tests.fixtures import Fixes
+
+
+@pytest.fixture
+def prices(tmp_path):
+    days = pd.date_range('2016-12-01', '2024-01-01', freq='D', tz='UTC')
+    PriceStore.write(str(tmp_path), pd.DataFrame({'BTC': np.linspace(1000, 2000, len(days)), 'ETH': 100.0, 'USD': 1.0}, index=days))
+    return str(tmp_path)
+
+
+def sources():
+    books = {seed: partial(TxnFactory.seeded_txs, 150, seed) for seed in range(3)}
+    books['local'] = Fixes.local_txs()
+    return books
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_reports_match_add_txs(prices, processes):
+    reports = {}
+    timings = run_books(sources(), lambda book_id, report: reports.setdefault(book_id, report), prices, processes)
+    assert list(timings.columns) == TIMING_COLUMNS
+    assert timings['error'].isna().all()
+    assert sorted(reports, key=str) == sorted(sources(), key=str)
+    store = PriceStore(prices)
+    for book_id, source in sources().items():
+        bk = BookKeeper()
+        bk.add_txs(source() if callable(source) else source)
+        curve = bk.ledger.generate_equity_curve('assets', as_float=True)
+        pd.testing.assert_frame_equal(reports[book_id]['summary'], bk.ledger.summarize())
+        pd.testing.assert_frame_equal(reports[book_id]['equity_curve'], curve)
+        pd.testing.assert_frame_equal(reports[book_id]['values'].drop(columns='total'), curve.mul(store.align(curve, fill=0.0)))
+        assert timings.loc[book_id, 'txs'] == bk.booked
+        assert timings.loc[book_id, 'entries'] == len(bk.ledger.store)
+
+
+def test_book_errors_are_reported_not_raised():
+    reports = {}
+    books = {'good': Fixes.local_txs(), 'bad': [{'type': 'nope'}]}
+    timings = run_books(books, lambda book_id, report: reports.setdefault(book_id, report), processes=1)
+    assert list(reports) == ['good']
+    assert 'TYPE nope NOT CREATED' in timings.loc['bad', 'error']
+    assert timings.loc['good', 'error'] is None
+
+
+def test_tax_rates_reach_every_position():
+    rates = {'long': Decimal('0.01'), 'short': Decimal('0.9')}
+    txs = TxnFactory.seeded_txs(300, 5)
+    reports = {}
+    run_books({'book': txs}, lambda book_id, report: reports.setdefault(book_id, report), processes=1, tax_rates=rates)
+    bk = BookKeeper('max_tax', rates)
+    bk.add_txs(txs)
+    assert all(position.tax_rates is rates for position in bk.positions.values())
+    pd.testing.assert_frame_equal(reports['book']['summary'], bk.ledger.summarize())
+    # the rates change which lots are relieved
+    default = BookKeeper()
+    default.add_txs(txs)
+    assert not default.ledger.summarize().equals(bk.ledger.summarize())
+
+
+def test_no_books():
+    assert len(run_books({}, lambda book_id, report: None)) == 0
@@ -0,0 +1,78 @@
+import pickle
+from decimal import Decimal
+import pandas as pd
+import pytest
+from src.crypto_accountant.ledger import Ledger
+from src.crypto_accountant.transactions.components.asset import Asset
+from src.crypto_accountant.transactions.components.entry import Entry, FIELDS
+from src.crypto_accountant.utils import create_tx
+from tests.factories import TxnFactory
+
+
+def entry(**fields):
+    return Entry(**{'id': 'e', 'account_type': 'assets', 'account': 'current_assets', 'sub_account': 'cash',
+                    'timestamp': pd.Timestamp('2021-01-01', tz='UTC'), 'symbol': 'USD', 'side': 'debit',
+                    'type': 'deposit', 'quantity': Decimal('10.5'), 'value': Decimal('10.5'), 'quote': Decimal(1), **fields})
+
+
+@pytest.mark.parametrize('component', [
+    lambda: entry(),
+    lambda: Asset('btc', Decimal('1.5'), Decimal('30000')),
+])
+def test_components_have_no_dict(mode, component):
+    instance = component()
+    assert not hasattr(instance, '__dict__')
+    with pytest.raises(AttributeError):
+        instance.memo = 'x'
+
+
+def test_entry_amounts_round_like_setters(mode):
+    e = entry(quantity=Decimal('1.1234567890123456789'), value=Decimal('2.345'))
+    assert e.quantity == Decimal('1.123456789012345679')
+    assert e.value == Decimal('2.34')
+    assert isinstance(e._quantity, int) == (mode == 'fixed')
+    e.value = 3
+    assert e.value == Decimal('3.00')
+
+
+def test_entry_to_dict_and_get(mode):
+    e = entry()
+    d = e.to_dict()
+    assert list(d) == list(FIELDS[:-1])
+    assert all(e.get(field) == value for field, value in d.items())
+    assert e.get('close_quote', 'none') == 'none'
+    assert e.get('memo', 'none') == 'none'
+    closed = entry(close_quote=Decimal(2)).to_dict()
+    assert closed['close_quote'] == Decimal(2)
+
+
+def test_asset(mode):
+    asset = Asset('usdc', Decimal('2.5'), Decimal('1.001'))
+    assert asset.symbol == 'USDC' and asset.is_stable and not asset.is_fiat
+    assert asset.usd_value == Decimal('2.50')
+    assert asset.to_dict() == {'symbol': 'USDC', 'is_fiat': False, 'is_stable': True,
+                               'usd_price': Decimal('1.001'), 'quantity': Decimal('2.5'), 'usd_value': Decimal('2.50')}
+    assert Asset('usd', 1, 1).is_fiat
+
+
+def test_components_pickle(mode):
+    e = pickle.loads(pickle.dumps(entry(close_quote=Decimal(2))))
+    assert e.to_dict() == entry(close_quote=Decimal(2)).to_dict()
+    asset = pickle.loads(pickle.dumps(Asset('eth', Decimal(2), Decimal(100))))
+    assert asset.to_dict() == Asset('eth', Decimal(2), Decimal(100)).to_dict()
+
+
+def test_ledger_takes_entries_and_dicts_alike(mode):
+    entries = []
+    for tx in TxnFactory.seeded_txs(50, 1):
+        tx = create_tx(**tx)
+        if not tx.taxable:
+            entries += tx.get_entries()
+    assert entries
+    from_entries = Ledger()
+    from_dicts = Ledger()
+    for e in entries:
+        from_entries.add_entry(e)
+        from_dicts.add_entry(e.to_dict())
+    pd.testing.assert_frame_equal(from_entries.raw, from_dicts.raw)
+    assert from_entries.totals == from_dicts.totals
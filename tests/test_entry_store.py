@@ -0,0 +1,61 @@
+import pickle
+import numpy as np
+import pandas as pd
+from src.crypto_accountant.entry_store import EntryStore, AMOUNT_FIELDS
+from tests.factories import TxnFactory
+
+
+def booked_store(booked, count=200, seed=1):
+    return booked(TxnFactory.seeded_txs(count, seed)).ledger.store
+
+
+def test_frame_matches_entry_dicts(mode, booked):
+    store = booked_store(booked)
+    entries = list(store.rows())
+    pd.testing.assert_frame_equal(store.frame(), pd.DataFrame(entries))
+    tail = store.frame(150)
+    assert list(tail.index) == list(range(150, len(store)))
+    pd.testing.assert_frame_equal(tail.reset_index(drop=True), pd.DataFrame(entries[150:]))
+    assert store.frame(len(store)).empty
+
+
+def test_frame_round_trip(mode, booked):
+    store = booked_store(booked)
+    frame = store.frame()
+    rebuilt = EntryStore()
+    for row in frame.to_dict('records'):
+        rebuilt.append({field: value for field, value in row.items() if pd.notna(value)})
+    pd.testing.assert_frame_equal(rebuilt.frame(), frame)
+    columns = EntryStore()
+    columns.extend({field: list(frame[field]) for field in frame.columns})
+    pd.testing.assert_frame_equal(columns.frame(), frame)
+
+
+def test_pickle_round_trip(mode, booked):
+    store = booked_store(booked)
+    restored = pickle.loads(pickle.dumps(store))
+    assert len(restored) == len(store)
+    pd.testing.assert_frame_equal(restored.frame(), store.frame())
+    for field in AMOUNT_FIELDS:
+        np.testing.assert_array_equal(restored.scaled_column(field), store.scaled_column(field))
+    # entries appended after restoring land after the restored ones
+    extra = list(booked_store(booked, 50, 2).rows())
+    for entry in extra:
+        store.append(entry)
+        restored.append(entry)
+    pd.testing.assert_frame_equal(restored.frame(), store.frame())
+
+
+def test_pickle_keeps_extra_columns(booked):
+    store = booked_store(booked, 30, 3)
+    store.append(dict(next(store.rows()), memo='moved'))
+    restored = pickle.loads(pickle.dumps(store))
+    assert restored.columns() == store.columns()
+    assert list(restored.frame()['memo'].dropna()) == ['moved']
+
+
+def test_empty_store_round_trip():
+    store = pickle.loads(pickle.dumps(EntryStore()))
+    assert len(store) == 0
+    assert store.frame().empty
+    assert list(store.rows()) == []
@@ -0,0 +1,60 @@
+from decimal import Decimal
+import pytest
+from src.crypto_accountant.transactions.components.entry import EntryTemplate, compile_template
+from src.crypto_accountant.utils import create_tx
+from tests.factories import TxnFactory
+
+
+def tx_configs(tx):
+    configs = list(tx.entry_template.values()) + list(tx.fee_entry_template.values())
+    if tx.taxable:
+        configs += list(tx.adj_entries) + list(tx.close_entries) + list(tx.gain_entries)
+    return configs
+
+
+def txs(count=150, seed=1):
+    return list([create_tx(**tx) for tx in TxnFactory.seeded_txs(count, seed)])
+
+
+def test_build_matches_create_entry(mode):
+    built = 0
+    for tx in txs():
+        for config in tx_configs(tx):
+            if config.get('mkt', 'base') not in tx.assets:
+                continue
+            assert compile_template(config).build(tx).to_dict() == tx.create_entry(**config).to_dict()
+            built += 1
+    assert built > 300
+
+
+@pytest.mark.parametrize('overrides', [
+    {'type': 'fee'},
+    {'quantity': 0, 'value': Decimal('-12.345')},
+    {'quote': Decimal('101.5'), 'close_quote': Decimal('99.25'), 'quantity': Decimal('0.123456789')},
+])
+def test_build_with_overrides_matches_create_entry(mode, overrides):
+    taxable = 0
+    for tx in txs(60, 2):
+        if not tx.taxable:
+            continue
+        taxable += 1
+        asset = list(tx.taxable_assets)[0]
+        for config in tx.close_entries + tx.gain_entries:
+            expected = tx.create_entry(**{**config, 'mkt': asset, **overrides})
+            assert compile_template(config).build(tx, asset, **overrides).to_dict() == expected.to_dict()
+    assert taxable > 10
+
+
+def test_equal_configs_share_a_template():
+    config = {'side': 'debit', 'account_type': 'assets', 'account': 'current_assets', 'sub_account': 'cash'}
+    assert compile_template(config) is compile_template(dict(config))
+    assert compile_template(config) is not compile_template(dict(config, side='credit'))
+
+
+def test_unhashable_config_is_compiled_uncached():
+    config = {'side': 'debit', 'account_type': 'assets', 'tags': ['a']}
+    template = compile_template(config)
+    assert isinstance(template, EntryTemplate)
+    assert template is not compile_template(config)
+    tx = txs(5, 3)[0]
+    assert template.build(tx).to_dict() == tx.create_entry(**config).to_dict()
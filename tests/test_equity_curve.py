@@ -0,0 +1,52 @@
+import pytest
+from decimal import Decimal
+import pandas as pd
+from src.crypto_accountant.bookkeeper import BookKeeper
+from tests.factories import TxnFactory
+
+
+def summed_curve(ledger, account_type):
+    # daily balances summed from the raw entries
+    raw = ledger.raw
+    raw = raw[raw['account_type'] == account_type]
+    sign = 1 if account_type == 'assets' else -1
+    balances = {}
+    for day in pd.date_range(raw['timestamp'].min().floor('D'), raw['timestamp'].max().floor('D'), freq='D'):
+        rows = raw[raw['timestamp'].dt.floor('D') <= day]
+        signed = rows['quantity'].where(rows['side'] == 'debit', -rows['quantity']) * sign
+        balances[day] = signed.groupby(rows['symbol']).sum().to_dict()
+    return balances
+
+
+@pytest.mark.parametrize('account_type', ['assets', 'equities'])
+def test_curve_matches_summed_entries(mode, account_type):
+    bk = BookKeeper()
+    bk.add_txs(TxnFactory.seeded_txs(80, 1))
+    curve = bk.ledger.generate_equity_curve(account_type)
+    expected = summed_curve(bk.ledger, account_type)
+    assert list(curve.index) == list(expected)
+    for day, balances in expected.items():
+        for symbol in curve.columns:
+            assert curve.loc[day, symbol] == balances.get(symbol, Decimal(0))
+
+
+def test_curve_kept_between_calls_matches_new_curve(mode):
+    txs = TxnFactory.seeded_txs(300, 2)
+    bk = BookKeeper()
+    for start in range(0, len(txs), 60):
+        bk.add_txs(txs[start:start + 60])
+        bk.ledger.generate_equity_curve('assets', as_float=start % 120 == 0)
+    expected = BookKeeper()
+    expected.add_txs(txs)
+    pd.testing.assert_frame_equal(bk.ledger.generate_equity_curve('assets'), expected.ledger.generate_equity_curve('assets'))
+    pd.testing.assert_frame_equal(bk.ledger.generate_equity_curve('assets', as_float=True),
+                                  expected.ledger.generate_equity_curve('assets', as_float=True))
+
+
+def test_float_curve_matches_decimal_curve():
+    bk = BookKeeper()
+    bk.add_txs(TxnFactory.seeded_txs(200, 3))
+    curve = bk.ledger.generate_equity_curve('assets')
+    floats = bk.ledger.generate_equity_curve('assets', as_float=True)
+    assert (floats.dtypes == 'float64').all()
+    pd.testing.assert_frame_equal(floats, curve.astype(float))
@@ -0,0 +1,51 @@
+import pytest
+from array import array
+from src.crypto_accountant.bookkeeper import BookKeeper
+from src.crypto_accountant.entry_store import WideAmounts
+from src.crypto_accountant.transactions.utils import set_numeric_mode
+from tests.factories import TxnFactory
+from tests.fixtures import Fixes
+
+
+@pytest.fixture
+def fixed_mode():
+    set_numeric_mode('fixed')
+    yield
+    set_numeric_mode('decimal')
+
+
+def test_fixed_mode_matches_decimal_mode(fixed_mode):
+    txs = TxnFactory.seeded_txs(300, 1)
+    set_numeric_mode('decimal')
+    expected = BookKeeper()
+    expected.add_txs(txs)
+    set_numeric_mode('fixed')
+    bk = BookKeeper()
+    bk.add_txs(txs)
+    Fixes.assert_same_book(bk, expected)
+
+
+def test_fixed_mode_amounts_are_int64_columns(fixed_mode):
+    bk = BookKeeper()
+    bk.add_txs(TxnFactory.seeded_txs(50, 2))
+    amounts = bk.ledger.store.amounts
+    assert isinstance(amounts['value'], array) and amounts['value'].typecode == 'q'
+    for field in ['quantity', 'quote', 'close_quote']:
+        assert isinstance(amounts[field], WideAmounts)
+
+
+def test_decimal_mode_keeps_object_columns():
+    bk = BookKeeper()
+    bk.add_txs(TxnFactory.seeded_txs(50, 2))
+    for column in bk.ledger.store.amounts.values():
+        assert isinstance(column, list)
+
+
+def test_fixed_mode_local_txs(fixed_mode):
+    set_numeric_mode('decimal')
+    expected = BookKeeper()
+    expected.add_txs(Fixes.local_txs())
+    set_numeric_mode('fixed')
+    bk = BookKeeper()
+    bk.add_txs(Fixes.local_txs())
+    Fixes.assert_same_book(bk, expected)
@@ -0,0 +1,56 @@
+import pytest
+import pandas as pd
+from src.crypto_accountant.bookkeeper import BookKeeper
+from src.crypto_accountant.frames import TxFrame
+from tests.factories import TxnFactory
+from tests.fixtures import Fixes
+
+
+def test_frame_matches_add_txs(mode, booked):
+    txs = TxnFactory.seeded_txs(300, 1)
+    bk = BookKeeper()
+    bk.add_txs_frame(pd.DataFrame(txs))
+    Fixes.assert_same_book(bk, booked(txs))
+
+
+def test_unsorted_frame_matches_add_txs(mode, booked):
+    txs = TxnFactory.seeded_txs(200, 2)
+    bk = BookKeeper()
+    bk.add_txs_frame(pd.DataFrame(txs).sample(frac=1, random_state=7))
+    Fixes.assert_same_book(bk, booked(txs))
+
+
+def test_float_and_datetime_columns_match_add_txs(booked):
+    txs = Fixes.local_txs()
+    frame = pd.DataFrame(txs)
+    for column in frame.columns:
+        if column not in ['id', 'timestamp', 'type'] and frame[column].map(lambda x: not isinstance(x, str)).all():
+            frame[column] = frame[column].astype(float)
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+    bk = BookKeeper()
+    bk.add_txs_frame(frame)
+    Fixes.assert_same_book(bk, booked(txs))
+
+
+def test_frame_after_add_txs_matches_add_txs(booked):
+    txs = TxnFactory.seeded_txs(300, 3)
+    bk = BookKeeper()
+    bk.add_txs(txs[:150])
+    bk.add_txs_frame(pd.DataFrame(txs[150:]))
+    Fixes.assert_same_book(bk, booked(txs))
+
+
+def test_only_non_taxable_rows_are_bulk():
+    frame = TxFrame(pd.DataFrame(TxnFactory.seeded_txs(100, 4)))
+    for i in range(len(frame)):
+        if frame.bulk[i]:
+            assert frame.tx(i)['type'] not in ['buy', 'sell', 'swap', 'send']
+
+
+def test_arrow_table_matches_add_txs(booked):
+    pa = pytest.importorskip('pyarrow')
+    txs = Fixes.local_txs()
+    frame = pd.DataFrame(txs)
+    bk = BookKeeper()
+    bk.add_txs_frame(pa.Table.from_pandas(frame.astype({column: float for column in frame.columns if column.endswith(('Quantity', 'Price'))})))
+    Fixes.assert_same_book(bk, booked(txs))
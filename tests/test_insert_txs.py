@@ -0,0 +1,100 @@
+from copy import deepcopy
+import pytest
+import pandas as pd
+from src.crypto_accountant.bookkeeper import BookKeeper
+from tests.factories import TxnFactory
+from tests.fixtures import Fixes
+
+
+def position_state(position):
+    lots = sorted((str(lot['id']), lot['qty'], lot['price'], lot['term']) for lot in position.open_tax_lots)
+    return (position.balance, position.available_quantity, position.realized_gain, deepcopy(position.stats), lots)
+
+
+@pytest.mark.parametrize('strategy', ['fifo', 'lifo', 'hifo', 'max_tax'])
+def test_insert_matches_add_txs(mode, strategy, booked):
+    txs = TxnFactory.seeded_txs(300, 1)
+    bk = booked(txs[::2], strategy, track_history=True)
+    bk.insert_txs(txs[1::2])
+    Fixes.assert_same_book(bk, booked(txs, strategy))
+
+
+def test_repeated_inserts_match_add_txs(booked):
+    txs = TxnFactory.seeded_txs(300, 2)
+    bk = booked(txs[:100] + txs[200:], track_history=True)
+    bk.insert_txs(txs[150:200])
+    bk.insert_txs(txs[100:150:2])
+    bk.insert_txs(txs[101:150:2])
+    Fixes.assert_same_book(bk, booked(txs))
+
+
+def test_insert_after_every_booked_tx_matches_add_txs(booked):
+    txs = TxnFactory.seeded_txs(200, 3)
+    bk = booked(txs[:150], track_history=True)
+    bk.insert_txs(txs[150:])
+    Fixes.assert_same_book(bk, booked(txs))
+
+
+def test_insert_into_frame_and_parallel_books_matches_add_txs(booked):
+    txs = TxnFactory.seeded_txs(300, 4)
+    bk = BookKeeper(track_history=True)
+    bk.add_txs_frame(pd.DataFrame(txs[:150:2]))
+    bk.add_txs_parallel(txs[150::2], 2)
+    bk.insert_txs(txs[1::2])
+    Fixes.assert_same_book(bk, booked(txs))
+
+
+def test_insert_into_lazy_book_matches_add_txs(booked):
+    txs = TxnFactory.seeded_txs(200, 5)
+    bk = BookKeeper(track_history=True)
+    bk.set_lazy_entries()
+    bk.add_txs(txs[::2])
+    bk.insert_txs(txs[1::2])
+    Fixes.assert_same_book(bk, booked(txs))
+
+
+def test_insert_without_history_raises(booked):
+    txs = TxnFactory.seeded_txs(20, 6)
+    bk = booked(txs[::2])
+    with pytest.raises(Exception, match='track_history'):
+        bk.insert_txs(txs[1::2])
+
+
+def test_history_is_off_by_default(booked):
+    bk = booked(TxnFactory.seeded_txs(50, 7))
+    assert bk.history == []
+    assert bk.booked == 50
+    assert all(position.journal is None for position in bk.positions.values())
+
+
+def test_position_rollback_and_replay(booked):
+    txs = TxnFactory.seeded_txs(200, 8)
+    bk = booked(txs[:100], track_history=True)
+    position = bk.positions['BTC']
+    length = len(position.journal)
+    before = position_state(position)
+    bk.add_txs(txs[100:])
+    after = position_state(position)
+    undone = position.rollback(length)
+    assert position_state(position) == before
+    position.replay(undone)
+    assert position_state(position) == after
+
+
+def test_position_without_journal_cannot_roll_back(booked):
+    bk = booked(TxnFactory.seeded_txs(50, 9))
+    with pytest.raises(Exception, match='keeps no journal'):
+        bk.positions['BTC'].rollback(0)
+
+
+def test_ledger_rollback_and_re_add(booked):
+    txs = TxnFactory.seeded_txs(200, 10)
+    first = booked(txs[:100])
+    bk = booked(txs)
+    expected = bk.ledger.raw
+    removed = bk.ledger.rollback(len(first.ledger.store))
+    pd.testing.assert_frame_equal(bk.ledger.raw, first.ledger.raw)
+    assert bk.ledger.debit_value_sum == first.ledger.debit_value_sum
+    assert bk.ledger.credit_quantity_sum == first.ledger.credit_quantity_sum
+    bk.ledger.add_entries(removed)
+    pd.testing.assert_frame_equal(bk.ledger.raw, expected)
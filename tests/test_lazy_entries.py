@@ -0,0 +1,48 @@
+import pandas as pd
+from decimal import Decimal
+from src.crypto_accountant.bookkeeper import BookKeeper
+from tests.factories import TxnFactory
+from tests.fixtures import Fixes
+
+
+def usd_rewards():
+    return [
+        {'id': 'reward-1', 'timestamp': '2021-01-01T00:00:00Z', 'type': 'reward',
+         'baseCurrency': 'USD', 'baseQuantity': Decimal(25), 'baseUsdPrice': Decimal(1)},
+        {'id': 'reward-2', 'timestamp': '2021-01-02T00:00:00Z', 'type': 'reward',
+         'baseCurrency': 'USD', 'baseQuantity': Decimal(10), 'baseUsdPrice': Decimal(1),
+         'feeCurrency': 'USD', 'feeQuantity': Decimal(1), 'feeUsdPrice': Decimal(1)},
+    ]
+
+
+def test_usd_reward_ledgers_match_across_ingestion_paths(mode):
+    eager = BookKeeper()
+    eager.add_txs(usd_rewards())
+    lazy = BookKeeper()
+    lazy.set_lazy_entries()
+    lazy.add_txs(usd_rewards())
+    frame = BookKeeper()
+    frame.add_txs_frame(pd.DataFrame(usd_rewards()))
+    Fixes.assert_same_book(lazy, eager)
+    Fixes.assert_same_book(frame, eager)
+    debits = eager.ledger.raw
+    debits = debits[(debits['side'] == 'debit') & (debits['account_type'] == 'assets')]
+    assert list(debits['sub_account']) == ['cryptocurrencies', 'cryptocurrencies']
+
+
+def test_lazy_entries_match_eager_entries(mode, booked):
+    txs = TxnFactory.seeded_txs(300, 1)
+    bk = BookKeeper()
+    bk.set_lazy_entries()
+    bk.add_txs(txs)
+    assert len(bk.ledger.pending) > 0
+    Fixes.assert_same_book(bk, booked(txs))
+    assert len(bk.ledger.pending) == 0
+
+
+def test_validation_builds_entries_eagerly():
+    bk = BookKeeper()
+    bk.set_lazy_entries()
+    bk.set_validation('tx')
+    bk.add_txs(TxnFactory.seeded_txs(20, 2))
+    assert len(bk.ledger.pending) == 0
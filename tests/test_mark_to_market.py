@@ -0,0 +1,75 @@
+import copy
+import numpy as np
+import pandas as pd
+from src.crypto_accountant.bookkeeper import BookKeeper
+from src.crypto_accountant.mark_to_market import lot_table, revalue
+from src.crypto_accountant.utils import check_type
+from tests.factories import TxnFactory
+
+PRICED = ['BTC', 'ETH', 'ADA']
+
+
+def price_frame():
+    dates = pd.date_range('2020-06-01', '2021-06-01', freq='D', tz='UTC')
+    steps = np.arange(len(dates), dtype=np.float64)
+    return pd.DataFrame({'BTC': 9000 + steps * 25.5, 'ETH': 230 + steps * 1.25, 'ADA': .05 + steps * .001}, index=dates)
+
+
+def expected_positions(bk, prices, timestamp):
+    # each priced position marked one by one with Position.adjust_to_mtk
+    positions = copy.deepcopy(bk.positions)
+    current = prices.loc[:timestamp].iloc[-1]
+    for symbol in PRICED:
+        positions[symbol].adjust_to_mtk(check_type(current[symbol]), timestamp)
+    return positions
+
+
+def test_mark_to_market_matches_adjust_to_mtk(mode, booked):
+    bk = booked(TxnFactory.seeded_txs(300, 1))
+    prices = price_frame()
+    timestamp = pd.Timestamp('2021-03-01', tz='UTC')
+    expected = expected_positions(bk, prices, timestamp)
+    lots = bk.mark_to_market(prices, timestamp)
+    assert len(lots) == sum(1 for position in bk.positions.values() for lot in position._opens.values() if lot['available_qty'] > 0)
+    assert (lots['term'] == 'long').any() and (lots['term'] == 'short').any()
+    for row in lots.itertuples():
+        assert row.term == expected[row.symbol]._opens[row.id]['term']
+        assert bk.positions[row.symbol]._opens[row.id]['term'] == row.term
+    gains = lots.groupby('symbol')['unrealized_gain'].sum()
+    for symbol in PRICED:
+        assert bk.positions[symbol].mkt_price == expected[symbol].mkt_price
+        assert np.isclose(gains[symbol], float(expected[symbol].unrealized_gain), rtol=1e-12)
+        assert np.isclose(gains[symbol], float(bk.positions[symbol].unrealized_gain), rtol=1e-12)
+
+
+def test_unpriced_lots_keep_their_mark(booked):
+    bk = booked(TxnFactory.seeded_txs(300, 1))
+    before = lot_table(bk.positions)
+    lots = bk.mark_to_market(price_frame(), '2021-03-01')
+    unpriced = ~lots['symbol'].isin(PRICED)
+    assert unpriced.any()
+    assert (lots.loc[unpriced, 'mkt_price'] == before.loc[unpriced, 'mkt_price']).all()
+    assert (lots.loc[unpriced, 'term'] == before.loc[unpriced, 'term']).all()
+
+
+def test_revalue_matches_marked_gains(mode, booked):
+    bk = booked(TxnFactory.seeded_txs(300, 2))
+    prices = price_frame()
+    lots = lot_table(bk.positions)
+    gains = revalue(lots, prices)
+    assert gains.shape == (len(prices), len(lots))
+    for timestamp in [prices.index[0], prices.index[200], prices.index[-1]]:
+        marked = bk.mark_to_market(prices, timestamp)
+        priced = marked['symbol'].isin(PRICED).to_numpy()
+        np.testing.assert_allclose(gains.loc[timestamp].to_numpy()[priced],
+                                   marked['unrealized_gain'].to_numpy()[priced], rtol=1e-12)
+        for symbol in PRICED:
+            assert np.isclose(gains.loc[timestamp, symbol].sum(), float(bk.positions[symbol].unrealized_gain), rtol=1e-12)
+    assert gains.loc[:, ~lots['symbol'].isin(PRICED).to_numpy()].isna().all().all()
+
+
+def test_transposed_prices_and_empty_book():
+    prices = price_frame()
+    bk = BookKeeper()
+    assert len(bk.mark_to_market(prices.T)) == 0
+    assert list(lot_table(bk.positions).columns) == ['symbol', 'id', 'timestamp', 'qty', 'price', 'term', 'mkt_price']
@@ -0,0 +1,75 @@
+import pickle
+import pytest
+import pandas as pd
+from src.crypto_accountant.bookkeeper import BookKeeper
+from src.crypto_accountant.entry_store import EntryStore
+from src.crypto_accountant.ledger import Ledger
+from src.crypto_accountant.transactions.utils import set_numeric_mode
+from tests.factories import TxnFactory
+
+
+def ledgers(count=3, size=150):
+    out = []
+    for seed in range(count):
+        bk = BookKeeper()
+        bk.add_txs(TxnFactory.seeded_txs(size, 10 + seed))
+        out.append(bk.ledger)
+    return out
+
+
+def added_in_order(ledgers):
+    # every entry added one by one in (timestamp, ledger, row) order
+    rows = []
+    for number, ledger in enumerate(ledgers):
+        for row, entry in enumerate(ledger.store.rows()):
+            rows.append((pd.Timestamp(entry['timestamp']).value, number, row, entry))
+    ledger = Ledger()
+    for timestamp, number, row, entry in sorted(rows, key=lambda row: row[:3]):
+        ledger.add_entry(entry)
+    return ledger
+
+
+def assert_same_ledger(ledger, expected):
+    pd.testing.assert_frame_equal(ledger.raw, expected.raw)
+    pd.testing.assert_frame_equal(ledger.summarize(), expected.summarize())
+    pd.testing.assert_frame_equal(ledger.generate_equity_curve('assets'), expected.generate_equity_curve('assets'))
+    for column in expected.totals:
+        assert ledger.get_total(column) == expected.get_total(column)
+
+
+def test_merge_matches_entries_added_in_order(mode):
+    merging = ledgers()
+    expected = added_in_order(merging)
+    target = merging[0]
+    target.summarize()
+    target.merge(merging[1:])
+    assert_same_ledger(target, expected)
+
+
+def test_merge_snapshot_ledgers_and_extra_columns(mode):
+    merging = ledgers()
+    merging[1].add_entry(dict(next(merging[1].store.rows()), memo='moved'))
+    merging[2] = pickle.loads(pickle.dumps(merging[2]))
+    expected = added_in_order(merging)
+    merged = Ledger()
+    merged.merge(merging)
+    assert_same_ledger(merged, expected)
+
+
+def test_merge_empty_ledgers():
+    ledger = Ledger()
+    ledger.merge([])
+    ledger.merge([Ledger()])
+    assert len(ledger.store) == 0
+    assert len(EntryStore.merge([])) == 0
+
+
+def test_merge_across_numeric_modes_raises():
+    decimal = ledgers(1, 20)[0]
+    set_numeric_mode('fixed')
+    try:
+        fixed = ledgers(1, 20)[0]
+        with pytest.raises(Exception, match='different numeric modes'):
+            fixed.merge([decimal])
+    finally:
+        set_numeric_mode('decimal')
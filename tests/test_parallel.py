@@ -0,0 +1,56 @@
+from itertools import combinations
+import pytest
+from src.crypto_accountant.bookkeeper import BookKeeper
+from src.crypto_accountant.partition import group_txs, has_lots, tx_symbols
+from tests.factories import TxnFactory
+from tests.fixtures import Fixes
+
+# no swaps, so each symbol's txs form their own group
+UNLINKED = ['deposit', 'buy', 'sell', 'send', 'receive', 'reward', 'withdrawal']
+
+
+@pytest.mark.parametrize('count', [1, 2, 3, 8])
+def test_groups_partition_txs_with_lots(count):
+    txs = TxnFactory.seeded_txs(300, 1, UNLINKED)
+    groups = group_txs(txs, count)
+    assert len(groups) == min(count, 4)
+    grouped = []
+    for indexes, symbols in groups:
+        assert indexes == sorted(indexes)
+        grouped += indexes
+        for index in indexes:
+            assert set([symbol for symbol in tx_symbols(txs[index]) if has_lots(symbol)]) <= symbols
+    for (indexes, symbols), (other_indexes, other_symbols) in combinations(groups, 2):
+        assert symbols.isdisjoint(other_symbols)
+    assert sorted(grouped) == list([index for index, tx in enumerate(txs)
+                                    if any(has_lots(symbol) for symbol in tx_symbols(tx))])
+
+
+def test_swaps_link_symbols():
+    txs = TxnFactory.seeded_txs(300, 1)
+    assert len(group_txs(txs, 4)) == 1
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_parallel_matches_add_txs(mode, processes, booked):
+    txs = TxnFactory.seeded_txs(300, 2, UNLINKED)
+    bk = BookKeeper()
+    bk.add_txs_parallel(txs, processes)
+    Fixes.assert_same_book(bk, booked(txs))
+
+
+@pytest.mark.parametrize('strategy', ['fifo', 'lifo', 'hifo', 'min_tax'])
+def test_parallel_strategies_match_add_txs(strategy, booked):
+    txs = TxnFactory.seeded_txs(300, 3)
+    bk = BookKeeper(strategy)
+    bk.add_txs_parallel(txs, 2)
+    Fixes.assert_same_book(bk, booked(txs, strategy))
+
+
+def test_parallel_on_top_of_a_book_matches_add_txs(booked):
+    txs = TxnFactory.seeded_txs(300, 4, UNLINKED)
+    bk = BookKeeper()
+    bk.add_txs(txs[:100])
+    bk.add_txs_parallel(txs[100:], 2)
+    Fixes.assert_same_book(bk, booked(txs))
+    assert bk.booked == len(txs)
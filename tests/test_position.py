@@ -0,0 +1,67 @@
+from datetime import datetime
+from decimal import Decimal
+import pytz
+from src.crypto_accountant.position import Position
+from tests.factories import TxnFactory
+
+
+def recomputed(position):
+    # aggregates summed from scratch over the position's opens and closes
+    opens = list(position._opens.values())
+    closes = list(position._closes.values())
+    return {
+        'balance': sum([lot['qty'] for lot in opens]) - sum([close['qty'] for close in closes]),
+        'available_quantity': sum([lot['available_qty'] for lot in opens]),
+        'realized_gain': sum([close['realized_gain'] for close in closes]),
+        'open_avg': sum([lot['price'] for lot in opens]) / len(opens) if opens else None,
+        'close_avg': sum([close['price'] for close in closes]) / len(closes) if closes else None,
+    }
+
+
+def aggregates(position):
+    return {
+        'balance': position.balance,
+        'available_quantity': position.available_quantity,
+        'realized_gain': position.realized_gain,
+        'open_avg': position.stats['open'].get('avg'),
+        'close_avg': position.stats['close'].get('avg'),
+    }
+
+
+def day(n):
+    return datetime(2021, 1, n, tzinfo=pytz.UTC)
+
+
+def test_readd_replaced_close_and_partial_closes(mode):
+    position = Position('BTC')
+    position.add('a', Decimal('100'), day(1), Decimal('2'))
+    position.add('b', Decimal('300'), day(2), Decimal('1.5'))
+    assert aggregates(position) == recomputed(position)
+    # re-adding an id replaces its lot
+    position.add('a', Decimal('150'), day(3), Decimal('3'))
+    assert position._opens['a']['qty'] == Decimal('3')
+    assert aggregates(position) == recomputed(position)
+    position.close('s1', Decimal('200'), day(4), {'a': Decimal('1.25')})
+    assert aggregates(position) == recomputed(position)
+    # a second close under the same id replaces the first
+    position.close('s1', Decimal('220'), day(5), {'b': Decimal('0.5')})
+    assert aggregates(position) == recomputed(position)
+    position.close('s2', Decimal('250'), day(6), {'a': Decimal('1.75'), 'b': Decimal('0.25')})
+    assert position._opens['a']['available_qty'] == 0
+    assert aggregates(position) == recomputed(position)
+    assert position.available_quantity == Decimal('0.75')
+
+
+def test_closing_more_than_available(mode):
+    position = Position('ETH')
+    position.add('a', Decimal('10'), day(1), Decimal('1'))
+    position.close('s', Decimal('12'), day(2), {'a': Decimal('1.5')})
+    assert position.available_quantity == 0
+    assert aggregates(position) == recomputed(position)
+
+
+def test_booked_positions_match_recomputation(mode, booked):
+    bk = booked(TxnFactory.seeded_txs(300, 1))
+    for position in bk.positions.values():
+        assert aggregates(position) == recomputed(position)
+        assert position.unrealized_gain == position.available_quantity * position.mkt_price
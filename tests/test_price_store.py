@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from src.crypto_accountant.price_store import PriceStore
+from tests.factories import TxnFactory
+
+
+def write_store(tmp_path):
+    # BTC and ETH daily for 2021-01-01 to 2021-01-10 without 2021-01-05,
+    # 2021-01-03 twice with the later price winning
+    days = pd.DatetimeIndex(['2021-01-01', '2021-01-02', '2021-01-03 01:00', '2021-01-03 20:00', '2021-01-04',
+                             '2021-01-06', '2021-01-07', '2021-01-08', '2021-01-09', '2021-01-10'], tz='UTC')
+    prices = pd.DataFrame({'ETH': np.arange(10) + 100.0, 'BTC': np.arange(10) + 1000.0}, index=days)
+    PriceStore.write(str(tmp_path), prices)
+    return PriceStore(str(tmp_path))
+
+
+def test_price(tmp_path):
+    store = write_store(tmp_path)
+    assert store.symbols == ['BTC', 'ETH']
+    assert len(store) == 10
+    assert store.price('BTC', '2021-01-01') == 1000.0
+    assert store.price('ETH', pd.Timestamp('2021-01-02 23:59', tz='UTC')) == 101.0
+    assert store.price('BTC', '2021-01-03 05:00') == 1003.0
+    assert np.isnan(store.price('BTC', '2021-01-05'))
+    assert np.isnan(store.price('BTC', '2020-12-31'))
+    assert np.isnan(store.price('BTC', '2021-01-11'))
+    assert np.isnan(store.price('XRP', '2021-01-02'))
+
+
+def test_rows_are_clipped_to_the_store(tmp_path):
+    store = write_store(tmp_path)
+    assert store.rows().shape == (10, 2)
+    np.testing.assert_array_equal(store.rows('2021-01-02', '2021-01-04'), [[1001, 101], [1003, 103], [1004, 104]])
+    np.testing.assert_array_equal(store.rows('2020-06-01', '2021-01-02'), [[1000, 100], [1001, 101]])
+    assert len(store.rows('2021-01-09', '2022-01-01')) == 2
+    assert store.rows('2021-02-01', '2021-03-01').shape == (0, 2)
+    assert store.rows('2020-01-01', '2020-02-01').shape == (0, 2)
+    assert store.rows('2021-01-06', '2021-01-02').shape == (0, 2)
+
+
+def test_frame(tmp_path):
+    store = write_store(tmp_path)
+    frame = store.frame('2020-12-30', '2021-01-03')
+    assert list(frame.columns) == ['BTC', 'ETH']
+    assert list(frame.index) == list(pd.date_range('2021-01-01', '2021-01-03', tz='UTC'))
+    assert list(frame['BTC']) == [1000.0, 1001.0, 1003.0]
+    assert store.frame('2021-02-01').empty
+    assert len(store.frame()) == 10 and np.isnan(store.frame().loc['2021-01-05', 'ETH'])
+
+
+def test_align(tmp_path):
+    store = write_store(tmp_path)
+    curve = pd.DataFrame(1.0, index=pd.date_range('2020-12-31', '2021-01-11', tz='UTC'), columns=['ETH', 'XRP', 'BTC'])
+    aligned = store.align(curve)
+    assert aligned.index.equals(curve.index) and list(aligned.columns) == ['ETH', 'XRP', 'BTC']
+    assert aligned.loc['2021-01-02', 'BTC'] == 1001.0 and aligned.loc['2021-01-02', 'ETH'] == 101.0
+    assert aligned['XRP'].isna().all()
+    assert aligned.loc[['2020-12-31', '2021-01-05', '2021-01-11']].isna().all().all()
+    assert (store.align(curve, fill=0)['XRP'] == 0).all()
+    assert store.align(curve.iloc[:0]).empty
+
+
+def test_align_equity_curve(tmp_path, booked):
+    curve = booked(TxnFactory.seeded_txs(200, 1)).ledger.generate_equity_curve('assets', as_float=True)
+    days = pd.DatetimeIndex(curve.index)
+    PriceStore.write(str(tmp_path), pd.DataFrame({'BTC': np.arange(len(days), dtype=np.float64)}, index=days))
+    aligned = PriceStore(str(tmp_path)).align(curve)
+    assert list(aligned['BTC']) == list(np.arange(len(days), dtype=np.float64))
+    assert aligned.drop(columns='BTC').isna().all().all()
+
+
+def test_align_store_without_symbols(tmp_path):
+    days = pd.date_range('2021-01-01', '2021-01-05', tz='UTC')
+    PriceStore.write(str(tmp_path), pd.DataFrame(index=days))
+    store = PriceStore(str(tmp_path))
+    curve = pd.DataFrame(1.0, index=days, columns=['BTC'])
+    assert store.align(curve)['BTC'].isna().all()
+    assert np.isnan(store.price('BTC', '2021-01-02'))
+    PriceStore.write(str(tmp_path), pd.DataFrame(columns=['BTC'], index=pd.DatetimeIndex([], tz='UTC')))
+    assert PriceStore(str(tmp_path)).align(curve)['BTC'].isna().all()
@@ -0,0 +1,97 @@
+import pytest
+from decimal import Decimal
+from src.crypto_accountant.bookkeeper import BookKeeper
+from tests.factories import TxnFactory
+from tests.fixtures import Fixes
+
+
+def buy(id, timestamp, qty, price):
+    return {'id': id, 'timestamp': timestamp, 'type': 'buy',
+            'baseCurrency': 'BTC', 'baseQuantity': Decimal(qty), 'baseUsdPrice': Decimal(price),
+            'quoteCurrency': 'USD', 'quoteQuantity': Decimal(qty) * Decimal(price), 'quoteUsdPrice': Decimal(1)}
+
+
+def sell(qty, price, lot_ids=None):
+    tx = {'id': 'sell', 'timestamp': '2021-04-01T00:00:00Z', 'type': 'sell',
+          'baseCurrency': 'BTC', 'baseQuantity': Decimal(qty), 'baseUsdPrice': Decimal(price),
+          'quoteCurrency': 'USD', 'quoteQuantity': Decimal(qty) * Decimal(price), 'quoteUsdPrice': Decimal(1)}
+    if lot_ids is not None:
+        tx['lotIds'] = lot_ids
+    return tx
+
+
+def lots_txs():
+    return [
+        {'id': 'deposit', 'timestamp': '2021-01-01T00:00:00Z', 'type': 'deposit',
+         'baseCurrency': 'USD', 'baseQuantity': Decimal(10000), 'baseUsdPrice': Decimal(1)},
+        buy('a', '2021-01-02T00:00:00Z', '1', '100'),
+        buy('b', '2021-01-03T00:00:00Z', '2', '300'),
+        buy('c', '2021-01-04T00:00:00Z', '0.5', '200'),
+    ]
+
+
+def open_lots(bk, symbol='BTC'):
+    return {lot['id']: lot['qty'] for lot in bk.positions[symbol].open_tax_lots}
+
+
+@pytest.mark.parametrize('strategy, expected', [
+    ('fifo', {'b': Decimal('1.5'), 'c': Decimal('0.5')}),
+    ('lifo', {'a': Decimal('1'), 'b': Decimal('1')}),
+    ('hifo', {'a': Decimal('1'), 'b': Decimal('0.5'), 'c': Decimal('0.5')}),
+    ('max_tax', {'a': Decimal('1'), 'b': Decimal('0.5'), 'c': Decimal('0.5')}),
+    ('min_tax', {'b': Decimal('2')}),
+])
+def test_strategy_relief_order(strategy, expected):
+    bk = BookKeeper(strategy)
+    bk.add_txs(lots_txs() + [sell('1.5', '250')])
+    assert open_lots(bk) == expected
+    assert bk.positions['BTC'].available_quantity == Decimal('2')
+
+
+def test_fill_keeps_lot_order_across_long_term_boundary():
+    # a crosses into long term at the sell, but only after the fill began
+    bk = BookKeeper('max_tax')
+    bk.add_txs([
+        dict(lots_txs()[0], timestamp='2019-12-01T00:00:00Z'),
+        buy('a', '2020-01-01T00:00:00Z', '3', '100'),
+        buy('b', '2020-12-01T00:00:00Z', '4', '100'),
+        buy('c', '2020-12-15T00:00:00Z', '2', '100'),
+        dict(sell('6', '150'), timestamp='2021-01-20T00:00:00Z'),
+    ])
+    assert open_lots(bk) == {'a': Decimal('1'), 'c': Decimal('2')}
+    assert bk.positions['BTC'].tax_lots['a']['term'] == 'long'
+
+
+def test_specific_id_relieves_named_lots():
+    bk = BookKeeper('specific_id')
+    bk.add_txs(lots_txs() + [sell('2.2', '250', ['b', 'c'])])
+    assert open_lots(bk) == {'a': Decimal('1'), 'c': Decimal('0.3')}
+
+
+def test_specific_id_falls_back_to_fifo():
+    bk = BookKeeper('specific_id')
+    bk.add_txs(lots_txs() + [sell('1.5', '250', ['c'])])
+    assert open_lots(bk) == {'b': Decimal('2')}
+
+
+def test_symbol_strategy_overrides_book_strategy():
+    bk = BookKeeper('fifo')
+    bk.set_relief_strategy('lifo', 'BTC')
+    bk.add_txs(lots_txs() + [sell('1.5', '250')])
+    assert bk.get_relief_strategy('BTC') == 'lifo'
+    assert open_lots(bk) == {'a': Decimal('1'), 'b': Decimal('1')}
+
+
+def test_unknown_strategy_raises():
+    with pytest.raises(Exception, match='Unknown lot relief strategy'):
+        BookKeeper('oldest')
+
+
+@pytest.mark.parametrize('strategy', ['fifo', 'lifo', 'hifo', 'max_tax', 'min_tax', 'specific_id'])
+def test_strategy_is_deterministic(strategy):
+    txs = TxnFactory.seeded_txs(300, 3)
+    bk = BookKeeper(strategy)
+    bk.add_txs(txs)
+    expected = BookKeeper(strategy)
+    expected.add_txs(list(reversed(txs)))
+    Fixes.assert_same_book(bk, expected)
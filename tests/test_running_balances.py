@@ -0,0 +1,63 @@
+from itertools import accumulate
+import numpy as np
+import pandas as pd
+import pytest
+from src.crypto_accountant.balance_tree import LEVELS
+from tests.factories import TxnFactory
+
+
+def expected_running(ledger, level):
+    # running balances summed entry by entry from Ledger.entries
+    names = LEVELS[:LEVELS.index(level) + 1]
+    entries = pd.DataFrame(ledger.entries)
+    entries['pos'] = np.arange(len(entries))
+    sign = np.where(entries['side'] == 'debit', 1, -1) * np.where(entries['account_type'] == 'assets', 1, -1)
+    entries['balance'] = list([value * s for value, s in zip(entries['value'], sign)])
+    entries['balance_quantity'] = list([quantity * s for quantity, s in zip(entries['quantity'], sign)])
+    entries = entries.sort_values(names + ['timestamp', 'pos'], kind='mergesort')
+    rows = []
+    for path, group in entries.groupby(names, sort=False, dropna=False):
+        path = path if isinstance(path, tuple) else (path,)
+        for timestamp, balance, quantity in zip(group['timestamp'], accumulate(group['balance']), accumulate(group['balance_quantity'])):
+            rows.append(path + (pd.Timestamp(timestamp), balance, quantity))
+    return rows
+
+
+def running_rows(frame):
+    index = frame.index if isinstance(frame.index, pd.MultiIndex) else pd.MultiIndex.from_arrays([frame.index])
+    return list(zip(*[index.get_level_values(i) for i in range(index.nlevels)],
+                    frame['timestamp'], frame['running_bal'], frame['running_bal_quantity']))
+
+
+@pytest.mark.parametrize('level', ['account_type', 'account', 'symbol'])
+def test_running_balances_match_entries(mode, level, booked):
+    ledger = booked(TxnFactory.seeded_txs(300, 1)).ledger
+    assert running_rows(ledger.running_balances(level)) == expected_running(ledger, level)
+
+
+def test_running_balances_follow_added_and_inserted_txs(mode, booked):
+    txs = TxnFactory.seeded_txs(300, 2)
+    bk = booked(txs[:100], track_history=True)
+    bk.ledger.running_balances()
+    bk.add_txs(txs[100::2])
+    assert running_rows(bk.ledger.running_balances()) == expected_running(bk.ledger, 'symbol')
+    bk.insert_txs(txs[101::2])
+    assert running_rows(bk.ledger.running_balances()) == expected_running(bk.ledger, 'symbol')
+
+
+def test_float_running_balances(booked):
+    ledger = booked(TxnFactory.seeded_txs(200, 3)).ledger
+    exact = ledger.running_balances()
+    floats = ledger.running_balances(as_float=True)
+    np.testing.assert_allclose(floats['running_bal'].to_numpy(), exact['running_bal'].astype(float).to_numpy())
+    np.testing.assert_allclose(floats['running_bal_quantity'].to_numpy(), exact['running_bal_quantity'].astype(float).to_numpy())
+
+
+def test_add_running_total_matches_groupby_cumsum(mode, booked):
+    ledger = booked(TxnFactory.seeded_txs(300, 4)).ledger
+    frame = ledger.split_sides(ledger.raw.fillna(0)).set_index(LEVELS)
+    got = ledger.add_running_total(frame, 'assets')
+    groups = got.groupby(level=-1, sort=False)
+    for column, total in [('balance', 'running_bal'), ('balance_quantity', 'running_bal_quantity')]:
+        expected = groups[column].transform(lambda x: list(accumulate(x)))
+        assert list(got[total]) == list(expected)
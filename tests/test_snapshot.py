@@ -0,0 +1,73 @@
+import pickle
+import pytest
+from src.crypto_accountant.bookkeeper import BookKeeper
+from src.crypto_accountant.transactions.utils import set_numeric_mode
+from tests.factories import TxnFactory
+from tests.fixtures import Fixes
+
+
+def test_snapshot_round_trip(mode, tmp_path, booked):
+    bk = booked(TxnFactory.seeded_txs(300, 1))
+    bk.set_relief_strategy('hifo', 'BTC')
+    bk.save_snapshot(tmp_path / 'book.pkl')
+    restored = BookKeeper.load_snapshot(tmp_path / 'book.pkl')
+    Fixes.assert_same_book(restored, bk)
+    assert restored.get_relief_strategy('BTC') == 'hifo'
+    assert restored.booked == bk.booked
+
+
+def test_txs_added_after_restore_match_add_txs(mode, tmp_path, booked):
+    txs = TxnFactory.seeded_txs(300, 2)
+    booked(txs[:200]).save_snapshot(tmp_path / 'book.pkl')
+    restored = BookKeeper.load_snapshot(tmp_path / 'book.pkl')
+    restored.add_txs(txs[200:])
+    Fixes.assert_same_book(restored, booked(txs))
+
+
+def test_snapshot_keeps_history_only_when_tracked(tmp_path, booked):
+    txs = TxnFactory.seeded_txs(100, 3)
+    booked(txs).save_snapshot(tmp_path / 'book.pkl')
+    booked(txs, track_history=True).save_snapshot(tmp_path / 'tracked.pkl')
+    with open(tmp_path / 'book.pkl', 'rb') as f:
+        assert pickle.load(f)['history'] is None
+    restored = BookKeeper.load_snapshot(tmp_path / 'book.pkl')
+    assert not restored.track_history
+    assert all(position.journal is None for position in restored.positions.values())
+    tracked = BookKeeper.load_snapshot(tmp_path / 'tracked.pkl')
+    assert tracked.track_history and len(tracked.history) == len(txs)
+
+
+def test_insert_after_restore_matches_add_txs(tmp_path, booked):
+    txs = TxnFactory.seeded_txs(200, 4)
+    booked(txs[::2], track_history=True).save_snapshot(tmp_path / 'book.pkl')
+    restored = BookKeeper.load_snapshot(tmp_path / 'book.pkl')
+    restored.insert_txs(txs[1::2])
+    Fixes.assert_same_book(restored, booked(txs))
+
+
+def test_snapshot_of_other_numeric_mode_raises(tmp_path, booked):
+    booked(Fixes.local_txs()).save_snapshot(tmp_path / 'book.pkl')
+    set_numeric_mode('fixed')
+    try:
+        with pytest.raises(Exception, match='Snapshot was written in decimal mode'):
+            BookKeeper.load_snapshot(tmp_path / 'book.pkl')
+    finally:
+        set_numeric_mode('decimal')
+
+
+def test_unknown_snapshot_version_raises(tmp_path):
+    with open(tmp_path / 'book.pkl', 'wb') as f:
+        pickle.dump({'version': 0}, f)
+    with pytest.raises(Exception, match='Unsupported snapshot version'):
+        BookKeeper.load_snapshot(tmp_path / 'book.pkl')
+
+
+def test_snapshot_missing_keys_raises(tmp_path, booked):
+    booked(Fixes.local_txs()).save_snapshot(tmp_path / 'book.pkl')
+    with open(tmp_path / 'book.pkl', 'rb') as f:
+        state = pickle.load(f)
+    del state['track_history']
+    with open(tmp_path / 'book.pkl', 'wb') as f:
+        pickle.dump(state, f)
+    with pytest.raises(KeyError):
+        BookKeeper.load_snapshot(tmp_path / 'book.pkl')
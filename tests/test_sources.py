@@ -0,0 +1,70 @@
+import asyncio
+import os
+import pytest
+from src.crypto_accountant.bookkeeper import BookKeeper
+from src.crypto_accountant.sources import PagedSource, MemorySource, JsonFileSource, sync_book
+from tests.factories import TxnFactory
+from tests.fixtures import Fixes
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_sync_matches_add_txs(booked):
+    txs = TxnFactory.seeded_txs(300, 1)
+    bk = BookKeeper()
+    run(sync_book(bk, MemorySource(txs, latency=.001), page_size=40, queue_size=2))
+    Fixes.assert_same_book(bk, booked(txs))
+
+
+def test_sync_from_cursor_adds_only_new_txs(booked):
+    txs = TxnFactory.seeded_txs(300, 2)
+    source = MemorySource(txs[:200])
+    bk = BookKeeper()
+    cursor = run(sync_book(bk, source, page_size=50))
+    assert run(sync_book(bk, source, cursor, page_size=50)) == cursor
+    source.add(txs[200:])
+    cursor = run(sync_book(bk, source, cursor, page_size=50))
+    assert bk.booked == len(txs)
+    Fixes.assert_same_book(bk, booked(txs))
+
+
+def test_pages_keep_txs_sharing_a_timestamp():
+    txs = TxnFactory.seeded_txs(30, 3)
+    for tx in txs:
+        tx['timestamp'] = txs[0]['timestamp']
+    pages = []
+
+    async def read():
+        async for page, cursor in MemorySource(txs).pages(page_size=7):
+            pages.append(page)
+
+    run(read())
+    assert sorted(tx['id'] for page in pages for tx in page) == sorted(tx['id'] for tx in txs)
+
+
+def test_json_file_source_matches_local_txs(booked):
+    path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'example_txs.json')
+    bk = BookKeeper()
+    run(sync_book(bk, JsonFileSource(path), page_size=2))
+    Fixes.assert_same_book(bk, booked(Fixes.local_txs()))
+
+
+def test_booking_errors_propagate():
+    txs = TxnFactory.seeded_txs(30, 4)
+    txs[20] = dict(txs[20], type='nope')
+    with pytest.raises(Exception, match='TYPE nope NOT CREATED'):
+        run(sync_book(BookKeeper(), MemorySource(txs), page_size=10))
+
+
+def test_paged_source_needs_page():
+    class NoPages(PagedSource):
+        pass
+
+    with pytest.raises(TypeError):
+        NoPages()
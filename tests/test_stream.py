@@ -0,0 +1,46 @@
+import pytest
+from src.crypto_accountant.bookkeeper import BookKeeper
+from tests.factories import TxnFactory
+from tests.fixtures import Fixes
+
+
+def test_stream_matches_add_txs(mode):
+    txs = TxnFactory.seeded_txs(300, 1)
+    sources = [txs[0::3], txs[1::3], txs[2::3]]
+    bk = BookKeeper()
+    bk.add_tx_stream(*(iter(source) for source in sources))
+    expected = BookKeeper()
+    expected.add_txs(txs)
+    Fixes.assert_same_book(bk, expected)
+
+
+def test_equal_timestamps_keep_source_order():
+    txs = TxnFactory.seeded_txs(100, 2)
+    copies = list([dict(tx, id=tx['id'] + '-copy') for tx in txs])
+    bk = BookKeeper()
+    bk.add_tx_stream(txs, copies)
+    expected = BookKeeper()
+    expected.add_txs(txs + copies)
+    Fixes.assert_same_book(bk, expected)
+
+
+def test_stream_holds_one_pending_tx_per_source():
+    txs = TxnFactory.seeded_txs(50, 3)
+    bk = BookKeeper()
+    booked = []   # txs booked when each tx was read
+
+    def source(txs):
+        for tx in txs:
+            booked.append(bk.booked)
+            yield tx
+
+    bk.add_tx_stream(source(txs[0::2]), source(txs[1::2]))
+    assert bk.booked == len(txs)
+    assert all(read - count <= 2 for read, count in enumerate(booked))
+
+
+def test_unsorted_source_raises():
+    txs = TxnFactory.seeded_txs(20, 4)
+    bk = BookKeeper()
+    with pytest.raises(Exception, match='is not sorted by timestamp'):
+        bk.add_tx_stream(txs[:10], list(reversed(txs[10:])))
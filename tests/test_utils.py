@@ -0,0 +1,112 @@
+from decimal import Decimal
+import pandas as pd
+import pytest
+from src.crypto_accountant.bookkeeper import BookKeeper
+from src.crypto_accountant.transactions.base import BaseTx
+from src.crypto_accountant.transactions.entry_config import CRYPTO, REWARDS
+from src.crypto_accountant.utils import TX_TYPES, create_tx, normalize_key, register_tx, tx_schema, tx_timestamp
+
+
+class Airdrop(BaseTx):
+
+    def __init__(self, **kwargs) -> None:
+        kwargs['type'] = 'airdrop'
+        super().__init__(entry_template={'debit': {'side': 'debit', **CRYPTO}, 'credit': {'side': 'credit', **REWARDS}}, **kwargs)
+
+    def get_affected_balances(self):
+        base = self.assets['base']
+        return {base.symbol: base.quantity}
+
+
+@pytest.fixture
+def airdrop():
+    register_tx('airdrop', Airdrop)
+    yield
+    del TX_TYPES['airdrop']
+
+
+def deposit(**keys):
+    tx = {'id': 'd', 'timestamp': '2021-01-01T00:00:00Z', 'type': 'deposit',
+          'baseCurrency': 'USD', 'baseQuantity': Decimal(100), 'baseUsdPrice': Decimal(1)}
+    return dict(tx, **keys)
+
+
+def test_registered_type_is_booked(airdrop):
+    bk = BookKeeper()
+    bk.add_txs([deposit(), {'id': 'a', 'timestamp': '2021-01-02T00:00:00Z', 'type': 'airdrop',
+                            'baseCurrency': 'ETH', 'baseQuantity': Decimal(2), 'baseUsdPrice': Decimal(500)}])
+    assert isinstance(create_tx(type='airdrop', baseCurrency='ETH', baseQuantity=Decimal(1), baseUsdPrice=Decimal(1)), Airdrop)
+    assert bk.positions['ETH'].available_quantity == Decimal(2)
+    entries = bk.ledger.raw
+    entries = entries[entries['id'] == 'a']
+    assert set(zip(entries['side'], entries['sub_account'])) == {('debit', 'cryptocurrencies'), ('credit', 'rewards')}
+
+
+def test_register_replaces_and_checks_class():
+    original = TX_TYPES['deposit']
+    register_tx('deposit', Airdrop)
+    try:
+        assert isinstance(create_tx(**deposit()), Airdrop)
+    finally:
+        register_tx('deposit', original)
+    with pytest.raises(Exception, match='is not a BaseTx subclass'):
+        register_tx('airdrop', dict)
+    assert 'airdrop' not in TX_TYPES
+
+
+def test_unknown_type_raises():
+    with pytest.raises(Exception, match='TYPE airdrop NOT CREATED'):
+        create_tx(**deposit(type='airdrop'))
+
+
+@pytest.mark.parametrize('key, expected', [
+    ('baseCurrency', 'base_currency'),
+    ('base-currency', 'base_currency'),
+    ('Base Quantity', 'base_quantity'),
+    ('Base_Usd_Price', 'base_usd_price'),
+    ('fee_quantity', 'fee_quantity'),
+    ('txType', 'type'),
+    ('transaction_type', 'type'),
+    ('Time Stamp', 'timestamp'),
+    ('date', 'timestamp'),
+    ('id', 'id'),
+])
+def test_normalize_key(key, expected):
+    assert normalize_key(key) == expected
+
+
+def test_aliased_keys_build_the_same_tx():
+    tx = create_tx(**deposit())
+    aliased = create_tx(**{'id': 'd', 'Time': '2021-01-01T00:00:00Z', 'txn-type': 'deposit',
+                           'base currency': 'USD', 'Base_Quantity': Decimal(100), 'base-usd-price': Decimal(1)})
+    assert type(aliased) == type(tx)
+    assert aliased.timestamp == tx.timestamp == pd.Timestamp('2021-01-01', tz='UTC')
+    assert aliased.to_dict() == tx.to_dict()
+    assert tx_timestamp({'Time Stamp': '2021-01-01T00:00:00Z'}) == tx.timestamp
+
+
+def test_tx_schema_is_cached_per_key_tuple():
+    tx_schema.cache_clear()
+    keys = tuple(deposit())
+    schema = tx_schema(keys)
+    assert schema == ('id', 'timestamp', 'type', 'base_currency', 'base_quantity', 'base_usd_price')
+    for i in range(5):
+        assert tx_schema(tuple(deposit(id=str(i)))) is schema
+    assert tx_schema.cache_info().hits == 5 and tx_schema.cache_info().misses == 1
+    # another key order is another schema
+    assert tx_schema(tuple(reversed(keys))) == tuple(reversed(schema))
+    assert tx_schema.cache_info().misses == 2
+    tx_schema.cache_clear()
+    assert tx_schema.cache_info().currsize == 0
+    assert tx_schema(keys) == schema and tx_schema.cache_info().misses == 1
+
+
+def test_registering_needs_no_schema_invalidation(airdrop):
+    # schemas only hold normalized keys, the type is looked up per tx
+    keys = tuple(deposit())
+    tx_schema(keys)
+    del TX_TYPES['airdrop']
+    with pytest.raises(Exception, match='TYPE airdrop NOT CREATED'):
+        create_tx(**deposit(type='airdrop'))
+    register_tx('airdrop', Airdrop)
+    assert isinstance(create_tx(**deposit(type='airdrop')), Airdrop)
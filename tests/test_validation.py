@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+from src.crypto_accountant.bookkeeper import BookKeeper
+from src.crypto_accountant.utils import tx_timestamp
+from tests.factories import TxnFactory
+
+
+def expected_invalid(bk):
+    # validate_entry_set run on the entries of each tx in the ledger
+    groups = {}
+    for entry in bk.ledger.entries:
+        groups.setdefault((entry['id'], pd.Timestamp(entry['timestamp'])), []).append(entry)
+    invalid = {}
+    for key, entries in groups.items():
+        check = bk.validate_entry_set(entries)
+        if not check['valid']:
+            invalid[key] = check['reason']
+    return invalid
+
+
+def book(txs, mode, sample_every=100):
+    bk = BookKeeper()
+    bk.set_validation(mode, sample_every)
+    bk.add_txs(txs)
+    return bk
+
+
+@pytest.mark.parametrize('mode', ['tx', 'batch'])
+def test_modes_flag_same_txs_as_validate_entry_set(mode):
+    bk = book(TxnFactory.seeded_txs(300, 1), mode)
+    expected = expected_invalid(bk)
+    assert expected
+    assert bk.invalid == expected
+
+
+def test_validate_reports_txs_in_ledger_order():
+    bk = book(TxnFactory.seeded_txs(300, 2), 'off')
+    assert bk.invalid == {}
+    report = bk.ledger.validate()
+    expected = expected_invalid(bk)
+    assert list(zip(report['id'], report['timestamp'])) == list(expected.keys())
+    assert list(report['reason']) == list(expected.values())
+
+
+def test_sampled_checks_every_nth_tx():
+    txs = TxnFactory.seeded_txs(300, 3)
+    bk = book(txs, 'sampled', 7)
+    sampled = set((tx['id'], pd.Timestamp(tx['timestamp'])) for tx in sorted(txs, key=tx_timestamp)[::7])
+    expected = {key: reason for key, reason in expected_invalid(bk).items() if key in sampled}
+    assert expected
+    assert bk.invalid == expected
+    assert book(txs, 'sampled', 7).invalid == bk.invalid
+
+
+def test_validate_only_reads_new_entries():
+    txs = TxnFactory.seeded_txs(300, 4)
+    bk = book(txs[:150], 'off')
+    first = bk.validate()
+    bk.add_txs(txs[150:])
+    second = bk.validate()
+    assert len(first) and len(second)
+    assert not set(first['id']) & set(second['id'])
+    assert bk.invalid == expected_invalid(bk)
+
+
+def test_malformed_entries_give_validate_entry_set_reason():
+    bk = book(TxnFactory.seeded_txs(20, 5), 'off')
+    entry = dict(bk.ledger.entries[0], id='bad', side='both')
+    bk.ledger.add_entry(entry)
+    report = bk.ledger.validate()
+    assert list(report.loc[report['id'] == 'bad', 'reason']) == [bk.validate_entry_set([entry])['reason']]
+
+
+def test_unknown_mode_raises():
+    with pytest.raises(Exception, match='Unknown validation mode'):
+        BookKeeper().set_validation('always')
@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+from src.crypto_accountant.bookkeeper import BookKeeper
+from tests.factories import TxnFactory
+
+VIEWS = ['raw', 'simple', 'accounts']
+SUMS = ['debit_value_sum', 'credit_value_sum', 'debit_quantity_sum', 'credit_quantity_sum']
+
+
+def read_all(ledger):
+    for name in VIEWS:
+        ledger.get_view(name)
+
+
+def assert_same_views(ledger, expected):
+    for name in VIEWS:
+        pd.testing.assert_frame_equal(ledger.get_view(name), expected.get_view(name))
+    for name in SUMS:
+        assert getattr(ledger, name) == getattr(expected, name)
+    assert list(ledger.symbols) == list(expected.symbols)
+
+
+@pytest.mark.parametrize('split', [1, 100, 299])
+def test_views_follow_added_txs(mode, split, booked):
+    txs = TxnFactory.seeded_txs(300, 1)
+    bk = booked(txs[:split])
+    read_all(bk.ledger)
+    bk.add_txs(txs[split:])
+    assert_same_views(bk.ledger, booked(txs).ledger)
+
+
+def test_views_follow_inserted_txs(mode, booked):
+    txs = TxnFactory.seeded_txs(300, 2)
+    bk = booked(txs[::2], track_history=True)
+    read_all(bk.ledger)
+    bk.insert_txs(txs[1::2])
+    assert_same_views(bk.ledger, booked(txs).ledger)
+
+
+def test_views_follow_merge(booked):
+    txs = TxnFactory.seeded_txs(300, 3)
+    ledger = booked(txs[:150]).ledger
+    read_all(ledger)
+    ledger.merge([booked(txs[150:]).ledger])
+    expected = booked(txs[:150]).ledger
+    expected.merge([booked(txs[150:]).ledger])
+    assert_same_views(ledger, expected)
+
+
+def test_view_rebuilt_when_columns_change(booked):
+    bk = booked(TxnFactory.seeded_txs(50, 4))
+    read_all(bk.ledger)
+    bk.ledger.add_entry(dict(bk.ledger.entries[0], memo='moved'))
+    raw = bk.ledger.raw
+    assert 'memo' in raw.columns and raw['memo'].notna().sum() == 1
+    assert len(raw) == len(bk.ledger.store)
+
+
+def test_views_are_copies(booked):
+    ledger = booked(TxnFactory.seeded_txs(50, 5)).ledger
+    raw = ledger.raw
+    raw['value'] = 0
+    raw.drop(raw.index, inplace=True)
+    assert len(ledger.raw) == len(ledger.store)
+    assert (ledger.raw['value'] != 0).any()
+
+
+def test_views_of_cached_ledger_match_new_book(booked):
+    txs = TxnFactory.seeded_txs(200, 6)
+    bk = BookKeeper()
+    for i in range(0, len(txs), 40):
+        bk.add_txs(txs[i:i + 40])
+        read_all(bk.ledger)
+    assert_same_views(bk.ledger, booked(txs).ledger)